@@ -57,12 +57,66 @@ class FrameBufferFinal(object):
 
         self.combined_buffer = array.array("f", [0.0]) * (self._width * self._height * bufferdepth)
         self.aov_buffers = {}
+        # {output_name + index: imagepipeline index}, see export/aovs.py
+        self._aov_imagepipelines = {}
 
     def draw(self, engine, session, scene):
+        outputs = self.get_outputs(engine, scene)
+        self.fetch(session, outputs)
+        self.write(engine, scene, outputs)
+
+    def get_outputs(self, engine, scene):
+        """
+        Collect the AOVs that have to be imported along with the combined pass.
+        Has to be called on Blender's render thread because it reads scene settings.
+        Returns a list of tuples: (output_name, output_type, index, lightgroup_name)
+        """
+        outputs = []
+        self._aov_imagepipelines = engine.aov_imagepipelines
+
+        # Import AOVs only in final render, not in material preview mode
+        if engine.is_preview:
+            return outputs
+
         active_layer_index = scene.luxcore.active_layer_index
         scene_layer = scene.render.layers[active_layer_index]
 
+        for output_name, output_type in pyluxcore.FilmOutputType.names.items():
+            # Check if AOV is enabled by user
+            if getattr(scene_layer.luxcore.aovs, output_name.lower(), False):
+                outputs.append((output_name, output_type, 0, ""))
+
+        lightgroup_pass_names = scene.luxcore.lightgroups.get_pass_names()
+        for i, name in enumerate(lightgroup_pass_names):
+            if i not in engine.exporter.lightgroup_cache:
+                # This light group is not used by any lights int the scene, so it was not defined
+                continue
+
+            outputs.append(("RADIANCE_GROUP", pyluxcore.FilmOutputType.RADIANCE_GROUP, i, name))
+
+        return outputs
+
+    def fetch(self, session, outputs):
+        """
+        Copy the film outputs into our buffers.
+        Does not call the Blender API, so it can be used from a worker thread.
+        """
         session.GetFilm().GetOutputFloat(self._output_type, self.combined_buffer)
+
+        for output_name, output_type, index, lightgroup_name in outputs:
+            try:
+                self._fetch_aov(output_name, output_type, session, index)
+            except RuntimeError as error:
+                print("Error on fetch of AOV %s (%s): %s" % (output_name, lightgroup_name, error))
+
+    def write(self, engine, scene, outputs):
+        """
+        Copy the buffers filled by fetch() into the Blender render result.
+        Has to be called on Blender's render thread.
+        """
+        active_layer_index = scene.luxcore.active_layer_index
+        scene_layer = scene.render.layers[active_layer_index]
+
         result = engine.begin_result(0, 0, self._width, self._height, scene_layer.name)
         # Regardless of the scene render layers, the result always only contains one layer
         render_layer = result.layers[0]
@@ -70,73 +124,59 @@ class FrameBufferFinal(object):
         combined = render_layer.passes["Combined"]
         self._convert_combined(self._width, self._height, self.combined_buffer, combined.as_pointer(), False)
 
-        # Import AOVs only in final render, not in material preview mode
-        if not engine.is_preview:
-            for output_name, output_type in pyluxcore.FilmOutputType.names.items():
-                # Check if AOV is enabled by user
-                if getattr(scene_layer.luxcore.aovs, output_name.lower(), False):
-                    try:
-                        self._import_aov(output_name, output_type, render_layer, session, engine)
-                    except RuntimeError as error:
-                        print("Error on import of AOV %s: %s" % (output_name, error))
-
-            lightgroup_pass_names = scene.luxcore.lightgroups.get_pass_names()
-            for i, name in enumerate(lightgroup_pass_names):
-                if i not in engine.exporter.lightgroup_cache:
-                    # This light group is not used by any lights int the scene, so it was not defined
-                    continue
-
-                output_name = "RADIANCE_GROUP"
-                output_type = pyluxcore.FilmOutputType.RADIANCE_GROUP
-                try:
-                    self._import_aov(output_name, output_type, render_layer, session, engine, i, name)
-                except RuntimeError as error:
-                    print("Error on import of Lightgroup AOV of group %s: %s" % (name, error))
+        for output_name, output_type, index, lightgroup_name in outputs:
+            try:
+                self._write_aov(output_name, render_layer, index, lightgroup_name)
+            except (KeyError, RuntimeError) as error:
+                print("Error on import of AOV %s (%s): %s" % (output_name, lightgroup_name, error))
 
         engine.end_result(result)
 
-    def _import_aov(self, output_name, output_type, render_layer, session, engine, index=0, lightgroup_name=""):
-        if output_name in AOVS:
-            aov = AOVS[output_name]
-        else:
-            aov = DEFAULT_AOV_SETTINGS
+    def _get_aov_settings(self, output_name, index):
+        """ Returns a tuple (buffer key, AOV settings) """
+        aov = AOVS.get(output_name, DEFAULT_AOV_SETTINGS)
+        key = output_name
 
         if output_name in AOVS_WITH_ID:
             # Add the index so we can differentiate between the outputs with id
-            output_name += str(index)
+            key += str(index)
 
-        if output_name in engine.aov_imagepipelines:
-            index = engine.aov_imagepipelines[output_name]
-            output_type = pyluxcore.FilmOutputType.RGB_IMAGEPIPELINE
-            channel_count = DEFAULT_AOV_SETTINGS.channel_count
-            array_type = DEFAULT_AOV_SETTINGS.array_type
-            convert_func = DEFAULT_AOV_SETTINGS.convert_func
-        else:
-            channel_count = aov.channel_count
-            array_type = aov.array_type
-            convert_func = aov.convert_func
+        return key, aov
 
-        width = self._width
-        height = self._height
+    def _fetch_aov(self, output_name, output_type, session, index):
+        key, aov = self._get_aov_settings(output_name, index)
+
+        if key in self._aov_imagepipelines:
+            index = self._aov_imagepipelines[key]
+            output_type = pyluxcore.FilmOutputType.RGB_IMAGEPIPELINE
+            aov = DEFAULT_AOV_SETTINGS
 
         try:
             # Try to get the existing buffer for this AOV
-            buffer = self.aov_buffers[output_name]
+            buffer = self.aov_buffers[key]
         except KeyError:
             # Buffer for this AOV does not exist yet, create it
-            buffer = array.array(array_type, [0]) * (width * height * channel_count)
-            self.aov_buffers[output_name] = buffer
+            buffer = array.array(aov.array_type, [0]) * (self._width * self._height * aov.channel_count)
+            self.aov_buffers[key] = buffer
 
         # Fill the buffer
-        if array_type == "I":
+        if aov.array_type == "I":
             session.GetFilm().GetOutputUInt(output_type, buffer, index)
         else:
             session.GetFilm().GetOutputFloat(output_type, buffer, index)
 
+    def _write_aov(self, output_name, render_layer, index, lightgroup_name):
+        key, aov = self._get_aov_settings(output_name, index)
+        # The normalize setting always comes from the original AOV settings
+        normalize = aov.normalize
+
+        if key in self._aov_imagepipelines:
+            aov = DEFAULT_AOV_SETTINGS
+
         # Depth needs special treatment because it's pre-defined by Blender and not uppercase
         if output_name == "DEPTH":
             pass_name = "Depth"
-        elif output_name.startswith("RADIANCE_GROUP"):
+        elif output_name == "RADIANCE_GROUP":
             pass_name = lightgroup_name
         else:
             pass_name = output_name
@@ -144,4 +184,4 @@ class FrameBufferFinal(object):
         blender_pass = render_layer.passes[pass_name]
 
         # Convert and copy the buffer into the blender_pass.rect
-        convert_func(width, height, buffer, blender_pass.as_pointer(), aov.normalize)
+        aov.convert_func(self._width, self._height, self.aov_buffers[key], blender_pass.as_pointer(), normalize)
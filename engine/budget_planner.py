@@ -0,0 +1,149 @@
+import json
+import math
+import os
+from collections import namedtuple
+import bpy
+from .. import utils
+
+BUDGET_CACHE_SUBDIR = "animation_budget"
+
+# Overrides the halt conditions of one render layer in one frame, see export/halt.py
+# halt_time: seconds, noise_thresh: same unit as LuxCoreHaltConditions.noise_thresh (0..255)
+HaltPlan = namedtuple("HaltPlan", ["halt_time", "noise_thresh"])
+
+
+class AnimationBudgetPlanner(object):
+    """
+    Distributes the total time budget of an animation render across the frames.
+
+    The statistics of each rendered frame and layer (render time, reached convergence,
+    used noise threshold) are stored in a json file, because Blender calls the render
+    engine once per frame. The cost of a frame is predicted from the nearest rendered frame.
+    Frames get a share of the remaining budget proportional to their predicted cost,
+    so all frames reach roughly the same noise level. If the budget is too small for
+    the target noise level, the noise threshold of all remaining frames is raised,
+    assuming that noise is proportional to 1 / sqrt(render time).
+    """
+
+    # A frame is considered converged at this convergence
+    CONVERGED = 0.999
+    # Lower limit for the extrapolation of frames that did not converge
+    MIN_CONVERGENCE = 0.1
+
+    def __init__(self, scene):
+        settings = scene.luxcore.animation_budget
+        self.budget = settings.budget * 60
+        self.target_noise = settings.noise_thresh
+        self.frames = list(range(scene.frame_start, scene.frame_end + 1, scene.frame_step))
+
+        blend_name = bpy.path.display_name_from_filepath(bpy.data.filepath) or "untitled"
+        filename = utils.to_luxcore_name("%s_%s" % (blend_name, scene.name)) + ".json"
+        self.filepath = os.path.join(utils.get_cache_dir(BUDGET_CACHE_SUBDIR), filename)
+
+        # If any of these change, the statistics belong to a different job
+        job_key = [scene.frame_start, scene.frame_end, scene.frame_step, self.budget, self.target_noise]
+        # The first frame starts a new job, later frames continue it (also after a crash)
+        new_job = scene.frame_current == scene.frame_start
+        self.stats = None if new_job else self._load()
+
+        if self.stats is None or self.stats["job"] != job_key:
+            self.stats = {"job": job_key, "frames": {}}
+
+    def plan(self, frame, layer_name, layer_names):
+        """
+        Returns the HaltPlan for one render layer of a frame.
+        layer_names: names of all enabled render layers
+        """
+        # A frame that is rendered again replaces its old statistics
+        done = {int(f): layers for f, layers in self.stats["frames"].items() if int(f) != frame}
+        remaining_frames = [f for f in self.frames if f not in done]
+        if frame not in remaining_frames:
+            remaining_frames.append(frame)
+
+        spent = sum(entry["wall_time"] for layers in done.values() for entry in layers.values())
+        # Export and session creation also count against the budget
+        overheads = [entry["wall_time"] - entry["render_time"]
+                     for layers in done.values() for entry in layers.values()]
+        overhead = sum(overheads) / len(overheads) if overheads else 0
+        render_budget = self.budget - spent - overhead * len(remaining_frames) * len(layer_names)
+        # Give each frame at least one second per layer, even if the budget is used up
+        render_budget = max(render_budget, len(remaining_frames) * len(layer_names))
+
+        costs = {f: self._estimate_cost(f, done) for f in remaining_frames}
+        known = [cost for cost in costs.values() if cost]
+        default_cost = sum(known) / len(known) if known else 1
+        for f, cost in costs.items():
+            if not cost:
+                costs[f] = default_cost
+        total_cost = sum(costs.values())
+
+        # Raise the threshold of all frames evenly if the target can't be reached in time
+        noise_thresh = self.target_noise * math.sqrt(max(1, total_cost / render_budget))
+        frame_time = render_budget * costs[frame] / total_cost
+
+        # Split the frame time between the layers
+        layer_costs = self._estimate_layer_costs(frame, done, layer_names)
+        if layer_costs and layer_name in layer_costs:
+            layer_time = frame_time * layer_costs[layer_name] / sum(layer_costs.values())
+        else:
+            layer_time = frame_time / len(layer_names)
+
+        plan = HaltPlan(halt_time=max(int(layer_time), 1), noise_thresh=noise_thresh)
+        print('[Budget] Frame %d, layer "%s": %d s, noise threshold %.1f (%d frames, %d s left)'
+              % (frame, layer_name, plan.halt_time, plan.noise_thresh,
+                 len(remaining_frames), self.budget - spent))
+        return plan
+
+    def record(self, frame, layer_name, wall_time, render_time, convergence, noise_thresh):
+        """ Store the statistics of a finished render layer """
+        layers = self.stats["frames"].setdefault(str(frame), {})
+        layers[layer_name] = {
+            "wall_time": wall_time,
+            "render_time": render_time,
+            "convergence": convergence,
+            "noise_thresh": noise_thresh,
+        }
+        self._save()
+
+    def _cost(self, entry):
+        """ Predicted render time needed to reach the target noise level """
+        # Noise is proportional to 1 / sqrt(time)
+        cost = entry["render_time"] * (entry["noise_thresh"] / self.target_noise) ** 2
+
+        if entry["convergence"] < self.CONVERGED:
+            # The frame ran out of time, extrapolate
+            cost /= max(entry["convergence"], self.MIN_CONVERGENCE)
+        return cost
+
+    def _nearest_frames(self, frame, done):
+        if not done:
+            return []
+        distance = min(abs(f - frame) for f in done)
+        return [f for f in done if abs(f - frame) == distance]
+
+    def _estimate_cost(self, frame, done):
+        nearest = self._nearest_frames(frame, done)
+        if not nearest:
+            return None
+
+        costs = [sum(self._cost(entry) for entry in done[f].values()) for f in nearest]
+        return sum(costs) / len(costs)
+
+    def _estimate_layer_costs(self, frame, done, layer_names):
+        for f in self._nearest_frames(frame, done):
+            layers = done[f]
+            if all(name in layers for name in layer_names):
+                return {name: self._cost(layers[name]) for name in layer_names}
+        return None
+
+    def _load(self):
+        try:
+            with open(self.filepath) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self):
+        with open(self.filepath + ".tmp", "w") as f:
+            json.dump(self.stats, f)
+        os.replace(self.filepath + ".tmp", self.filepath)
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+from time import time
+import bpy
+from ..bin import pyluxcore
+from .. import utils
+
+CHECKPOINT_SUBDIR = "checkpoints"
+
+
+class Checkpoint(object):
+    """
+    Film and render state of a final render layer, saved periodically
+    so the render can be resumed after a crash or cancellation.
+    """
+
+    def __init__(self, scene, layer_name):
+        settings = scene.luxcore.checkpoints
+
+        if settings.directory:
+            directory = bpy.path.abspath(settings.directory)
+            os.makedirs(directory, exist_ok=True)
+        else:
+            directory = utils.get_cache_dir(CHECKPOINT_SUBDIR)
+
+        blend_name = bpy.path.display_name_from_filepath(bpy.data.filepath) or "untitled"
+        name = "%s_%s_%s_%d" % (blend_name, scene.name, layer_name, scene.frame_current)
+        base_path = os.path.join(directory, utils.to_luxcore_name(name))
+        self.state_path = base_path + ".rst"
+        self.film_path = base_path + ".flm"
+        self.meta_path = base_path + ".json"
+
+        self.interval = settings.interval * 60
+        self.last_save = time()
+        # Identifies the render settings and scene, see set_key()
+        self.key = ""
+        # Render time (seconds) of the checkpoint we resumed from
+        self.resumed_time = 0
+        # Set if the render engine does not support render states
+        self.failed = False
+
+    def set_key(self, *strings):
+        """
+        A checkpoint is only resumed if it was saved with the same key.
+        The exporter passes the config and scene properties and the hash of the scene geometry.
+        """
+        sha = hashlib.sha1()
+        for string in strings:
+            sha.update(string.encode("utf-8"))
+        self.key = sha.hexdigest()
+
+    def load(self):
+        """ Returns a tuple (RenderState, Film) of a compatible checkpoint, or None """
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if meta.get("key") != self.key:
+            print("[Checkpoint] Settings or scene changed, not resuming from", self.meta_path)
+            return None
+
+        try:
+            state = pyluxcore.RenderState(self.state_path)
+            film = pyluxcore.Film(self.film_path)
+        except RuntimeError as error:
+            print("[Checkpoint] Could not load checkpoint:", error)
+            return None
+
+        self.resumed_time = meta["time"]
+        print("[Checkpoint] Resuming from %s (%d s already rendered)" % (self.meta_path, self.resumed_time))
+        return state, film
+
+    def is_due(self):
+        return not self.failed and time() - self.last_save > self.interval
+
+    def save(self, session, rendered_time):
+        """
+        rendered_time: render time of the session in seconds (without resumed time).
+        Has to be called with the film and stats locks held (if there are any, see engine/monitor.py).
+        """
+        start = time()
+        self.last_save = start
+
+        try:
+            session.Pause()
+            try:
+                session.GetRenderState().Save(self.state_path + ".tmp")
+                session.GetFilm().SaveFilm(self.film_path + ".tmp")
+            finally:
+                session.Resume()
+        except RuntimeError as error:
+            print("[Checkpoint] Could not save checkpoint:", error)
+            self.failed = True
+            return
+
+        # Without the meta file, a half-written checkpoint is never loaded
+        self._remove(self.meta_path)
+        os.replace(self.state_path + ".tmp", self.state_path)
+        os.replace(self.film_path + ".tmp", self.film_path)
+
+        meta = {
+            "key": self.key,
+            "time": self.resumed_time + rendered_time,
+        }
+        with open(self.meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+
+        print("[Checkpoint] Saved in %.1f s" % (time() - start))
+
+    def delete(self):
+        for path in (self.meta_path, self.state_path, self.film_path):
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
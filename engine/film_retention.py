@@ -0,0 +1,154 @@
+import array
+from time import time
+import bpy
+from ..bin import pyluxcore
+from .. import export, utils
+from ..utils.disk_cache import DiskCache
+
+FILM_CACHE_SUBDIR = "films"
+
+
+def get_image_name(layer_name):
+    return "LuxCore Film: " + layer_name
+
+
+class RetainedFilm(object):
+    """
+    The film of a finished final render.
+    Either the stopped session is kept in memory, or the film was saved to disk
+    and is loaded again on the first imagepipeline change.
+    """
+
+    def __init__(self, exporter, scene, session=None, filepath=""):
+        assert bool(session) != bool(filepath)
+        # The exporter contains the imagepipeline cache of the render
+        self.exporter = exporter
+        self.filepath = filepath
+        self._session = session
+        self._film = None
+
+        self._width, self._height = utils.calc_filmsize(scene)
+
+        if scene.camera.data.luxcore.imagepipeline.transparent_film:
+            self._output_type = pyluxcore.FilmOutputType.RGBA_IMAGEPIPELINE
+            self._convert = pyluxcore.ConvertFilmChannelOutput_4xFloat_To_4xFloatList
+            bufferdepth = 4
+        else:
+            self._output_type = pyluxcore.FilmOutputType.RGB_IMAGEPIPELINE
+            self._convert = pyluxcore.ConvertFilmChannelOutput_3xFloat_To_4xFloatList
+            bufferdepth = 3
+
+        self._buffer = array.array("f", [0.0]) * (self._width * self._height * bufferdepth)
+        self._rgba_buffer = array.array("f", [0.0]) * (self._width * self._height * 4)
+
+    def get_film(self):
+        if self._session:
+            return self._session.GetFilm()
+
+        if self._film is None:
+            print("[FilmRetention] Loading film from", self.filepath)
+            self._film = pyluxcore.Film(self.filepath)
+            DiskCache.touch(self.filepath)
+        return self._film
+
+    def draw(self, layer_name):
+        """ Run the imagepipeline and show the result in an image datablock """
+        self.get_film().GetOutputFloat(self._output_type, self._buffer)
+        # The convert functions write to a raw pointer, here the memory of our RGBA array
+        pointer = self._rgba_buffer.buffer_info()[0]
+        self._convert(self._width, self._height, self._buffer, pointer, False)
+
+        name = get_image_name(layer_name)
+        image = bpy.data.images.get(name)
+
+        if image and tuple(image.size) != (self._width, self._height):
+            bpy.data.images.remove(image)
+            image = None
+
+        if image is None:
+            image = bpy.data.images.new(name, self._width, self._height, alpha=True, float_buffer=True)
+
+        image.pixels[:] = self._rgba_buffer
+        image.update()
+
+    def release(self):
+        self._session = None
+        self._film = None
+
+
+class FilmRetention(object):
+    """
+    This class is a singleton.
+    Keeps the films of finished final renders so changes of the imagepipeline
+    and light group settings can be applied without rendering again.
+    """
+    # {(scene name, render layer name): RetainedFilm}
+    films = {}
+    # We check for changes at most this often (seconds)
+    UPDATE_INTERVAL = 0.2
+    _last_update = 0
+
+    @classmethod
+    def retain(cls, engine, scene, layer_name):
+        """
+        Call after the session was stopped.
+        The caller can delete its reference to the session afterwards.
+        """
+        key = (scene.name, layer_name)
+        cls.discard(key)
+
+        display = scene.luxcore.display
+        if display.film_retention == "NONE":
+            return
+
+        if display.film_retention == "MEMORY":
+            retained = RetainedFilm(engine.exporter, scene, session=engine.session)
+        else:
+            cache = DiskCache(FILM_CACHE_SUBDIR, display.film_cache_size)
+            blend_name = bpy.path.display_name_from_filepath(bpy.data.filepath) or "untitled"
+            filename = utils.to_luxcore_name("%s_%s_%s" % (blend_name, scene.name, layer_name)) + ".flm"
+            filepath = cache.get_path(filename)
+
+            engine.update_stats("Render", "Saving film...")
+            engine.session.GetFilm().SaveFilm(filepath)
+            # Never evict films that are still retained
+            retained_paths = [film.filepath for film in cls.films.values() if film.filepath]
+            cache.evict(keep=retained_paths + [filepath])
+
+            retained = RetainedFilm(engine.exporter, scene, filepath=filepath)
+
+        cls.films[key] = retained
+        retained.draw(layer_name)
+        print('[FilmRetention] Keeping film of render layer "%s" (%s)' % (layer_name, display.film_retention))
+
+    @classmethod
+    def update(cls, scene):
+        """ Called regularly by a handler, applies imagepipeline changes to the retained films """
+        if not cls.films or time() - cls._last_update < cls.UPDATE_INTERVAL:
+            return
+        cls._last_update = time()
+
+        for (scene_name, layer_name), retained in cls.films.items():
+            if scene_name != scene.name:
+                continue
+
+            # Halt condition changes are irrelevant for a finished film
+            changes = retained.exporter.get_changes() & export.Change.IMAGEPIPELINE
+
+            if changes:
+                start = time()
+                retained.exporter.update_session(changes, retained.get_film())
+                retained.draw(layer_name)
+                print('[FilmRetention] Updated film of render layer "%s" in %.3f s' % (layer_name, time() - start))
+
+    @classmethod
+    def discard(cls, key):
+        retained = cls.films.pop(key, None)
+        if retained:
+            retained.release()
+
+    @classmethod
+    def cleanup(cls):
+        for retained in cls.films.values():
+            retained.release()
+        cls.films = {}
@@ -1,5 +1,12 @@
-from time import time, sleep
+import threading
+from time import time
 from .. import export, utils
+from . import monitor, remix
+from .budget_planner import AnimationBudgetPlanner
+from .checkpoint import Checkpoint
+from .film_retention import FilmRetention
+from .halt_controller import HaltController
+from .persistent_data import PersistentData
 from ..draw.final import FrameBufferFinal
 from ..utils import render as utils_render
 
@@ -7,6 +14,11 @@ from ..utils import render as utils_render
 def render(engine, scene):
     scene.luxcore.errorlog.clear()
 
+    if remix.LightgroupRemix.requested:
+        remix.LightgroupRemix.requested = False
+        remix.render(engine, scene)
+        return
+
     tonemapper = scene.camera.data.luxcore.imagepipeline.tonemapper
     if len(scene.render.layers) > 1 and tonemapper.is_automatic():
         msg = ("Using an automatic tonemapper with multiple "
@@ -15,6 +27,10 @@ def render(engine, scene):
 
     _check_halt_conditions(engine, scene)
 
+    planner = None
+    if engine.is_animation and scene.luxcore.animation_budget.enable:
+        planner = AnimationBudgetPlanner(scene)
+
     for layer_index, layer in enumerate(scene.render.layers):
         print('[Engine/Final] Rendering layer "%s"' % layer.name)
 
@@ -33,7 +49,7 @@ def render(engine, scene):
         scene.luxcore.active_layer_index = layer_index
 
         _add_passes(engine, layer, scene)
-        _render_layer(engine, scene)
+        _render_layer(engine, scene, planner)
 
         if engine.test_break():
             # Blender skips the rest of the render layers anyway
@@ -42,10 +58,31 @@ def render(engine, scene):
         print('[Engine/Final] Finished rendering layer "%s"' % layer.name)
     
 
-def _render_layer(engine, scene):
+def _render_layer(engine, scene, planner=None):
+    # The wall-clock budget includes the export
+    start_time = time()
+    layer_name = utils.get_current_render_layer(scene).name
     engine.aov_imagepipelines = {}
-    engine.exporter = export.Exporter(scene)
-    engine.session = engine.exporter.create_session(engine=engine)
+    use_persistent_data = PersistentData.is_enabled(engine, scene)
+    persistent = PersistentData.take(scene, layer_name) if use_persistent_data else None
+
+    checkpoint = None
+    if scene.luxcore.checkpoints.enable and not scene.luxcore.config.use_filesaver:
+        checkpoint = Checkpoint(scene, layer_name)
+
+    if persistent:
+        # A film retained in memory belongs to a session with the same render config
+        FilmRetention.discard((scene.name, layer_name))
+        engine.exporter = persistent.exporter
+        engine.session = persistent.resume(scene, engine)
+    else:
+        engine.exporter = export.Exporter(scene)
+
+        if planner:
+            layer_names = [layer.name for layer in scene.render.layers if layer.use]
+            engine.exporter.halt_plan = planner.plan(scene.frame_current, layer_name, layer_names)
+
+        engine.session = engine.exporter.create_session(engine=engine, checkpoint=checkpoint)
 
     if engine.session is None:
         # session is None, but no error was thrown
@@ -57,8 +94,6 @@ def _render_layer(engine, scene):
     engine.session.Start()
 
     config = engine.session.GetRenderConfig()
-    done = False
-    start = time()
 
     if scene.luxcore.config.use_filesaver:
         engine.session.Stop()
@@ -74,82 +109,168 @@ def _render_layer(engine, scene):
         engine.session = None
         return
 
+    controller = HaltController(scene, start_time, engine.exporter.resumed_time)
+    # See engine/monitor.py for the pyluxcore calls each lock guards
+    film_lock = threading.Lock()
+    stats_lock = threading.Lock()
+    # Set by the workers when they have something for the dispatcher
+    wakeup = threading.Event()
+    watcher = monitor.StatsWatcher(engine.session, stats_lock, wakeup)
+    fetcher = monitor.FilmFetcher(engine.session, film_lock, engine.framebuffer, wakeup)
+    watcher.start()
+    fetcher.start()
+
+    try:
+        finished = _dispatch(engine, scene, config, film_lock, stats_lock, wakeup, watcher, fetcher,
+                             checkpoint, controller)
+    finally:
+        watcher.stop()
+        fetcher.stop()
+        watcher.join()
+        fetcher.join()
+
+    if checkpoint:
+        if finished:
+            # Nothing left to resume
+            checkpoint.delete()
+        elif watcher.stats is not None and not checkpoint.failed:
+            # Cancelled by the user, the render can be continued later
+            engine.update_stats("Render", "Saving checkpoint...")
+            checkpoint.save(engine.session, watcher.stats.Get("stats.renderengine.time").GetFloat())
+
+    if planner and finished and watcher.stats is not None:
+        stats = watcher.stats
+        render_time = stats.Get("stats.renderengine.time").GetFloat() + engine.exporter.resumed_time
+        convergence = stats.Get("stats.renderengine.convergence").GetFloat()
+        planner.record(scene.frame_current, layer_name, time() - start_time, render_time,
+                       convergence, engine.exporter.halt_plan.noise_thresh)
+
+    # User wants to stop or halt condition is reached
+    # Update stats to refresh film and draw the final result
+    utils_render.refresh(engine, scene, config, draw_film=True)
+    engine.update_stats("Render", "Stopping session...")
+    engine.session.Stop()
+
+    if use_persistent_data:
+        # Keep the scene for the next render, only the changes will be exported
+        PersistentData.keep(scene, layer_name, engine.exporter, engine.session.GetRenderConfig())
+
+    if scene.luxcore.lightgroups.save_remix_buffers:
+        remix.save_buffers(engine, scene, layer_name)
+
+    # Keeps a reference to the stopped session (or saves the film) if enabled
+    FilmRetention.retain(engine, scene, layer_name)
+    # Clean up
+    del engine.session
+    engine.session = None
+
+
+def _dispatch(engine, scene, config, film_lock, stats_lock, wakeup, watcher, fetcher,
+              checkpoint=None, controller=None):
+    """
+    Runs on Blender's render thread and performs all Blender API calls
+    while the workers in engine/monitor.py poll the stats and fetch the film.
+    Returns True when a halt condition is reached or the budget is used up,
+    False when the user cancels the render.
+    """
+    start = time()
     # Fast refresh on startup so the user quickly sees an image forming.
     # Not used during animation render to enhance performance.
-    if not engine.is_animation:
-        FAST_REFRESH_DURATION = 5
-        refresh_interval = utils_render.shortest_display_interval(scene)
-        last_refresh = 0
-
-        while not done:
-            now = time()
-
-            if now - last_refresh > refresh_interval:
-                utils_render.refresh(engine, scene, config, draw_film=True)
-                done = engine.test_break() or engine.session.HasDone()
-
-            if now - start > FAST_REFRESH_DURATION:
-                # It's time to switch to the loop with slow refresh below
-                break
-
-            # This is a measure to make cancelling more responsive in this phase
-            checks = 10
-            for i in range(checks):
-                if engine.test_break():
-                    done = True
-                    break
-                sleep(1 / 60 / checks)
-
-    # Main loop where we refresh according to user-specified interval
-    last_film_refresh = time()
-    stat_refresh_interval = 1
-    last_stat_refresh = time()
+    FAST_REFRESH_DURATION = 0 if engine.is_animation else 5
+    fast_refresh_interval = utils_render.shortest_display_interval(scene)
+    # How often we check for imagepipeline/lightgroup/halt changes
+    CHANGE_CHECK_INTERVAL = 1
+    last_change_check = start
+    last_film_request = start
+    film_requested_once = False
+    last_shown_stats = None
     computed_optimal_clamp = False
 
-    while not done:
+    while True:
+        # Stay responsive (test_break) even if the workers have nothing for us
+        wakeup.wait(1 / 60)
+        wakeup.clear()
         now = time()
 
-        if now - last_stat_refresh > stat_refresh_interval:
-            # We have to check the stats often to see if a halt condition is met
-            # But film drawing is expensive, so we don't do it every time we check stats
-            time_until_film_refresh = scene.luxcore.display.interval - (now - last_film_refresh)
-            draw_film = time_until_film_refresh <= 0
-
-            # Do session update (imagepipeline, lightgroups)
+        if engine.test_break():
+            return False
+        if watcher.done.is_set():
+            return True
+        if controller and controller.is_budget_exhausted():
+            print("[Engine/Final] Budget used up, stopping render")
+            return True
+
+        if fetcher.ready.is_set():
+            # The fetcher staged new film buffers, copy them into the render result
+            outputs = fetcher.take()
+            engine.framebuffer.write(engine, scene, outputs)
+
+        refresh_film_now = False
+
+        if now - last_change_check > CHANGE_CHECK_INTERVAL:
+            # Do session update (imagepipeline, lightgroups, halt conditions)
             changes = engine.exporter.get_changes()
-            engine.exporter.update_session(changes, engine.session)
-            # Refresh quickly when user changed something
-            draw_film |= changes
+            if changes:
+                with film_lock, stats_lock:
+                    engine.exporter.update_session(changes, engine.session)
+                # Refresh quickly when user changed something
+                refresh_film_now = True
+            last_change_check = now
+
+        if now - start < FAST_REFRESH_DURATION:
+            film_refresh_interval = fast_refresh_interval
+        else:
+            film_refresh_interval = scene.luxcore.display.interval
+
+        time_until_film_refresh = film_refresh_interval - (now - last_film_request)
+        if not film_requested_once or time_until_film_refresh <= 0:
+            refresh_film_now = True
+
+        if refresh_film_now and not fetcher.pending:
+            fetcher.request(engine.framebuffer.get_outputs(engine, scene))
+            film_requested_once = True
+            last_film_request = now
+            time_until_film_refresh = film_refresh_interval
+
+        stats = watcher.stats
+        if stats is not None and stats is not last_shown_stats:
+            if fetcher.pending:
+                refresh_message = "Refreshing film..."
+            else:
+                refresh_message = "Film refresh in %ds" % time_until_film_refresh
+
+            if watcher.error_message:
+                refresh_message += " | " + watcher.error_message
+
+            if controller:
+                controller.add_stats(stats)
+                prediction = controller.get_status()
+                if prediction:
+                    refresh_message += " | " + prediction
 
-            utils_render.refresh(engine, scene, config, draw_film, time_until_film_refresh)
-            done = engine.test_break() or engine.session.HasDone()
+            utils_render.update_status(engine, scene, config, stats, refresh_message, controller)
+            last_shown_stats = stats
 
-            last_stat_refresh = now
-            if draw_film:
-                last_film_refresh = now
+        if checkpoint and stats is not None and checkpoint.is_due():
+            engine.update_stats("Render", "Saving checkpoint...")
+            with film_lock, stats_lock:
+                checkpoint.save(engine.session, stats.Get("stats.renderengine.time").GetFloat())
 
         # Compute and print the optimal clamp value. Done only once after a warmup phase.
         # Only do this if clamping is disabled, otherwise the value is meaningless.
         path_settings = scene.luxcore.config.path
-        if not computed_optimal_clamp and not path_settings.use_clamping and time() - start > 10:
-            optimal_clamp = utils_render.find_suggested_clamp_value(engine.session, scene)
+        if not computed_optimal_clamp and not path_settings.use_clamping and now - start > 10:
+            with film_lock:
+                optimal_clamp = utils_render.find_suggested_clamp_value(engine.session, scene)
             print("Recommended clamp value:", optimal_clamp)
             computed_optimal_clamp = True
 
-        # Don't use up too much CPU time for this refresh loop, but stay responsive
-        sleep(1 / 60)
-
-    # User wants to stop or halt condition is reached
-    # Update stats to refresh film and draw the final result
-    utils_render.refresh(engine, scene, config, draw_film=True)
-    engine.update_stats("Render", "Stopping session...")
-    engine.session.Stop()
-    # Clean up
-    del engine.session
-    engine.session = None
-
 
 def _check_halt_conditions(engine, scene):
+    if engine.is_animation and scene.luxcore.animation_budget.enable:
+        # The budget planner sets the halt conditions of each frame
+        return
+
     enabled_layers = [layer for layer in scene.render.layers if layer.use]
     needs_halt_condition = len(enabled_layers) > 1 or engine.is_animation
 
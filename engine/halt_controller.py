@@ -0,0 +1,147 @@
+import math
+from collections import deque
+from time import time
+from .. import utils
+
+
+class HaltController(object):
+    """
+    Predicts the convergence of a final render from the session stats
+    and stops the render when the wall-clock budget is used up.
+
+    The fraction of unconverged pixels u = 1 - convergence is modeled as a power law
+    of the render time, u(t) = exp(a) * t^b, fitted by least squares in log-log space
+    over the most recent stats. Samples/sec is the slope of the samples over the same window.
+    """
+
+    # Number of stats entries used for the fits
+    WINDOW = 40
+    MIN_POINTS = 4
+    # The last few pixels are hard to predict, so the ETA is computed for this fraction
+    TARGET_CONVERGENCE = 0.999
+
+    def __init__(self, scene, start_time, resumed_time=0):
+        """
+        start_time: wall-clock time when the render of the layer started (before export)
+        resumed_time: render time of a resumed checkpoint
+        """
+        halt = utils.get_halt_conditions(scene)
+        self.use_noise_thresh = halt.enable and halt.use_noise_thresh
+        self.budget = halt.budget if (halt.enable and halt.use_budget) else 0
+        self.start_time = start_time
+        self.resumed_time = resumed_time
+        # Entries: (render time, convergence, samples)
+        self._history = deque(maxlen=self.WINDOW)
+
+    def add_stats(self, stats):
+        rendered_time = stats.Get("stats.renderengine.time").GetFloat() + self.resumed_time
+        convergence = stats.Get("stats.renderengine.convergence").GetFloat()
+        samples = stats.Get("stats.renderengine.pass").GetInt()
+
+        if self._history and rendered_time <= self._history[-1][0]:
+            # Stats did not change since the last call
+            return
+        self._history.append((rendered_time, convergence, samples))
+
+    def wall_time(self):
+        return time() - self.start_time
+
+    def is_budget_exhausted(self):
+        return self.budget > 0 and self.wall_time() >= self.budget
+
+    def budget_progress(self):
+        if self.budget <= 0:
+            return 0
+        return min(self.wall_time() / self.budget, 1)
+
+    def samples_per_sec(self):
+        points = [(t, samples) for t, _, samples in self._history]
+        fit = _fit_line(points)
+        return fit[1] if fit else 0
+
+    def predict_convergence(self, rendered_time):
+        """ Predicted convergence (0..1) at the given render time, or None """
+        fit = self._fit_convergence()
+        if fit is None:
+            return None
+        a, b = fit
+        return max(0, 1 - math.exp(a + b * math.log(rendered_time)))
+
+    def predict_eta(self):
+        """ Predicted render time in seconds until the target convergence is reached, or None """
+        if not self._history:
+            return None
+        fit = self._fit_convergence()
+        if fit is None:
+            return None
+        a, b = fit
+        target_time = math.exp((math.log(1 - self.TARGET_CONVERGENCE) - a) / b)
+        return max(target_time - self._history[-1][0], 0)
+
+    def get_status(self):
+        """ A short string for the stats line, or an empty string """
+        messages = []
+
+        if self.use_noise_thresh:
+            eta = self.predict_eta()
+            if eta is not None:
+                message = "ETA " + _format_time(eta)
+                samples_per_sec = self.samples_per_sec()
+                if samples_per_sec > 0:
+                    samples = self._history[-1][2] + eta * samples_per_sec
+                    message += " (~%d Samples)" % samples
+                messages.append(message)
+
+        if self.budget > 0:
+            remaining = max(self.budget - self.wall_time(), 0)
+            message = "Budget: %s left" % _format_time(remaining)
+
+            if self.use_noise_thresh and self._history:
+                # Which convergence can we reach until the budget is used up?
+                budget_end = self._history[-1][0] + remaining
+                predicted = self.predict_convergence(budget_end)
+                if predicted is not None and predicted < self.TARGET_CONVERGENCE:
+                    message += ", predicted %d%% converged" % (predicted * 100)
+            messages.append(message)
+
+        return " | ".join(messages)
+
+    def _fit_convergence(self):
+        # Convergence is 0 during the warmup of the noise threshold test
+        points = [(math.log(t), math.log(1 - convergence))
+                  for t, convergence, _ in self._history
+                  if t > 0 and 0 < convergence < 1]
+        fit = _fit_line(points, self.MIN_POINTS)
+
+        if fit is None or fit[1] >= 0:
+            # Not enough data or not converging
+            return None
+        return fit
+
+
+def _fit_line(points, min_points=2):
+    """ Least squares fit y = a + b * x, returns (a, b) or None """
+    n = len(points)
+    if n < min_points:
+        return None
+
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+
+    if var_x == 0:
+        return None
+
+    b = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+    a = mean_y - b * mean_x
+    return a, b
+
+
+def _format_time(seconds):
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    if h:
+        return "%dh %dm" % (h, m)
+    if m:
+        return "%dm %ds" % (m, s)
+    return "%ds" % s
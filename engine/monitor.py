@@ -0,0 +1,131 @@
+"""
+Worker threads that monitor a running final render session.
+
+The workers only talk to pyluxcore, never to the Blender API.
+All Blender API calls (update_stats, begin_result/end_result, test_break etc.)
+are made by the dispatcher loop in engine/final.py, which runs on Blender's render thread.
+
+Two locks keep the workers from waiting on each other:
+- film_lock guards the film: GetFilm().GetOutputFloat() and GetFilmY() read it,
+  session.Parse() (imagepipeline) and the checkpoint (Pause(), SaveFilm()) change it.
+- stats_lock guards the stats and the halt state: UpdateStats(), GetStats() and HasDone()
+  read them, session.Parse() (halt conditions) and the checkpoint (Pause()) change them.
+UpdateStats() and the film readout do not conflict, LuxCore synchronizes them internally.
+Code that takes both locks has to take film_lock first.
+"""
+
+import threading
+
+
+class StatsWatcher(threading.Thread):
+    """
+    Polls the session stats in short intervals and detects when
+    a halt condition is reached, independent of film drawing.
+    """
+
+    def __init__(self, session, stats_lock, wakeup, interval=0.2):
+        super().__init__(name="LuxCoreStatsWatcher", daemon=True)
+        self._session = session
+        self._stats_lock = stats_lock
+        # Set whenever new stats are available, wakes up the dispatcher
+        self._wakeup = wakeup
+        self._interval = interval
+        self._stop_event = threading.Event()
+
+        # Set when the session has reached a halt condition
+        self.done = threading.Event()
+        # The latest stats, replaced (not modified) on each update
+        self.stats = None
+        self.error_message = ""
+
+    def run(self):
+        while not self._stop_event.is_set():
+            with self._stats_lock:
+                try:
+                    self._session.UpdateStats()
+                    self.error_message = ""
+                except RuntimeError as error:
+                    print("Error during UpdateStats():", error)
+                    self.error_message = str(error)
+
+                self.stats = self._session.GetStats()
+                has_done = self._session.HasDone()
+
+            if has_done:
+                self.done.set()
+
+            self._wakeup.set()
+
+            if has_done:
+                return
+
+            self._stop_event.wait(self._interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class FilmFetcher(threading.Thread):
+    """
+    Copies the film outputs into the framebuffer buffers on request,
+    so the dispatcher only has to copy the staged buffers into the render result.
+    """
+
+    def __init__(self, session, film_lock, framebuffer, wakeup):
+        super().__init__(name="LuxCoreFilmFetcher", daemon=True)
+        self._session = session
+        self._film_lock = film_lock
+        self._framebuffer = framebuffer
+        self._wakeup = wakeup
+        self._request_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._outputs = []
+        self._error = None
+
+        # Set when the requested buffers are staged and can be written
+        self.ready = threading.Event()
+        self.pending = False
+
+    def request(self, outputs):
+        """ outputs: see FrameBufferFinal.get_outputs() """
+        assert not self.pending
+        self._outputs = outputs
+        self.pending = True
+        self.ready.clear()
+        self._request_event.set()
+
+    def take(self):
+        """
+        Call when ready is set. Re-raises errors from the worker thread.
+        Returns the outputs that were fetched.
+        """
+        self.pending = False
+        self.ready.clear()
+
+        if self._error:
+            error = self._error
+            self._error = None
+            raise error
+
+        return self._outputs
+
+    def run(self):
+        while True:
+            self._request_event.wait()
+            self._request_event.clear()
+
+            if self._stop_event.is_set():
+                return
+
+            try:
+                with self._film_lock:
+                    self._framebuffer.fetch(self._session, self._outputs)
+            except Exception as error:
+                self._error = error
+
+            self.ready.set()
+            self._wakeup.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._request_event.set()
@@ -0,0 +1,155 @@
+import bpy
+from .. import utils
+from ..export import Change
+from ..export.caches import ObjectCache, MaterialCache, WorldCache
+
+# Object types that end up in exporter.exported_objects
+EXPORTED_TYPES = {"MESH", "CURVE", "SURFACE", "META", "FONT", "LAMP"}
+
+
+class PersistentSession(object):
+    """
+    The exporter and the LuxCore scene of a finished final render,
+    together with the changes the user made since the render was started.
+    """
+
+    def __init__(self):
+        # Set when the render is finished (see PersistentData.keep())
+        self.exporter = None
+        self.renderconfig = None
+        # Own caches, the ones of the exporter are used by the running render
+        self.object_cache = ObjectCache()
+        self.material_cache = MaterialCache()
+        self.world_cache = WorldCache()
+        self.changes = Change.NONE
+        # Keys of the changed datablocks. The datablocks themselves are looked up again
+        # before the next render, they might have been deleted in the meantime
+        self.changed_objects = set()
+        self.changed_lamps = set()
+        self.changed_materials = set()
+
+    def accumulate(self, scene):
+        """
+        The is_updated flags of Blender are only valid during one scene update,
+        so the changes are collected on every update until the next render.
+        """
+        object_cache = self.object_cache
+        if object_cache.diff(scene):
+            # The transformation is baked into the mesh of non-instanced objects,
+            # so these objects are re-exported completely
+            for obj in object_cache.changed_transform + object_cache.changed_mesh:
+                self.changed_objects.add(utils.make_key(obj))
+            for obj in object_cache.lamps:
+                self.changed_lamps.add(utils.make_key(obj))
+            self.changes |= Change.OBJECT
+
+        changed_materials = self.material_cache.diff(scene)
+        if changed_materials:
+            self.changed_materials.update(utils.make_key(mat) for mat in changed_materials)
+            self.changes |= Change.MATERIAL
+
+        if self.world_cache.diff(scene):
+            self.changes |= Change.WORLD
+
+    def resume(self, scene, engine):
+        """ Applies the collected changes and returns a new session """
+        exporter = self.exporter
+        changes = self.changes
+        objects = {utils.make_key(obj): obj for obj in scene.objects}
+
+        # Objects can be hidden or shown without being flagged as updated (e.g. render layers)
+        visible = {key for key, obj in objects.items()
+                   if obj.type in EXPORTED_TYPES and utils.is_obj_visible(obj, scene)}
+        exported = set(exporter.exported_objects)
+        visibility_cache = exporter.visibility_cache
+        visibility_cache.objects_to_remove = exported - visible
+        visibility_cache.objects_to_add = visible - exported
+        if visibility_cache.objects_to_remove or visibility_cache.objects_to_add:
+            changes |= Change.VISIBILITY
+
+        # Added objects are exported anyway
+        changed_objects = self.changed_objects - visibility_cache.objects_to_add
+        changed_lamps = self.changed_lamps - visibility_cache.objects_to_add
+
+        object_cache = exporter.object_cache
+        object_cache.changed_transform = []
+        object_cache.changed_mesh = [objects[key] for key in changed_objects if key in objects]
+        object_cache.lamps = [objects[key] for key in changed_lamps if key in objects]
+        exporter.material_cache.changed_materials = [mat for mat in bpy.data.materials
+                                                     if utils.make_key(mat) in self.changed_materials]
+
+        engine.update_stats("Export", "Updating persistent data...")
+        return exporter.resume_final(self.renderconfig, changes, engine)
+
+
+class PersistentData(object):
+    """
+    This class is a singleton.
+    Keeps the exporter and the LuxCore scene of final renders alive if "Persistent Data" is enabled,
+    so the next render of the same scene and render layer only has to export the changes.
+    """
+    # {(scene name, render layer name): PersistentSession}
+    sessions = {}
+    # Sessions that collect the changes made while a render is running, same keys
+    rendering = {}
+
+    @staticmethod
+    def is_enabled(engine, scene):
+        config = scene.luxcore.config
+        if not config.use_persistent_data or config.use_filesaver or engine.is_animation:
+            return False
+        # The checkpoint key is computed from the complete export
+        if scene.luxcore.checkpoints.enable:
+            return False
+        # Motion blur is exported for all objects at once
+        if scene.camera and scene.camera.data.luxcore.motion_blur.enable:
+            return False
+        return True
+
+    @classmethod
+    def take(cls, scene, layer_name):
+        """
+        Call when a render starts. Returns the PersistentSession of the last render or None,
+        the caller owns it afterwards. The changes made during the render are collected
+        for the next one.
+        """
+        key = (scene.name, layer_name)
+        cls.rendering[key] = PersistentSession()
+        return cls.sessions.pop(key, None)
+
+    @classmethod
+    def keep(cls, scene, layer_name, exporter, renderconfig):
+        key = (scene.name, layer_name)
+        persistent = cls.rendering.pop(key, None)
+        if persistent is None:
+            # The scene was released during the render (e.g. undo), nothing is known about the changes
+            return
+
+        persistent.exporter = exporter
+        persistent.renderconfig = renderconfig
+        cls.sessions[key] = persistent
+        print('[PersistentData] Keeping scene of render layer "%s"' % layer_name)
+
+    @classmethod
+    def accumulate(cls, scene):
+        """ Called by the scene_update_post handler """
+        if not cls.sessions and not cls.rendering:
+            return
+
+        if not scene.luxcore.config.use_persistent_data:
+            cls.cleanup(scene.name)
+            return
+
+        for (scene_name, _), persistent in list(cls.sessions.items()) + list(cls.rendering.items()):
+            if scene_name == scene.name:
+                persistent.accumulate(scene)
+
+    @classmethod
+    def cleanup(cls, scene_name=None):
+        """ Releases the kept scenes of one scene, or of all scenes (e.g. after undo or loading a file) """
+        if scene_name is None:
+            cls.sessions = {}
+            cls.rendering = {}
+        else:
+            cls.sessions = {key: persistent for key, persistent in cls.sessions.items() if key[0] != scene_name}
+            cls.rendering = {key: persistent for key, persistent in cls.rendering.items() if key[0] != scene_name}
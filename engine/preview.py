@@ -1,10 +1,13 @@
 from enum import Enum
-from time import sleep
+import threading
+from time import sleep, time
 from mathutils import Matrix
 from ..bin import pyluxcore
 from .. import utils
 from .. import export
+from ..export import material_features
 from ..draw.final import FrameBufferFinal
+from .preview_cache import PreviewImageCache
 
 """
 Note: you can find the Blender preview scene in the sources at this path:
@@ -13,6 +16,8 @@ blender/release/datafiles/preview.blend
 
 # Diameter of the default sphere, in meters
 DEFAULT_SPHERE_SIZE = 9.15753
+# Name of our own plane object that replaces the plane of the preview scene
+PLANE_OBJ_NAME = "mat_preview_planeobj"
 
 
 class PreviewType(Enum):
@@ -25,6 +30,134 @@ def no_log_output(message):
     pass
 
 
+class PreviewSession(object):
+    """ A preview session that is kept alive between previews by the PreviewSessionPool """
+    def __init__(self, session, signature, exported_obj):
+        self.session = session
+        # The preview settings the session was created with, see PreviewSessionPool.get_signature()
+        self.signature = signature
+        # Needed to swap the material of the preview object (None for the plane scene)
+        self.exported_obj = exported_obj
+        self.last_used = time()
+        self.busy = False
+
+    def stop(self):
+        # A paused session has to be resumed before it can be stopped
+        self.session.Resume()
+        self.session.Stop()
+
+
+class PreviewSessionPool(object):
+    """
+    This class is a singleton.
+    Keeps one session alive per preview object (plane, sphere, world sphere etc.).
+    When a different material is previewed, only the material is swapped with a
+    scene edit instead of exporting the whole preview scene again.
+    Sessions that were not used for IDLE_TIMEOUT seconds are stopped.
+    """
+    # {preview object name: PreviewSession}
+    sessions = {}
+    IDLE_TIMEOUT = 60  # seconds
+    # The preview render runs in a job thread, the idle cleanup in the main thread
+    lock = threading.Lock()
+
+    @staticmethod
+    def get_signature(scene, obj):
+        """ If any of these settings change, the session has to be created again """
+        width, height = utils.calc_filmsize(scene)
+        preview = obj.active_material.luxcore.preview
+        has_hair = any(psys.settings.type == "HAIR" for psys in obj.particle_systems)
+        # Hair is exported with the material settings, it can not be swapped
+        material_key = obj.active_material.name if has_hair else ""
+        # The mesh is only exported with the UVs, vertex colors and pointiness the first material needs
+        features = material_features.analyze(obj.active_material).to_tuple()
+        return width, height, preview.size, preview.zoom, material_key, features
+
+    @classmethod
+    def acquire(cls, scene, obj):
+        """
+        Returns a started session with the active material of obj.
+        Call release() when the preview is finished.
+        """
+        signature = cls.get_signature(scene, obj)
+
+        with cls.lock:
+            entry = cls.sessions.get(obj.name)
+
+            if entry and entry.busy:
+                # Should not happen, but we can't share the session
+                entry = None
+            elif entry and entry.signature != signature:
+                entry.stop()
+                del cls.sessions[obj.name]
+                entry = None
+
+            if entry:
+                entry.busy = True
+
+        if entry:
+            start = time()
+            try:
+                _swap_material(entry, obj, scene)
+            except Exception:
+                # The session might be stuck in a scene edit, don't use it again
+                with cls.lock:
+                    if cls.sessions.get(obj.name) is entry:
+                        del cls.sessions[obj.name]
+                entry.busy = False
+                try:
+                    entry.stop()
+                except Exception as error:
+                    print("[Preview] Could not stop session:", error)
+                raise
+            print("[Preview] Swapped material in %.3f s" % (time() - start))
+        else:
+            entry = cls._create(scene, obj, signature)
+            with cls.lock:
+                if obj.name not in cls.sessions:
+                    cls.sessions[obj.name] = entry
+
+        return entry
+
+    @classmethod
+    def release(cls, entry):
+        # Don't waste CPU time until the next preview
+        entry.session.Pause()
+
+        with cls.lock:
+            entry.last_used = time()
+            entry.busy = False
+
+            if entry not in cls.sessions.values():
+                # Temporary session that could not be added to the pool
+                entry.stop()
+
+    @classmethod
+    def cleanup(cls, idle_only=False):
+        with cls.lock:
+            for name, entry in list(cls.sessions.items()):
+                if entry.busy:
+                    continue
+                if idle_only and time() - entry.last_used < cls.IDLE_TIMEOUT:
+                    continue
+
+                print("[Preview] Stopping idle session of", name)
+                entry.stop()
+                del cls.sessions[name]
+
+    @staticmethod
+    def _create(scene, obj, signature):
+        pyluxcore.Init(no_log_output)
+        exporter = export.Exporter(scene)
+        session, exported_obj = _export_mat_scene(exporter, obj, scene)
+        session.Start()
+        enable_log_output()
+
+        entry = PreviewSession(session, signature, exported_obj)
+        entry.busy = True
+        return entry
+
+
 def render(engine, scene):
     width, height = utils.calc_filmsize(scene)
 
@@ -32,42 +165,51 @@ def render(engine, scene):
         # We do not render thumbnails
         return
 
-    pyluxcore.Init(no_log_output)
     preview_type, obj = _get_preview_settings(scene)
 
-    if preview_type == PreviewType.MATERIAL:
-        engine.exporter = export.Exporter(scene)
-        engine.session = _export_mat_scene(engine.exporter, obj, scene)
-    else:
+    if preview_type != PreviewType.MATERIAL:
         print("Unsupported preview type")
-        return enable_log_output()
+        return
 
     engine.framebuffer = FrameBufferFinal(scene)
-    engine.session.Start()
 
-    while True:
-        try:
-            engine.session.UpdateStats()
-        except RuntimeError as error:
-            print("Error during UpdateStats():", error)
+    cache_key = PreviewImageCache.get_key(scene, obj)
+    pixels = PreviewImageCache.get(cache_key)
+    if pixels is not None and len(pixels) == len(engine.framebuffer.combined_buffer):
+        # Material and preview settings did not change since this preview was rendered
+        engine.framebuffer.combined_buffer = pixels
+        engine.framebuffer.write(engine, scene, [])
+        return
+
+    entry = PreviewSessionPool.acquire(scene, obj)
+    engine.session = entry.session
 
-        if engine.session.HasDone():
-            break
+    try:
+        while True:
+            try:
+                engine.session.UpdateStats()
+            except RuntimeError as error:
+                print("Error during UpdateStats():", error)
 
-        stats = engine.session.GetStats()
-        samples = stats.Get("stats.renderengine.pass").GetInt()
-        if (samples > 2 and samples < 10) or (samples > 0 and samples % 10 == 0):
-            engine.framebuffer.draw(engine, engine.session, scene)
-        sleep(1 / 30)
+            if engine.session.HasDone():
+                break
 
-        if engine.test_break():
-            # Abort as fast as possible, without drawing the framebuffer again
-            engine.session.Stop()
-            return enable_log_output()
+            stats = engine.session.GetStats()
+            samples = stats.Get("stats.renderengine.pass").GetInt()
+            if (samples > 2 and samples < 10) or (samples > 0 and samples % 10 == 0):
+                engine.framebuffer.draw(engine, engine.session, scene)
+            sleep(1 / 30)
 
-    engine.framebuffer.draw(engine, engine.session, scene)
-    engine.session.Stop()
-    enable_log_output()
+            if engine.test_break():
+                # Abort as fast as possible, without drawing the framebuffer again
+                return
+
+        engine.framebuffer.draw(engine, engine.session, scene)
+        PreviewImageCache.put(cache_key, engine.framebuffer.combined_buffer)
+    finally:
+        PreviewSessionPool.release(entry)
+        # The session belongs to the pool
+        engine.session = None
 
 
 def enable_log_output():
@@ -75,13 +217,17 @@ def enable_log_output():
     pyluxcore.Init()
 
 
-def _export_mat_scene(exporter, obj, scene):
+def _apply_preview_size(scene, obj):
     # The diameter that the preview objects should have, in meters
     size = obj.active_material.luxcore.preview.size
     worldscale = size / DEFAULT_SPHERE_SIZE
     scene.unit_settings.system = "METRIC"
     scene.unit_settings.scale_length = worldscale
 
+
+def _export_mat_scene(exporter, obj, scene):
+    _apply_preview_size(scene, obj)
+
     scene_props = pyluxcore.Properties()
     luxcore_scene = pyluxcore.Scene()
     # The world sphere uses different lights and render settings
@@ -99,8 +245,9 @@ def _export_mat_scene(exporter, obj, scene):
     is_plane_scene = obj.name == "preview"
     if is_plane_scene:
         _export_plane_scene(exporter, scene, obj.active_material, scene_props, luxcore_scene)
+        exported_obj = None
     else:
-        _convert_obj(exporter, obj, scene, luxcore_scene, scene_props)
+        exported_obj = _convert_obj(exporter, obj, scene, luxcore_scene, scene_props)
 
     # Lights (either two area lights or a sun+sky setup)
     _create_lights(scene, luxcore_scene, scene_props, is_world_sphere)
@@ -116,7 +263,37 @@ def _export_mat_scene(exporter, obj, scene):
     renderconfig = pyluxcore.RenderConfig(config_props, luxcore_scene)
     session = pyluxcore.RenderSession(renderconfig)
 
-    return session
+    return session, exported_obj
+
+
+def _swap_material(entry, obj, scene):
+    """ Replace the material of the preview object in the running session """
+    _apply_preview_size(scene, obj)
+    exporter = export.Exporter(scene)
+    session = entry.session
+    session.Resume()
+    session.BeginSceneEdit()
+    luxcore_scene = session.GetRenderConfig().GetScene()
+
+    if obj.name == "preview":
+        props = pyluxcore.Properties()
+        _convert_plane_material(exporter, scene, obj.active_material, props)
+    else:
+        # Only defines the material and the object, the mesh is already in the scene
+        props, _ = export.blender_object.convert(exporter, obj, scene, None, luxcore_scene,
+                                                 exported_object=entry.exported_obj)
+
+    luxcore_scene.Parse(props)
+    # Delete the previous material
+    luxcore_scene.RemoveUnusedTextures()
+    luxcore_scene.RemoveUnusedMaterials()
+    session.EndSceneEdit()
+
+
+def _convert_plane_material(exporter, scene, mat, props):
+    lux_mat_name, mat_props = export.material.convert(exporter, mat, scene, None)
+    props.Set(mat_props)
+    props.Set(pyluxcore.Property("scene.objects." + PLANE_OBJ_NAME + ".material", lux_mat_name))
 
 
 def _export_plane_scene(exporter, scene, mat, props, luxcore_scene):
@@ -124,8 +301,7 @@ def _export_plane_scene(exporter, scene, mat, props, luxcore_scene):
     # A quadratic texture (with UV mapping) is tiled exactly 2 times in horizontal directon on this plane,
     # so it's also a nice tiling preview
 
-    lux_mat_name, mat_props = export.material.convert(exporter, mat, scene, None)
-    props.Set(mat_props)
+    _convert_plane_material(exporter, scene, mat, props)
 
     worldscale = utils.get_worldscale(scene, as_scalematrix=False)
 
@@ -153,9 +329,7 @@ def _export_plane_scene(exporter, scene, mat, props, luxcore_scene):
     ]
     luxcore_scene.DefineMesh(mesh_name, vertices, faces, None, uv, None, None)
     # Create object
-    obj_name = "mat_preview_planeobj"
-    props.Set(pyluxcore.Property("scene.objects." + obj_name + ".ply", mesh_name))
-    props.Set(pyluxcore.Property("scene.objects." + obj_name + ".material", lux_mat_name))
+    props.Set(pyluxcore.Property("scene.objects." + PLANE_OBJ_NAME + ".ply", mesh_name))
 
 
 def _create_lights(scene, luxcore_scene, props, is_world_sphere):
@@ -356,6 +530,7 @@ def _convert_obj(exporter, obj, scene, luxcore_scene, props):
             export.hair.convert_hair(exporter, obj, psys, luxcore_scene, scene)
 
     props.Set(obj_props)
+    return exported_obj
 
 
 def _get_preview_settings(scene):
@@ -0,0 +1,133 @@
+import array
+import hashlib
+import threading
+from collections import OrderedDict
+import bpy
+from .. import utils
+from ..utils import hashing
+from ..utils.disk_cache import DiskCache
+
+PREVIEW_CACHE_SUBDIR = "previews"
+# Node properties that only change the node editor, not the material
+NODE_UI_PROPERTIES = {
+    "location", "width", "width_hidden", "height", "dimensions", "select", "hide", "label",
+    "use_custom_color", "color", "show_options", "show_preview", "show_texture", "show_thumbnail",
+}
+# The preview image of the material (and mat.luxcore.preview, which is part of the preview settings)
+MATERIAL_IGNORED_PROPERTIES = {"preview"}
+
+
+class PreviewImageCache(object):
+    """
+    This class is a singleton.
+    Stores finished material previews, keyed by a hash of the material settings, its node trees
+    and the preview settings. Lives in memory and on disk, both with LRU eviction.
+    """
+    # {key: array of RGB(A) imagepipeline pixels}, least recently used first
+    _memory = OrderedDict()
+    _memory_size = 0
+    MAX_MEMORY_SIZE = 64 * 1024 * 1024  # bytes
+    MAX_DISK_SIZE_MB = 256
+
+    _disk = DiskCache(PREVIEW_CACHE_SUBDIR, MAX_DISK_SIZE_MB)
+    # Previews are rendered in job threads, possibly several at once
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_key(scene, obj):
+        mat = obj.active_material
+        width, height = utils.calc_filmsize(scene)
+        preview = mat.luxcore.preview
+        transparent = scene.camera.data.luxcore.imagepipeline.transparent_film
+        # The preview object name tells the preview type (plane, sphere, world sphere etc.)
+        settings = (obj.name, width, height, preview.size, preview.zoom, transparent)
+
+        sha = hashlib.sha1()
+        sha.update(repr(settings).encode("utf-8"))
+        visited = set()
+        # Includes mat.luxcore with all settings, images add their path and modification time
+        hashing.update_rna_struct(sha, mat, scene, visited, MATERIAL_IGNORED_PROPERTIES)
+        _update_node_tree(sha, mat.luxcore.node_tree, scene, visited)
+        return sha.hexdigest()
+
+    @classmethod
+    def get(cls, key):
+        """ Returns the pixel array or None """
+        with cls._lock:
+            pixels = cls._memory.get(key)
+            if pixels is not None:
+                cls._memory.move_to_end(key)
+                return pixels
+
+            filepath = cls._disk.lookup(key + ".bin")
+            if filepath:
+                pixels = array.array("f")
+                with open(filepath, "rb") as f:
+                    pixels.frombytes(f.read())
+                cls._add_to_memory(key, pixels)
+                return pixels
+
+            return None
+
+    @classmethod
+    def put(cls, key, pixels):
+        pixels = array.array("f", pixels)
+        with cls._lock:
+            cls._add_to_memory(key, pixels)
+
+            filepath = cls._disk.get_path(key + ".bin")
+            with open(filepath, "wb") as f:
+                pixels.tofile(f)
+            cls._disk.evict(keep=[filepath])
+
+    @classmethod
+    def _add_to_memory(cls, key, pixels):
+        """ Has to be called with the lock held """
+        if key in cls._memory:
+            cls._memory_size -= cls._nbytes(cls._memory.pop(key))
+
+        cls._memory[key] = pixels
+        cls._memory_size += cls._nbytes(pixels)
+
+        while cls._memory_size > cls.MAX_MEMORY_SIZE and len(cls._memory) > 1:
+            _, evicted = cls._memory.popitem(last=False)
+            cls._memory_size -= cls._nbytes(evicted)
+
+    @staticmethod
+    def _nbytes(pixels):
+        return len(pixels) * pixels.itemsize
+
+
+def _update_node_tree(sha, node_tree, scene, visited):
+    """
+    Updates the sha object with the settings of all nodes and sockets and the links of a node tree.
+    Node trees referenced by nodes (e.g. by a pointer node) are included.
+    """
+    if node_tree is None:
+        sha.update(b"None")
+        return
+    if node_tree.as_pointer() in visited:
+        sha.update(node_tree.name.encode("utf-8"))
+        return
+    visited.add(node_tree.as_pointer())
+
+    for node in sorted(node_tree.nodes, key=lambda n: n.name):
+        visited.add(node.as_pointer())
+        sha.update(repr((node.bl_idname, node.name)).encode("utf-8"))
+        hashing.update_rna_struct(sha, node, scene, visited, NODE_UI_PROPERTIES)
+
+        for socket in node.inputs:
+            sha.update(repr((socket.identifier, socket.enabled)).encode("utf-8"))
+            if hasattr(socket, "default_value"):
+                value = socket.default_value
+                sha.update(repr(tuple(value) if hasattr(value, "__len__") else value).encode("utf-8"))
+
+        for prop in node.bl_rna.properties:
+            if prop.type == "POINTER":
+                value = getattr(node, prop.identifier)
+                if isinstance(value, bpy.types.NodeTree):
+                    _update_node_tree(sha, value, scene, visited)
+
+    for link in node_tree.links:
+        sha.update(repr((link.from_node.name, link.from_socket.identifier,
+                         link.to_node.name, link.to_socket.identifier)).encode("utf-8"))
@@ -0,0 +1,340 @@
+"""
+Offline light group remixing.
+
+At the end of a final render, the raw RADIANCE_GROUP outputs are saved as memory-mapped
+float buffers (.npy files) in the cache directory. A remix recombines them with the current
+light group settings, using the same scale math as LuxCore's radiancescales, and writes
+the result into the render result without rendering again.
+"""
+
+import json
+import os
+import threading
+from time import sleep
+import numpy
+from numpy.lib.format import open_memmap
+import bpy
+from ..bin import pyluxcore
+from .. import utils
+
+REMIX_CACHE_SUBDIR = "remix"
+META_FILENAME = "meta.json"
+ALPHA_FILENAME = "alpha.npy"
+
+# Luminance weights used by LuxCore (Spectrum::Y())
+LUMINANCE_WEIGHTS = numpy.array([0.212671, 0.715160, 0.072169], dtype=numpy.float32)
+
+
+class LightgroupRemix(object):
+    """
+    This class is a singleton.
+    If requested is True, the next final render remixes the saved buffers instead of rendering.
+    """
+    requested = False
+
+
+def get_buffer_dir(scene, layer_name, create=True):
+    blend_name = bpy.path.display_name_from_filepath(bpy.data.filepath) or "untitled"
+    dirname = utils.to_luxcore_name("%s_%s_%s" % (blend_name, scene.name, layer_name))
+    path = os.path.join(utils.get_cache_dir(REMIX_CACHE_SUBDIR), dirname)
+    if create:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
+def has_buffers(scene):
+    for layer in scene.render.layers:
+        if os.path.isfile(os.path.join(get_buffer_dir(scene, layer.name, create=False), META_FILENAME)):
+            return True
+    return False
+
+
+def save_buffers(engine, scene, layer_name):
+    """
+    Called by engine.final after the session was stopped.
+    Saves the raw (unscaled) radiance of each light group.
+    """
+    lightgroup_ids = sorted(engine.exporter.lightgroup_cache)
+    if not lightgroup_ids:
+        return
+
+    directory = get_buffer_dir(scene, layer_name)
+    # Remove buffers of a previous render, the light groups might have changed
+    for filename in os.listdir(directory):
+        os.remove(os.path.join(directory, filename))
+
+    film = engine.session.GetFilm()
+    width, height = utils.calc_filmsize(scene)
+    shape = (height, width, 3)
+    group_names = scene.luxcore.lightgroups.get_pass_names()
+
+    for group_id in lightgroup_ids:
+        buffer = open_memmap(os.path.join(directory, "group_%d.npy" % group_id),
+                             mode="w+", dtype=numpy.float32, shape=shape)
+        film.GetOutputFloat(pyluxcore.FilmOutputType.RADIANCE_GROUP, buffer, group_id)
+        buffer.flush()
+        del buffer
+
+    has_alpha = film.HasOutput(pyluxcore.FilmOutputType.ALPHA)
+    if has_alpha:
+        buffer = open_memmap(os.path.join(directory, ALPHA_FILENAME),
+                             mode="w+", dtype=numpy.float32, shape=(height, width))
+        film.GetOutputFloat(pyluxcore.FilmOutputType.ALPHA, buffer)
+        buffer.flush()
+        del buffer
+
+    meta = {
+        "width": width,
+        "height": height,
+        "groups": {str(group_id): group_names[group_id] for group_id in lightgroup_ids},
+        "alpha": has_alpha,
+    }
+    with open(os.path.join(directory, META_FILENAME), "w") as f:
+        json.dump(meta, f)
+
+    print('[Remix] Saved %d light group buffers of render layer "%s"' % (len(lightgroup_ids), layer_name))
+    # The remix needs the white points of the current temperatures
+    WhitePointProbe.precompute(get_temperatures(scene))
+
+
+def get_temperatures(scene):
+    """ Temperatures of all light groups that use one """
+    lightgroups = scene.luxcore.lightgroups
+    groups = [lightgroups.default] + list(lightgroups.custom)
+    return [group.temperature for group in groups if group.use_temperature]
+
+
+def render(engine, scene):
+    """ Called by engine.final instead of a normal render if a remix was requested """
+    width, height = utils.calc_filmsize(scene)
+    pipeline = scene.camera.data.luxcore.imagepipeline
+
+    for layer in scene.render.layers:
+        if not layer.use:
+            continue
+
+        directory = get_buffer_dir(scene, layer.name)
+        try:
+            with open(os.path.join(directory, META_FILENAME)) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            msg = 'Remix: No saved light groups for render layer "%s"' % layer.name
+            scene.luxcore.errorlog.add_warning(msg)
+            continue
+
+        if (meta["width"], meta["height"]) != (width, height):
+            msg = 'Remix: Resolution of render layer "%s" changed, render again' % layer.name
+            scene.luxcore.errorlog.add_warning(msg)
+            continue
+
+        engine.update_stats("Remix", 'Render layer "%s"' % layer.name)
+        rgba = remix(scene, meta, directory)
+
+        result = engine.begin_result(0, 0, width, height, layer.name)
+        combined = result.layers[0].passes["Combined"]
+        pyluxcore.ConvertFilmChannelOutput_4xFloat_To_4xFloatList(width, height, rgba,
+                                                                 combined.as_pointer(), False)
+        engine.end_result(result)
+
+    _warn_unsupported_plugins(scene, pipeline)
+
+
+def remix(scene, meta, directory):
+    """ Returns a contiguous (height, width, 4) float32 array """
+    height, width = meta["height"], meta["width"]
+    lightgroups = scene.luxcore.lightgroups
+    rgb = numpy.zeros((height, width, 3), dtype=numpy.float32)
+
+    for group_id_str, pass_name in meta["groups"].items():
+        group_id = int(group_id_str)
+
+        if group_id == 0:
+            group = lightgroups.default
+        elif group_id <= len(lightgroups.custom):
+            group = lightgroups.custom[group_id - 1]
+        else:
+            msg = "Remix: Light group %s was removed, using it unchanged" % pass_name
+            scene.luxcore.errorlog.add_warning(msg)
+            group = None
+
+        scale = radiance_scale(group) if group else numpy.ones(3, dtype=numpy.float32)
+        if not scale.any():
+            continue
+
+        buffer = numpy.load(os.path.join(directory, "group_%d.npy" % group_id), mmap_mode="r")
+        rgb += buffer * scale
+
+    _tonemap(rgb, scene.camera.data.luxcore.imagepipeline.tonemapper)
+
+    rgba = numpy.empty((height, width, 4), dtype=numpy.float32)
+    rgba[:, :, :3] = rgb
+
+    transparent = scene.camera.data.luxcore.imagepipeline.transparent_film
+    if transparent and meta["alpha"]:
+        rgba[:, :, 3] = numpy.load(os.path.join(directory, ALPHA_FILENAME), mmap_mode="r")
+    else:
+        rgba[:, :, 3] = 1
+
+    return rgba
+
+
+def radiance_scale(group):
+    """
+    The same scale LuxCore applies with film.imagepipelines.*.radiancescales,
+    see export/imagepipeline.py: globalscale * rgbscale * temperature white point, clamped to 0.
+    """
+    if not group.enabled:
+        return numpy.zeros(3, dtype=numpy.float32)
+
+    scale = numpy.full(3, group.gain, dtype=numpy.float64)
+
+    if group.use_rgb_gain:
+        scale *= group.rgb_gain
+
+    if group.use_temperature:
+        scale *= temperature_to_rgb(group.temperature)
+
+    return numpy.maximum(scale, 0).astype(numpy.float32)
+
+
+def temperature_to_rgb(temperature):
+    """ Linear RGB white point that radiancescales uses for a blackbody temperature """
+    return WhitePointProbe.get(temperature)
+
+
+class WhitePointProbe(object):
+    """
+    This class is a singleton.
+    Reads the white points of blackbody temperatures back from LuxCore, so the remix
+    scales the light groups exactly like radiancescales (LuxCore integrates its tabulated
+    blackbody spectrum with the CIE color matching functions).
+    A 1x1 film of a white environment is rendered once, afterwards only the imagepipeline
+    is executed again with the temperature of each light group.
+    Use precompute() when the temperatures are known, so the remix does not have to wait.
+    """
+    session = None
+    # {temperature: linear RGB}
+    white_points = {}
+    # The probe session is used by the worker thread of precompute() and by get()
+    lock = threading.Lock()
+
+    @classmethod
+    def precompute(cls, temperatures):
+        """ Computes the missing white points in a worker thread """
+        missing = [temperature for temperature in set(temperatures) if temperature not in cls.white_points]
+        if not missing:
+            return
+
+        def run():
+            for temperature in missing:
+                cls.get(temperature)
+
+        threading.Thread(target=run, name="LuxCoreWhitePointProbe", daemon=True).start()
+
+    @classmethod
+    def get(cls, temperature):
+        """ Returns the white point, waits for precompute() or computes it if necessary """
+        with cls.lock:
+            return cls._get(temperature)
+
+    @classmethod
+    def _get(cls, temperature):
+        white_point = cls.white_points.get(temperature)
+        if white_point is not None:
+            return white_point
+
+        if cls.session is None:
+            cls.session = _render_constant_film([1, 1, 1])
+        film = cls.session.GetFilm()
+
+        prefix = "film.imagepipelines.0.radiancescales.0."
+        props = pyluxcore.Properties()
+        props.Set(pyluxcore.Property(prefix + "enabled", True))
+        props.Set(pyluxcore.Property(prefix + "globalscale", 1))
+        props.Set(pyluxcore.Property(prefix + "rgbscale", [1, 1, 1]))
+        props.Set(pyluxcore.Property(prefix + "temperature", temperature))
+        film.Parse(props)
+
+        raw = numpy.empty(3, dtype=numpy.float32)
+        film.GetOutputFloat(pyluxcore.FilmOutputType.RADIANCE_GROUP, raw, 0)
+        scaled = numpy.empty(3, dtype=numpy.float32)
+        film.GetOutputFloat(pyluxcore.FilmOutputType.RGB_IMAGEPIPELINE, scaled)
+
+        white_point = scaled.astype(numpy.float64) / raw
+        cls.white_points[temperature] = white_point
+        return white_point
+
+
+def _render_constant_film(color, width=1, height=1):
+    """
+    Renders one pass of a constant environment light without any visible geometry,
+    every pixel of the light group 0 has exactly the color.
+    Returns the stopped session, its film is still available.
+    """
+    scene = pyluxcore.Scene()
+    # LuxCore needs at least one object, this one is behind the camera
+    scene.DefineMesh("probe_mesh", [(-1, -1, -10), (1, -1, -10), (0, 1, -10)], [(0, 1, 2)],
+                     None, None, None, None)
+
+    scene_props = pyluxcore.Properties()
+    scene_props.SetFromString("""
+        scene.camera.lookat.orig = 0 0 0
+        scene.camera.lookat.target = 0 0 1
+        scene.materials.probe_mat.type = matte
+        scene.objects.probe_obj.shape = probe_mesh
+        scene.objects.probe_obj.material = probe_mat
+        scene.lights.probe_env.type = constantinfinite
+    """)
+    scene_props.Set(pyluxcore.Property("scene.lights.probe_env.color", list(color)))
+    scene.Parse(scene_props)
+
+    config_props = pyluxcore.Properties()
+    config_props.SetFromString("""
+        renderengine.type = PATHCPU
+        sampler.type = RANDOM
+        film.filter.type = NONE
+        film.imagepipelines.0.0.type = TONEMAP_LINEAR
+        film.imagepipelines.0.0.scale = 1
+        batch.haltspp = 1
+        native.threads.count = 1
+    """)
+    config_props.Set(pyluxcore.Property("film.width", width))
+    config_props.Set(pyluxcore.Property("film.height", height))
+
+    session = pyluxcore.RenderSession(pyluxcore.RenderConfig(config_props, scene))
+    session.Start()
+    while not session.HasDone():
+        sleep(0.01)
+        session.UpdateStats()
+    session.Stop()
+    return session
+
+
+def _tonemap(rgb, tonemapper):
+    if not tonemapper.enabled or tonemapper.type != "TONEMAP_LINEAR":
+        return
+
+    if tonemapper.use_autolinear:
+        # Same as LuxCore's AutoLinearToneMap (no gamma correction plugin in Blender)
+        luminance = rgb.dot(LUMINANCE_WEIGHTS)
+        valid = numpy.isfinite(luminance) & (luminance > 0)
+        average = luminance[valid].sum() / luminance.size
+        if average > 0:
+            rgb *= 1.25 / average * (118 / 255)
+
+    rgb *= tonemapper.linear_scale
+
+
+def _warn_unsupported_plugins(scene, pipeline):
+    unsupported = []
+
+    if pipeline.tonemapper.enabled and pipeline.tonemapper.type != "TONEMAP_LINEAR":
+        unsupported.append("tonemapper")
+    for name in ("backgroundimage", "mist", "bloom", "coloraberration",
+                 "vignetting", "camera_response_func", "contour_lines"):
+        if getattr(pipeline, name).enabled:
+            unsupported.append(name)
+
+    if unsupported:
+        msg = "Remix: Ignored imagepipeline settings: " + ", ".join(unsupported)
+        scene.luxcore.errorlog.add_warning(msg)
@@ -1,12 +1,17 @@
 from time import time
 from ..bin import pyluxcore
 from .. import utils
+from ..utils import hashing
 from . import (
     blender_object, caches, camera, config, duplis,
     imagepipeline, light, material, motion_blur, hair,
     world, halt,
 )
+from . import image as image_export
+from . import material_features
 from .light import WORLD_BACKGROUND_LIGHT_NAME
+from .light_importance import LightImportanceEstimator
+from .export_cache import ExportCacheStats
 
 
 class Change:
@@ -65,14 +70,102 @@ class Exporter(object):
         # If a light/material uses a lightgroup, the id is stored here during export
         self.lightgroup_cache = set()
 
-    def create_session(self, context=None, engine=None):
+        # Render time in seconds of a resumed checkpoint (see engine/checkpoint.py),
+        # subtracted from the halt time
+        self.resumed_time = 0
+        # Set by the animation budget planner (see engine/budget_planner.py)
+        self.halt_plan = None
+        # Maximum image size in the viewport render, 0 = no limit (see export/image_proxy.py)
+        self.texture_size_limit = 0
+        # Smoke grid resolution divisor in the viewport render (see export/volume_cache.py)
+        self.volume_downsampling = 1
+        # Set if the light importance is estimated automatically (see export/light_importance.py)
+        self.importance_estimator = None
+        # Hash of the scene geometry, computed on demand (see get_geometry_hash())
+        self._geometry_hash = None
+        # {object key: mesh hash} of objects with identical meshes, and the shapes they were exported as
+        # (only in final render, see blender_object.find_shared_meshes())
+        self.shared_mesh_data = {}
+        # {shared mesh key: mesh_definitions}
+        self.shared_shapes = {}
+        # Estimated LuxCore memory usage of image textures for the report before rendering
+        # {(filepath, storage, channel): (image name, bytes)}
+        self.texture_memory = {}
+        # Smoke grids read in the current export, shared by all smoke nodes (see export/smoke.py)
+        # {(domain key, channel, frame): (resolution, float array)}
+        self.smoke_cache = {}
+        # Mesh attributes needed by each material, so meshes are exported without unused ones
+        # {material key: MaterialFeatures} (see export/material_features.py)
+        self.material_features = {}
+        # Hits and misses of the export cache in final render (see export/export_cache.py)
+        self.export_cache_stats = ExportCacheStats()
+
+    def get_geometry_hash(self):
+        """ Hash of the visible geometry in the scene, computed once per export """
+        if self._geometry_hash is None:
+            self._geometry_hash = hashing.hash_scene_geometry(self.scene)
+        return self._geometry_hash
+
+    def get_material_features(self, mat):
+        """ The node tree of each material is analyzed only once per export """
+        if mat is None:
+            return material_features.MaterialFeatures()
+
+        key = utils.make_key(mat)
+        features = self.material_features.get(key)
+        if features is None:
+            features = material_features.analyze(mat)
+            self.material_features[key] = features
+        return features
+
+    def update_material_features(self, mat):
+        """ Call when the material changed. Returns True if it needs different mesh attributes now """
+        key = utils.make_key(mat)
+        old_features = self.material_features.pop(key, None)
+        return old_features is not None and self.get_material_features(mat) != old_features
+
+    def add_texture_memory(self, image, filepath, storage, channel):
+        # LuxCore shares imagemaps with the same file and settings
+        key = (filepath, storage, channel)
+        if key in self.texture_memory:
+            return
+        try:
+            size = image_export.estimate_memory(image, filepath, storage, channel)
+        except (KeyError, ValueError):
+            size = 0
+        self.texture_memory[key] = (image.name, size)
+
+    def print_texture_memory_report(self):
+        if not self.texture_memory:
+            return
+
+        print("[Exporter] Estimated texture memory:")
+        entries = sorted(self.texture_memory.items(), key=lambda item: item[1][1], reverse=True)
+        for (filepath, storage, channel), (name, size) in entries:
+            print("    %8.1f MB  %s (%s, %s)" % (size / (1024 * 1024), name, storage, channel))
+        total = sum(size for _, size in self.texture_memory.values())
+        print("    %8.1f MB  Total (%d images)" % (total / (1024 * 1024), len(self.texture_memory)))
+
+    def create_session(self, context=None, engine=None, checkpoint=None):
         # Notes:
         # In final render, context is None
         # In viewport render, engine is None (we can't show messages or check test_break() anyway)
+        # If a checkpoint is passed and it is compatible, the session continues from it
 
         print("[Exporter] create_session")
         start = time()
         scene = self.scene
+        self.texture_memory = {}
+        self._geometry_hash = None
+        self.export_cache_stats = ExportCacheStats()
+        self.material_features = {}
+
+        display = scene.luxcore.display
+        if context and display.use_viewport_texture_limit:
+            self.texture_size_limit = display.viewport_texture_limit
+        if context:
+            self.volume_downsampling = int(display.viewport_volume_downsampling)
+
         # Scene
         luxcore_scene = pyluxcore.Scene()
         scene_props = pyluxcore.Properties()
@@ -85,6 +178,13 @@ class Exporter(object):
         objs = context.visible_objects if context else scene.objects
         len_objs = len(objs)
 
+        if scene.luxcore.config.use_auto_importance:
+            self.importance_estimator = LightImportanceEstimator(scene, objs, context)
+
+        if not context and not scene.luxcore.config.use_export_cache:
+            # Objects with identical meshes are instanced from shared shapes
+            self.shared_mesh_data = blender_object.find_shared_meshes(objs, scene)
+
         for index, obj in enumerate(objs, start=1):
             if obj.type in {"MESH", "CURVE", "SURFACE", "META", "FONT", "LAMP", "EMPTY"}:
                 if engine:
@@ -106,7 +206,10 @@ class Exporter(object):
             enabled = blur_settings.enable and (blur_settings.object_blur or camera_blur)
 
             if enabled and blur_settings.shutter > 0:
-                motion_blur_props, cam_moving = motion_blur.convert(context, scene, objs, self.exported_objects)
+                # In animation renders, subframes are shared with the previous frame
+                use_cache = engine is not None and engine.is_animation
+                motion_blur_props, cam_moving = motion_blur.convert(context, scene, objs, self.exported_objects,
+                                                                    use_cache)
 
                 if cam_moving:
                     # Re-export the camera with motion blur enabled
@@ -121,6 +224,8 @@ class Exporter(object):
         scene_props.Set(world_props)
 
         luxcore_scene.Parse(scene_props)
+        # The grid data was copied into the properties
+        self.smoke_cache.clear()
 
         # Regularly check if we should abort the export (important in heavy scenes)
         if engine and engine.test_break():
@@ -135,6 +240,18 @@ class Exporter(object):
         # Init config cache (convert to string here because config_props gets changed below)
         self.config_cache.diff(str(config_props))
 
+        start_state = None
+        start_film = None
+        if checkpoint:
+            # Imagepipeline and halt conditions are not part of the key,
+            # they can be changed without invalidating the checkpoint.
+            # Meshes are not part of the scene properties, so the geometry is hashed separately
+            checkpoint.set_key(str(config_props), str(scene_props), self.get_geometry_hash())
+            resume = checkpoint.load()
+            if resume:
+                start_state, start_film = resume
+                self.resumed_time = checkpoint.resumed_time
+
         # Imagepipeline
         imagepipeline_props = imagepipeline.convert(scene, context)
         self.imagepipeline_cache.diff(imagepipeline_props)  # Init imagepipeline cache
@@ -142,7 +259,7 @@ class Exporter(object):
         config_props.Set(imagepipeline_props)
 
         # Halt conditions
-        halt_props = halt.convert(scene)
+        halt_props = halt.convert(scene, self.resumed_time, self.halt_plan)
         self.halt_cache.diff(halt_props)
         config_props.Set(halt_props)
 
@@ -155,6 +272,9 @@ class Exporter(object):
 
         export_time = time() - start
         print("Export took %.1f s" % export_time)
+        if engine:
+            self.print_texture_memory_report()
+            self.export_cache_stats.print_report()
 
         if engine:
             if config_props.Get("renderengine.type").GetString().endswith("OCL"):
@@ -166,7 +286,10 @@ class Exporter(object):
 
         # Create session (in case of OpenCL engines, render kernels are compiled here)
         start = time()
-        session = pyluxcore.RenderSession(renderconfig)
+        if start_state:
+            session = pyluxcore.RenderSession(renderconfig, start_state, start_film)
+        else:
+            session = pyluxcore.RenderSession(renderconfig)
         elapsed_msg = "Session created in %.1f s" % (time() - start)
         print(elapsed_msg)
 
@@ -189,13 +312,13 @@ class Exporter(object):
             if self.object_cache.diff(scene):
                 changes |= Change.OBJECT
 
-            if self.material_cache.diff():
+            if self.material_cache.diff(scene):
                 changes |= Change.MATERIAL
 
             if self.visibility_cache.diff(context):
                 changes |= Change.VISIBILITY
 
-            if self.world_cache.diff(context):
+            if self.world_cache.diff(context.scene):
                 changes |= Change.WORLD
 
         # Relevant during final render
@@ -205,7 +328,7 @@ class Exporter(object):
 
         if final:
             # Halt conditions are only used during final render
-            halt_props = halt.convert(scene)
+            halt_props = halt.convert(scene, self.resumed_time, self.halt_plan)
             if self.halt_cache.diff(halt_props):
                 changes |= Change.HALT
 
@@ -215,6 +338,8 @@ class Exporter(object):
         print("[Exporter] Update because of:", Change.to_string(changes))
         # Invalidate node cache
         self.node_cache.clear()
+        self.smoke_cache.clear()
+        self._geometry_hash = None
 
         if changes & Change.CONFIG:
             # We already converted the new config settings during get_changes(), re-use them
@@ -225,7 +350,7 @@ class Exporter(object):
             session.BeginSceneEdit()
 
             try:
-                props = self._update_scene(context, changes, luxcore_scene)
+                props = self._update_scene(context.scene, context, changes, luxcore_scene)
                 luxcore_scene.Parse(props)
             except Exception as error:
                 context.scene.luxcore.errorlog.add_error(error)
@@ -250,6 +375,7 @@ class Exporter(object):
         if changes & Change.REQUIRES_SESSION_PARSE:
             self.update_session(changes, session)
 
+        self.smoke_cache.clear()
         # We have to return and re-assign the session in the RenderEngine,
         # because it might have been replaced in _update_config()
         return session
@@ -260,6 +386,65 @@ class Exporter(object):
         if changes & Change.HALT:
             session.Parse(self.halt_cache.props)
 
+    def resume_final(self, renderconfig, changes, engine):
+        """
+        Applies the changes since the last final render to the LuxCore scene that was kept
+        (see engine/persistent_data.py) and returns a new session with a fresh film.
+        The object, material and visibility caches have to be filled by the caller.
+        """
+        print("[Exporter] Persistent data update because of:", Change.to_string(changes))
+        start = time()
+        scene = self.scene
+        self.node_cache.clear()
+        self.texture_memory = {}
+        self._geometry_hash = None
+        self.export_cache_stats = ExportCacheStats()
+        luxcore_scene = renderconfig.GetScene()
+
+        # Meshes might have been edited, duplicated or made unique since the last render.
+        # The shared shapes are named after their key, so the ones of unchanged meshes stay valid
+        if not scene.luxcore.config.use_export_cache:
+            self.shared_mesh_data = blender_object.find_shared_meshes(scene.objects, scene)
+        else:
+            self.shared_mesh_data = {}
+
+        # The camera is cheap to export and Blender does not flag all changes (e.g. of the render size)
+        self.camera_cache.diff(self, scene, None)
+        changes |= Change.CAMERA
+
+        # There is no running session, so the changes can be parsed without BeginSceneEdit()
+        props = self._update_scene(scene, None, changes, luxcore_scene)
+        luxcore_scene.Parse(props)
+        self.smoke_cache.clear()
+
+        if engine.test_break():
+            return None
+
+        config_props = config.convert(self, scene, None, engine)
+        if str(config_props) == "":
+            # Config props are empty: there was a critical error in config export, we can't render
+            raise Exception("Errors in config, check error log")
+        self.config_cache.diff(str(config_props))
+
+        imagepipeline_props = imagepipeline.convert(scene, None)
+        self.imagepipeline_cache.diff(imagepipeline_props)
+        config_props.Set(imagepipeline_props)
+
+        halt_props = halt.convert(scene, self.resumed_time, self.halt_plan)
+        self.halt_cache.diff(halt_props)
+        config_props.Set(halt_props)
+        renderconfig.Parse(config_props)
+
+        export_time = time() - start
+        print("Update took %.1f s" % export_time)
+        self.export_cache_stats.print_report()
+        engine.update_stats("Export Finished (%.1f s)" % export_time, "Creating RenderSession...")
+
+        start = time()
+        session = pyluxcore.RenderSession(renderconfig)
+        print("Session created in %.1f s" % (time() - start))
+        return session
+
     def _convert_object(self, props, obj, scene, context, luxcore_scene,
                         update_mesh=False, dupli_suffix="", engine=None):
         key = utils.make_key(obj)
@@ -314,30 +499,67 @@ class Exporter(object):
         session.Start()
         return session
 
-    def _update_scene(self, context, changes, luxcore_scene):
+    def _update_scene(self, scene, context, changes, luxcore_scene):
+        """ In final render (persistent data, see engine/persistent_data.py), context is None """
         props = pyluxcore.Properties()
 
+        # Lamps whose estimated importance changed (see export/light_importance.py)
+        importance_keys = set()
+
         if changes & Change.CAMERA:
             # We already converted the new camera settings during get_changes(), re-use them
             props.Set(self.camera_cache.props)
 
+            if self.importance_estimator:
+                # The estimates depend on the distance to the view frustum
+                objs = context.visible_objects if context else scene.objects
+                importance_keys |= self.importance_estimator.update_view(objs, context)
+
         if changes & Change.OBJECT:
             for obj in self.object_cache.changed_transform:
                 print("transformed:", obj.name)
-                self._convert_object(props, obj, context.scene, context, luxcore_scene, update_mesh=False)
+                # In final render, the transformation is baked into the mesh of non-instanced objects
+                self._convert_object(props, obj, scene, context, luxcore_scene, update_mesh=not context)
 
             for obj in self.object_cache.changed_mesh:
                 print("mesh changed:", obj.name)
-                self._convert_object(props, obj, context.scene, context, luxcore_scene, update_mesh=True)
+                self._convert_object(props, obj, scene, context, luxcore_scene, update_mesh=True)
+
+            lamps = self.object_cache.lamps
+            if self.importance_estimator and lamps:
+                importance_keys |= self.importance_estimator.update(lamps)
 
-            for obj in self.object_cache.lamps:
+            for obj in lamps:
                 print("lamp changed:", obj.name)
-                self._convert_object(props, obj, context.scene, context, luxcore_scene)
+                self._convert_object(props, obj, scene, context, luxcore_scene)
+            importance_keys -= {utils.make_key(obj) for obj in lamps}
+
+        if importance_keys:
+            # The importance of all estimated lamps depends on the sum of the estimates
+            objs = context.visible_objects if context else scene.objects
+            for obj in objs:
+                key = utils.make_key(obj)
+                if key in importance_keys and key in self.exported_objects:
+                    print("lamp importance changed:", obj.name)
+                    self._convert_object(props, obj, scene, context, luxcore_scene)
 
         if changes & Change.MATERIAL:
+            changed_features = set()
             for mat in self.material_cache.changed_materials:
-                luxcore_name, mat_props = material.convert(self, mat, context.scene, context)
+                luxcore_name, mat_props = material.convert(self, mat, scene, context)
                 props.Set(mat_props)
+                if self.update_material_features(mat):
+                    changed_features.add(utils.make_key(mat))
+
+            if changed_features:
+                # The meshes were exported without attributes that the materials need now (e.g. UVs)
+                objs = context.visible_objects if context else scene.objects
+                for obj in objs:
+                    if obj.type in {"MESH", "CURVE", "SURFACE", "META", "FONT"} and any(
+                            slot.material and utils.make_key(slot.material) in changed_features
+                            for slot in obj.material_slots):
+                        print("material features changed:", obj.name)
+                        self._convert_object(props, obj, scene, context, luxcore_scene, update_mesh=True)
 
         if changes & Change.VISIBILITY:
             for key in self.visibility_cache.objects_to_remove:
@@ -364,15 +586,16 @@ class Exporter(object):
 
                 del self.exported_objects[key]
 
+            objs = context.visible_objects if context else scene.objects
             for key in self.visibility_cache.objects_to_add:
-                obj = utils.obj_from_key(key, context.visible_objects)
-                self._convert_object(props, obj, context.scene, context, luxcore_scene)
+                obj = utils.obj_from_key(key, objs)
+                self._convert_object(props, obj, scene, context, luxcore_scene)
 
         if changes & Change.WORLD:
-            if context.scene.world.luxcore.light == "none":
+            if scene.world and scene.world.luxcore.light == "none":
                 luxcore_scene.DeleteLight(WORLD_BACKGROUND_LIGHT_NAME)
 
-            world_props = world.convert(self, context.scene)
+            world_props = world.convert(self, scene)
             props.Set(world_props)
 
         return props
@@ -1,10 +1,13 @@
+import os
 import bpy
 from ..bin import pyluxcore
 from .. import utils
 from ..utils import ExportedObject
-from ..utils import node as utils_node
+from ..utils import hashing
 
 from . import material
+from .export_cache import ExportCache
+from .material_features import get_object_features
 from .light import convert_lamp
 
 
@@ -44,7 +47,53 @@ def convert(exporter, blender_obj, scene, context, luxcore_scene,
             obj_transform = None
             mesh_transform = transformation
 
-        if update_mesh:
+        # Mesh attributes that are not used by any material of the object are not exported
+        features = get_object_features(exporter, blender_obj, scene, context)
+        use_proxy = blender_obj.luxcore.use_proxy and blender_obj.luxcore.proxies
+        # Only in final render, see export/export_cache.py
+        use_export_cache = (not context and not dupli_suffix and update_mesh and not use_proxy
+                            and blender_obj.type == "MESH" and scene.luxcore.config.use_export_cache)
+        # Objects with identical meshes share their shapes in final render (see find_shared_meshes()).
+        # With the export cache, they get the same cached shapes anyway.
+        inputs_hash = None
+        if not context and not dupli_suffix and update_mesh and not use_proxy and not use_export_cache:
+            inputs_hash = exporter.shared_mesh_data.get(utils.make_key(blender_obj))
+        can_share = inputs_hash is not None
+        shared_key = None
+        shared_definitions = None
+        # {lux_object_name: shape name}, only for objects that use the shapes of another object
+        shape_names = {}
+
+        if can_share:
+            # Shapes can only be shared if the transformation is not baked into them
+            obj_transform = transformation
+            mesh_transform = None
+            shared_key = "%s_%d%d" % (inputs_hash, features.uv, features.vertex_colors)
+            shared_definitions = exporter.shared_shapes.get(shared_key)
+            if shared_definitions and not all(luxcore_scene.IsMeshDefined("Mesh-" + src_name)
+                                              for src_name, _ in shared_definitions):
+                # The shapes were removed from a kept scene (see resume_final())
+                shared_definitions = None
+
+        if use_proxy:
+            # The shapes are loaded by LuxCore from the PLY files, the mesh in Blender is only a placeholder
+            obj_transform = transformation
+            mesh_definitions = []
+            for proxy in blender_obj.luxcore.proxies:
+                filepath = utils.get_abspath(proxy.filepath, blender_obj.library, must_be_existing_file=True)
+                shape_name = _define_proxy_shape(props, filepath, luxcore_scene)
+                lux_object_name = luxcore_name + "_proxy%03d" % proxy.material_index
+                mesh_definitions.append([lux_object_name, proxy.material_index])
+                shape_names[lux_object_name] = shape_name
+        elif use_export_cache:
+            obj_transform = transformation
+            mesh_definitions = _convert_cached_shapes(exporter, blender_obj, scene, luxcore_scene,
+                                                      luxcore_name, props, shape_names, features)
+            if mesh_definitions is None:
+                # This is not worth a warning in the errorlog
+                print(blender_obj.name + ": No mesh data after to_mesh()")
+                return props, None
+        elif update_mesh and shared_definitions is None:
             # print("converting mesh:", blender_obj.data.name)
             modifier_mode = "PREVIEW" if context else "RENDER"
             apply_modifiers = True
@@ -59,13 +108,28 @@ def convert(exporter, blender_obj, scene, context, luxcore_scene,
 
             # mesh.calc_normals_split()
             # mesh.update(calc_edges=True, calc_tessface=True)
-            mesh_definitions = _convert_mesh_to_shapes(luxcore_name, mesh, luxcore_scene, mesh_transform)
+            if can_share:
+                # The shapes are named after the key, not after this object, so they never
+                # change for the other objects if this object is edited later
+                shared_definitions = _convert_mesh_to_shapes("Shared_" + shared_key, mesh, luxcore_scene,
+                                                             None, features)
+                exporter.shared_shapes[shared_key] = shared_definitions
+            else:
+                mesh_definitions = _convert_mesh_to_shapes(luxcore_name, mesh, luxcore_scene, mesh_transform, features)
             bpy.data.meshes.remove(mesh, do_unlink=False)
-        else:
+        elif not update_mesh:
             assert exported_object is not None
             print(blender_obj.name + ": Using cached mesh")
             mesh_definitions = exported_object.mesh_definitions
 
+        if shared_definitions is not None:
+            mesh_definitions = []
+            for i, (src_name, material_index) in enumerate(shared_definitions):
+                lux_object_name = luxcore_name + "_shared%03d" % i
+                mesh_definitions.append([lux_object_name, material_index])
+                # The "Mesh-" prefix is hardcoded in Scene_DefineBlenderMesh1 in the LuxCore API
+                shape_names[lux_object_name] = "Mesh-" + src_name
+
         render_layer = utils.get_current_render_layer(scene)
         override_mat = render_layer.material_override if render_layer else None
 
@@ -91,8 +155,8 @@ def convert(exporter, blender_obj, scene, context, luxcore_scene,
                     lux_mat_name, mat_props = material.fallback()
 
             props.Set(mat_props)
-            _define_luxcore_object(props, lux_object_name, lux_mat_name, obj_transform,
-                                   blender_obj, scene, context, duplicator)
+            _define_luxcore_object(props, lux_object_name, lux_mat_name, obj_transform, blender_obj,
+                                   scene, context, duplicator, features, shape_names.get(lux_object_name))
 
         return props, ExportedObject(mesh_definitions)
     except Exception as error:
@@ -103,15 +167,78 @@ def convert(exporter, blender_obj, scene, context, luxcore_scene,
         return pyluxcore.Properties(), None
 
 
-def _handle_pointiness(props, luxcore_shape_name, blender_obj):
-    use_pointiness = False
+def find_shared_meshes(objects, scene):
+    """
+    Returns {object key: hash} of the mesh objects whose evaluated mesh is identical to the one
+    of another object (Alt+D and Shift+D copies, imported duplicates). These objects share their shapes.
+    The hash covers everything that goes into to_mesh() (see utils.hashing.hash_mesh_object_inputs()),
+    so the meshes are compared without evaluating them.
+    """
+    hashes = {}
+    for obj in objects:
+        if (obj.type == "MESH" and obj.data and not (obj.luxcore.use_proxy and obj.luxcore.proxies)
+                and utils.is_obj_visible(obj, scene)):
+            if any(mod.show_render and mod.type in hashing.TIME_DEPENDENT_MODIFIERS for mod in obj.modifiers):
+                # Simulations have a cache per object, equal inputs don't mean equal results
+                continue
+            hashes[utils.make_key(obj)] = hashing.hash_mesh_object_inputs(obj, scene)
+
+    counts = {}
+    for inputs_hash in hashes.values():
+        counts[inputs_hash] = counts.get(inputs_hash, 0) + 1
+    return {key: inputs_hash for key, inputs_hash in hashes.items() if counts[inputs_hash] > 1}
+
+
+def _convert_cached_shapes(exporter, blender_obj, scene, luxcore_scene, luxcore_name, props, shape_names,
+                           features):
+    """
+    Loads the shapes from the export cache, or evaluates the mesh and stores its shapes in the cache.
+    The shapes are in object space. Returns the mesh definitions, or None if the mesh has no faces.
+    """
+    inputs_hash = hashing.hash_mesh_object_inputs(blender_obj, scene)
+    key = ExportCache.get_key(hashing.hash_values(inputs_hash, features.uv, features.vertex_colors))
+    used_paths = exporter.export_cache_stats.used_paths
+    shapes = ExportCache.load(key, used_paths)
+
+    if shapes is None:
+        mesh = blender_obj.to_mesh(scene, True, "RENDER")
+        if mesh is None or len(mesh.tessfaces) == 0:
+            if mesh:
+                bpy.data.meshes.remove(mesh, do_unlink=False)
+            return None
+
+        try:
+            active_uv = utils.find_active_uv(mesh.tessface_uv_textures) if features.uv else None
+            shapes = ExportCache.save(key, mesh, active_uv, features.vertex_colors, used_paths)
+        finally:
+            bpy.data.meshes.remove(mesh, do_unlink=False)
+        exporter.export_cache_stats.misses += 1
+    else:
+        print(blender_obj.name + ": Using mesh from export cache")
+        exporter.export_cache_stats.hits += 1
 
-    for mat_slot in blender_obj.material_slots:
-        mat = mat_slot.material
-        if mat and mat.luxcore.node_tree:
-            # Material with nodetree, check the nodes for pointiness node
-            use_pointiness = utils_node.find_nodes(mat.luxcore.node_tree, "LuxCoreNodeTexPointiness")
+    mesh_definitions = []
+    for material_index, filepath in shapes:
+        lux_object_name = luxcore_name + "_cached%03d" % material_index
+        mesh_definitions.append([lux_object_name, material_index])
+        shape_names[lux_object_name] = _define_proxy_shape(props, filepath, luxcore_scene)
+    return mesh_definitions
 
+
+def _define_proxy_shape(props, filepath, luxcore_scene):
+    """ Objects that use the same file share the shape, so LuxCore only loads it once """
+    # The modification time is part of the name, so a re-exported proxy is loaded again
+    shape_name = "Proxy-" + hashing.hash_values(filepath, os.path.getmtime(filepath))
+    if luxcore_scene.IsMeshDefined(shape_name):
+        return shape_name
+
+    prefix = "scene.shapes." + shape_name + "."
+    props.Set(pyluxcore.Property(prefix + "type", "mesh"))
+    props.Set(pyluxcore.Property(prefix + "ply", filepath))
+    return shape_name
+
+
+def _handle_pointiness(props, luxcore_shape_name, use_pointiness):
     if use_pointiness:
         pointiness_shape = luxcore_shape_name + "_pointiness"
         prefix = "scene.shapes." + pointiness_shape + "."
@@ -123,10 +250,13 @@ def _handle_pointiness(props, luxcore_shape_name, blender_obj):
 
 
 def _define_luxcore_object(props, lux_object_name, lux_material_name, obj_transform,
-                           blender_obj, scene, context, duplicator):
-    # The "Mesh-" prefix is hardcoded in Scene_DefineBlenderMesh1 in the LuxCore API
-    luxcore_shape_name = "Mesh-" + lux_object_name
-    luxcore_shape_name = _handle_pointiness(props, luxcore_shape_name, blender_obj)
+                           blender_obj, scene, context, duplicator, features, shape_name=None):
+    if shape_name:
+        luxcore_shape_name = shape_name
+    else:
+        # The "Mesh-" prefix is hardcoded in Scene_DefineBlenderMesh1 in the LuxCore API
+        luxcore_shape_name = "Mesh-" + lux_object_name
+    luxcore_shape_name = _handle_pointiness(props, luxcore_shape_name, features.pointiness)
 
     prefix = "scene.objects." + lux_object_name + "."
     props.Set(pyluxcore.Property(prefix + "material", lux_material_name))
@@ -141,18 +271,18 @@ def _define_luxcore_object(props, lux_object_name, lux_material_name, obj_transf
     props.Set(pyluxcore.Property(prefix + "camerainvisible", not visible_to_cam))
 
 
-def _convert_mesh_to_shapes(name, mesh, luxcore_scene, mesh_transform):
+def _convert_mesh_to_shapes(name, mesh, luxcore_scene, mesh_transform, features):
     faces = mesh.tessfaces[0].as_pointer()
     vertices = mesh.vertices[0].as_pointer()
 
     uv_textures = mesh.tessface_uv_textures
-    active_uv = utils.find_active_uv(uv_textures)
+    active_uv = utils.find_active_uv(uv_textures) if features.uv else None
     if active_uv and active_uv.data:
         texCoords = active_uv.data[0].as_pointer()
     else:
         texCoords = 0
 
-    vertex_color = mesh.tessface_vertex_colors.active
+    vertex_color = mesh.tessface_vertex_colors.active if features.vertex_colors else None
     if vertex_color:
         vertexColors = vertex_color.data[0].as_pointer()
     else:
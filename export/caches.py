@@ -79,13 +79,20 @@ class ObjectCache(object):
 class MaterialCache(object):
     def __init__(self):
         self._reset()
+        self.last_frame = None
 
     def _reset(self):
         self.changed_materials = []
 
-    def diff(self):
+    def diff(self, scene=None):
         self._reset()
 
+        if scene and scene.frame_current != self.last_frame:
+            if self.last_frame is not None:
+                # Image sequences show a different image in the new frame
+                self.changed_materials += self._find_materials_with_sequences()
+            self.last_frame = scene.frame_current
+
         if bpy.data.materials.is_updated:
             for mat in bpy.data.materials:
                 node_tree = mat.luxcore.node_tree
@@ -104,11 +111,23 @@ class MaterialCache(object):
                         if pointer_tree and (pointer_tree.is_updated or pointer_tree.is_updated_data):
                             mat_updated = True
 
-                if mat_updated:
+                if mat_updated and mat not in self.changed_materials:
                     self.changed_materials.append(mat)
 
         return self.changed_materials
 
+    def _find_materials_with_sequences(self):
+        result = []
+        for mat in bpy.data.materials:
+            node_tree = mat.luxcore.node_tree
+            if not node_tree:
+                continue
+            for node in utils_node.find_nodes(node_tree, "LuxCoreNodeTexImagemap"):
+                if node.image and node.image.source == "SEQUENCE":
+                    result.append(mat)
+                    break
+        return result
+
 
 class VisibilityCache(object):
     def __init__(self):
@@ -135,8 +154,8 @@ class VisibilityCache(object):
 
 
 class WorldCache(object):
-    def diff(self, context):
-        world = context.scene.world
+    def diff(self, scene):
+        world = scene.world
         if world:
             world_updated = world.is_updated or world.is_updated_data
 
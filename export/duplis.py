@@ -4,6 +4,9 @@ from . import blender_object
 from time import time
 from array import array
 
+# Number of dupli lights that are parsed into the properties at once
+LIGHT_BATCH_SIZE = 1000
+
 
 class Duplis:
     def __init__(self, exported_obj, matrix):
@@ -16,6 +19,36 @@ class Duplis:
         self.count += 1
 
 
+class LightTemplate:
+    """
+    The properties of a light without its name and transformation.
+    Lamps are converted once per lamp object and the instances are stamped out from the
+    template, which avoids to look up images and IES files again for each dupli.
+    """
+    def __init__(self, props, luxcore_name):
+        prefix = "scene.lights." + luxcore_name + "."
+        # Lines of the form "subkey = value"
+        self.lines = []
+
+        for line in str(props).splitlines():
+            if not line.startswith(prefix):
+                continue
+            subkey = line[len(prefix):]
+            if subkey.startswith("transformation ="):
+                continue
+            self.lines.append(subkey)
+
+    def is_supported(self):
+        # Blob values are not preserved by the string representation
+        return not any(line.startswith("iesblob") for line in self.lines)
+
+    def instantiate(self, luxcore_name, matrix_list, lines):
+        """ Appends the property lines of one light to lines """
+        prefix = "scene.lights." + luxcore_name + "."
+        lines.extend(prefix + subkey for subkey in self.lines)
+        lines.append(prefix + "transformation = " + " ".join(str(x) for x in matrix_list))
+
+
 def convert(exporter, duplicator, scene, context, luxcore_scene, engine=None):
     """
     Converts particle systems and dupliverts/faces (everything apart from hair).
@@ -37,6 +70,10 @@ def convert(exporter, duplicator, scene, context, luxcore_scene, engine=None):
 
         name_prefix = utils.get_luxcore_name(duplicator, context)
         exported_duplis = {}
+        # {name: LightTemplate or None if the lamp can't be instanced}
+        light_templates = {}
+        light_lines = []
+        light_instance_count = 0
         non_invertible_count = 0
 
         dupli_count = len(duplicator.dupli_list)
@@ -57,13 +94,31 @@ def convert(exporter, duplicator, scene, context, luxcore_scene, engine=None):
             if dupli.object.type == "LAMP" and not dupli.object.data.type == "AREA":
                 # It is a light
                 name_suffix = _get_name_suffix(name_prefix, dupli, context)
-                light_props, exported_light = blender_object.convert(exporter, dupli.object, scene, context, luxcore_scene,
-                                                                     update_mesh=True, dupli_suffix=name_suffix)
-                for luxcore_name in exported_light.luxcore_names:
-                    key = "scene.lights." + luxcore_name + ".transformation"
-                    light_props.Set(pyluxcore.Property(key, matrix_list))
-
-                dupli_props.Set(light_props)
+                template = light_templates.get(name)
+
+                if template:
+                    light_name = utils.get_luxcore_name(dupli.object, context) + name_suffix
+                    template.instantiate(light_name, matrix_list, light_lines)
+                    light_instance_count += 1
+
+                    if light_instance_count % LIGHT_BATCH_SIZE == 0:
+                        dupli_props.SetFromString("\n".join(light_lines))
+                        light_lines = []
+                else:
+                    light_props, exported_light = blender_object.convert(exporter, dupli.object, scene, context,
+                                                                         luxcore_scene, update_mesh=True,
+                                                                         dupli_suffix=name_suffix)
+                    # exported_light is None if the conversion failed, the error was already reported
+                    if exported_light:
+                        for luxcore_name in exported_light.luxcore_names:
+                            key = "scene.lights." + luxcore_name + ".transformation"
+                            light_props.Set(pyluxcore.Property(key, matrix_list))
+
+                        dupli_props.Set(light_props)
+
+                        if name not in light_templates:
+                            template = LightTemplate(light_props, exported_light.luxcore_names[0])
+                            light_templates[name] = template if template.is_supported() else None
             else:
                 # It is an object or area light
                 try:
@@ -95,6 +150,11 @@ def convert(exporter, duplicator, scene, context, luxcore_scene, engine=None):
             )
             scene.luxcore.errorlog.add_warning(msg)
 
+        if light_lines:
+            dupli_props.SetFromString("\n".join(light_lines))
+        if light_templates:
+            print("Instanced %d dupli lights from %d lamp templates" % (light_instance_count, len(light_templates)))
+
         duplicator.dupli_list_clear()
         # Need to parse so we have the dupli objects available for DuplicateObject
         luxcore_scene.Parse(dupli_props)
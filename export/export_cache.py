@@ -0,0 +1,109 @@
+import json
+import os
+from .. import utils
+from ..utils import ply
+from ..utils.disk_cache import DiskCache
+
+EXPORT_CACHE_SUBDIR = "export"
+# Increase when the format of the cached files or the key changes
+CACHE_VERSION = 4
+
+
+class ExportCache(object):
+    """
+    This class is a singleton.
+    Stores the shapes of evaluated mesh objects on disk, so the same unchanged scene can be
+    rendered again without to_mesh(), even after a restart of Blender or on another machine
+    (if the cache directory is shared).
+
+    The key is a hash of the inputs of the evaluated mesh (see utils.hashing.hash_mesh_object_inputs()).
+    For each key, the shapes are stored as binary PLY files per material (see utils/ply.py):
+        <key>.json          list of [material_index, filename]
+        <key>_<index>.ply   the shape of one material, in object space
+    """
+
+    @staticmethod
+    def get_key(hash_value):
+        return "v%d_%s" % (CACHE_VERSION, hash_value)
+
+    @staticmethod
+    def _get_cache():
+        preferences = utils.get_addon_preferences()
+        max_size = preferences.export_cache_size if preferences else 8192
+        return DiskCache(EXPORT_CACHE_SUBDIR, max_size)
+
+    @classmethod
+    def load(cls, key, used_paths):
+        """
+        Returns a list of (material_index, filepath) or None.
+        used_paths: set of the files used by the current export, the loaded files are added
+        """
+        cache = cls._get_cache()
+        manifest_path = cache.lookup(key + ".json")
+        if not manifest_path:
+            return None
+
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as error:
+            print("[ExportCache] Could not load %s: %s" % (key, error))
+            return None
+
+        shapes = []
+        for material_index, filename in manifest:
+            filepath = cache.lookup(filename)
+            if not filepath:
+                # Evicted (e.g. by another Blender instance)
+                return None
+            shapes.append((material_index, filepath))
+
+        used_paths.add(manifest_path)
+        used_paths.update(filepath for _, filepath in shapes)
+        return shapes
+
+    @classmethod
+    def save(cls, key, mesh, active_uv, use_vertex_colors, used_paths):
+        """
+        Writes the shapes of the mesh, returns a list of (material_index, filepath).
+        used_paths: set of the files used by the current export, they are not evicted
+        """
+        cache = cls._get_cache()
+
+        def get_filepath(material_index):
+            return cache.get_path("%s_%03d.ply" % (key, material_index))
+
+        shapes = ply.write_mesh(mesh, active_uv, get_filepath, use_vertex_colors)
+
+        # The manifest is written last, shapes without it are incomplete
+        manifest = [[material_index, os.path.basename(filepath)] for material_index, filepath in shapes]
+        manifest_path = cache.get_path(key + ".json")
+        # Written to a temporary file first, so other Blender instances never read a partial manifest
+        temp_path = manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, manifest_path)
+
+        used_paths.add(manifest_path)
+        used_paths.update(filepath for _, filepath in shapes)
+        cache.evict(keep=used_paths)
+        return shapes
+
+
+class ExportCacheStats(object):
+    """
+    Counts the cache hits and misses of one export for the report in the console,
+    and collects the cached files used by the export
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        # Paths of the cached files used by this export, they must not be evicted while it runs
+        self.used_paths = set()
+
+    def print_report(self):
+        if not self.hits and not self.misses:
+            return
+        print("[ExportCache] %d objects loaded from cache, %d exported and cached"
+              % (self.hits, self.misses))
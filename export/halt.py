@@ -1,7 +1,12 @@
 from .. import utils
 
 
-def convert(scene):
+def convert(scene, resumed_time=0, plan=None):
+    """
+    resumed_time: seconds already rendered in a resumed checkpoint
+    plan: optional HaltPlan from the animation budget planner (engine/budget_planner.py),
+    overrides the halt time and noise threshold
+    """
     prefix = ""
     definitions = {}
 
@@ -23,7 +28,8 @@ def convert(scene):
 
     if halt.enable:
         if halt.use_time:
-            definitions["batch.halttime"] = halt.time
+            # The session only knows its own render time, not the resumed one
+            definitions["batch.halttime"] = max(halt.time - resumed_time, 1)
         else:
             definitions["batch.halttime"] = 0
 
@@ -49,4 +55,14 @@ def convert(scene):
         definitions["batch.halttime"] = 0
         definitions["batch.haltspp"] = 0
 
+    if plan:
+        definitions["batch.halttime"] = max(plan.halt_time - resumed_time, 1)
+        definitions["batch.haltthreshold"] = max(plan.noise_thresh / 256, SMALLEST_NOISE_THRESH)
+        definitions["batch.haltthreshold.stoprendering.enable"] = True
+
+        if not use_noise_thresh:
+            definitions["batch.haltthreshold.warmup"] = halt.noise_thresh_warmup
+            definitions["batch.haltthreshold.step"] = halt.noise_thresh_step
+            definitions["batch.haltthreshold.filter.enable"] = halt.noise_thresh_use_filter
+
     return utils.create_props(prefix, definitions)
@@ -0,0 +1,83 @@
+import hashlib
+import os
+from ..utils.disk_cache import DiskCache
+
+IES_CACHE_SUBDIR = "ies"
+MAX_CACHE_SIZE_MB = 64
+
+
+class IESCache(object):
+    """
+    This class is a singleton.
+    Stores each distinct IES profile once as a file in the cache directory, named after
+    the content hash and the map settings. Lights with the same profile and settings get
+    the same file path, so LuxCore bakes the map only once and shares it between the lights.
+    """
+    _disk = DiskCache(IES_CACHE_SUBDIR, MAX_CACHE_SIZE_MB)
+    # {(abspath, mtime, size): content hash}, avoids reading unchanged files again
+    _file_hashes = {}
+    # Cached files that were written or checked in this Blender session
+    _known_paths = set()
+    # {(abspath, mtime, size): file contents as text}
+    _texts = {}
+
+    @classmethod
+    def from_blob(cls, blob, map_width, map_height, flipz):
+        """ blob: contents of an IES text block as bytes. Returns the path of the cached file """
+        content_hash = hashlib.sha1(blob).hexdigest()
+        return cls._get_path(content_hash, map_width, map_height, flipz, lambda: blob)
+
+    @classmethod
+    def from_file(cls, filepath, map_width, map_height, flipz):
+        """ Returns the path of the cached copy of the file """
+        stat = os.stat(filepath)
+        file_key = (filepath, stat.st_mtime, stat.st_size)
+
+        content_hash = cls._file_hashes.get(file_key)
+        if content_hash is None:
+            with open(filepath, "rb") as f:
+                content_hash = hashlib.sha1(f.read()).hexdigest()
+            cls._file_hashes[file_key] = content_hash
+
+        def read():
+            with open(filepath, "rb") as f:
+                return f.read()
+
+        return cls._get_path(content_hash, map_width, map_height, flipz, read)
+
+    @classmethod
+    def read_text(cls, filepath):
+        """ Returns the contents of an IES file, unchanged files are only read once """
+        stat = os.stat(filepath)
+        file_key = (filepath, stat.st_mtime, stat.st_size)
+
+        text = cls._texts.get(file_key)
+        if text is None:
+            with open(filepath, "r", errors="replace") as f:
+                text = f.read()
+            cls._texts[file_key] = text
+        return text
+
+    @classmethod
+    def cleanup(cls):
+        cls._file_hashes = {}
+        cls._known_paths = set()
+        cls._texts = {}
+
+    @classmethod
+    def _get_path(cls, content_hash, map_width, map_height, flipz, read_func):
+        filename = "%s_%dx%d%s.ies" % (content_hash, map_width, map_height, "_flipz" if flipz else "")
+        path = cls._disk.get_path(filename)
+
+        if path in cls._known_paths:
+            return path
+
+        if not cls._disk.lookup(filename):
+            temp_path = path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(read_func())
+            os.replace(temp_path, path)
+            cls._disk.evict(keep=list(cls._known_paths) + [path])
+
+        cls._known_paths.add(path)
+        return path
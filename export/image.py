@@ -1,14 +1,47 @@
 import bpy
-import tempfile
+import hashlib
+import json
 import os
 from .. import utils
+from ..utils import hashing
+from ..utils import image_header
+from ..utils.disk_cache import DiskCache
+from .image_proxy import ImageProxies
+from .image_sequence import ImageSequence
+
+IMAGE_CACHE_SUBDIR = "images"
+
+FILE_FORMAT_EXTENSIONS = {
+    "BMP": ".bmp",
+    "PNG": ".png",
+    "JPEG": ".jpg",
+    "JPEG2000": ".jp2",
+    "TARGA": ".tga",
+    "TARGA_RAW": ".tga",
+    "OPEN_EXR": ".exr",
+    "OPEN_EXR_MULTILAYER": ".exr",
+    "HDR": ".hdr",
+    "TIFF": ".tif",
+}
+
+# Bytes per channel of the LuxCore imagemap storage types
+STORAGE_SIZES = {
+    "byte": 1,
+    "half": 2,
+    "float": 4,
+}
+# Imagemap channel selections that LuxCore stores with only one channel
+SINGLE_CHANNEL_SELECTIONS = {"red", "green", "blue", "alpha", "mean"}
 
 
 class ImageExporter(object):
     """
     This class is a singleton
     """
+    # {image key: path of the cached file}, images exported in this Blender session
     temp_images = {}
+    # Cached files whose integrity was checked in this Blender session
+    verified = set()
 
     @classmethod
     def _save_to_temp_file(cls, image):
@@ -16,22 +49,120 @@ class ImageExporter(object):
 
         if key in cls.temp_images:
             # Image was already exported
-            temp_image = cls.temp_images[key]
+            return cls.temp_images[key]
+
+        # The cache is content addressed, so it can be reused across renders and Blender sessions
+        content_hash = cls._content_hash(image)
+        cache = cls._get_cache()
+        filename = content_hash + cls._get_extension(image)
+        filepath = cache.get_path(filename)
+        meta_path = cache.get_path(content_hash + ".json")
+
+        if cache.lookup(filename) and cls._verify(filepath, meta_path):
+            print('Using cached image "%s" for "%s"' % (filepath, image.name))
+            DiskCache.touch(meta_path)
         else:
+            print('Unpacking image "%s" to cache file "%s"' % (image.name, filepath))
+            cls._write(image, filepath, meta_path)
+            cache.evict(keep=list(cls.temp_images.values()) + [filepath, meta_path])
+
+        cls.temp_images[key] = filepath
+        return filepath
+
+    @staticmethod
+    def _get_cache():
+        preferences = utils.get_addon_preferences()
+        max_size = preferences.image_cache_size if preferences else 4096
+        return DiskCache(IMAGE_CACHE_SUBDIR, max_size)
+
+    @staticmethod
+    def _get_extension(image):
+        if image.packed_file:
             _, extension = os.path.splitext(image.filepath_raw)
-            temp_image = tempfile.NamedTemporaryFile(delete=False, suffix=extension)
-            cls.temp_images[key] = temp_image
+            if extension:
+                return extension.lower()
+        return FILE_FORMAT_EXTENSIONS.get(image.file_format, "")
+
+    @staticmethod
+    def _content_hash(image):
+        sha = hashlib.sha1()
+
+        if image.is_dirty:
+            # Image was painted on, the packed data or the generated parameters are outdated
+            sha.update(image.file_format.encode("utf-8"))
+            hashing.update_pixels(sha, image)
+        elif image.packed_file:
+            # The original file contents
+            sha.update(image.packed_file.data)
+        else:
+            params = (
+                image.generated_type, image.generated_width, image.generated_height,
+                tuple(image.generated_color), image.use_generated_float, image.file_format,
+            )
+            sha.update(repr(params).encode("utf-8"))
+
+        return sha.hexdigest()
+
+    @staticmethod
+    def _file_hash(filepath):
+        sha = hashlib.sha1()
+        with open(filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    @classmethod
+    def _verify(cls, filepath, meta_path):
+        """ Check that the cached file is complete and unchanged (once per Blender session) """
+        if filepath in cls.verified:
+            return True
+
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        valid = (os.path.getsize(filepath) == meta.get("size")
+                 and cls._file_hash(filepath) == meta.get("sha1"))
 
-            print('Unpacking image "%s" to temp file "%s"' % (image.name, temp_image.name))
+        if valid:
+            cls.verified.add(filepath)
+        else:
+            print("Cached image is corrupted:", filepath)
+        return valid
+
+    @classmethod
+    def _write(cls, image, filepath, meta_path):
+        root, extension = os.path.splitext(filepath)
+        temp_path = root + ".tmp" + extension
+
+        if image.packed_file and not image.is_dirty:
+            # Write the packed file as it is, no need to encode the image again
+            with open(temp_path, "wb") as f:
+                f.write(image.packed_file.data)
+        else:
             orig_filepath = image.filepath_raw
-            image.filepath_raw = temp_image.name
+            image.filepath_raw = temp_path
             image.save()
             image.filepath_raw = orig_filepath
 
-        return temp_image.name
+        meta = {
+            "size": os.path.getsize(temp_path),
+            "sha1": cls._file_hash(temp_path),
+        }
+        # The file is only used if the meta file matches it
+        os.replace(temp_path, filepath)
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        cls.verified.add(filepath)
 
     @classmethod
-    def export(cls, image):
+    def export(cls, image, max_size=0, frame=None):
+        """
+        max_size: if > 0, a downscaled proxy of image files larger than this is used (if available)
+        frame: frame number of image sequences, if None the file in the image filepath is used
+        """
         if image.source == "GENERATED":
             return cls._save_to_temp_file(image)
         elif image.source == "FILE":
@@ -40,22 +171,82 @@ class ImageExporter(object):
             else:
                 try:
                     filepath = utils.get_abspath(image.filepath, library=image.library, must_exist=True, must_be_existing_file=True)
+                    if max_size > 0:
+                        return ImageProxies.get(image, filepath, max_size)
                     return filepath
                 except OSError as error:
                     # Make the error message more precise
                     raise OSError('Could not find image "%s" at path "%s" (%s)'
                                   % (image.name, image.filepath, error))
         elif image.source == "SEQUENCE":
-            # TODO
-            raise NotImplementedError("Sequence not supported yet")
+            try:
+                if frame is None:
+                    filepath = utils.get_abspath(image.filepath, library=image.library, must_be_existing_file=True)
+                else:
+                    filepath = utils.get_abspath(image.filepath, library=image.library)
+                    filepath = ImageSequence.get_filepath(filepath, frame)
+            except OSError as error:
+                raise OSError('Could not find image sequence "%s" at path "%s" (%s)'
+                              % (image.name, image.filepath, error))
+            if max_size > 0:
+                return ImageProxies.get(image, filepath, max_size)
+            return filepath
         else:
             raise Exception('Unsupported image source "%s" in image "%s"' % (image.source, image.name))
 
     @classmethod
     def cleanup(cls):
-        for temp_image in cls.temp_images.values():
-            print("Deleting temporary image:", temp_image.name)
-            os.remove(temp_image.name)
-
+        # The cached files are kept for the next session, the cache size is limited by eviction
         cls.temp_images = {}
+        cls.verified = set()
+        ImageProxies.cleanup()
+        ImageSequence.cleanup()
+
+
+def get_storage(image, filepath, is_data=False):
+    """
+    Returns the smallest LuxCore imagemap storage type that keeps the precision of the image.
+    is_data: True if the image is not used as a color (e.g. bump, displacement or roughness),
+    small errors are more visible there.
+    """
+    # image.is_float would load the whole image
+    header = image_header.read(filepath)
+    if header is None:
+        # Unknown bit depth, Blender loads all float images with 32 bit
+        return "float" if image.is_float else "byte"
+
+    if not header.is_float:
+        return "byte"
+    if header.bits > 16:
+        # 32 bit EXR, HDR and TIFF images. Half would clip values above 65504
+        # and only keeps 11 bits of the mantissa
+        return "float"
+    if header.float_samples or not is_data:
+        # Half float EXR files, or 16 bit integer images used as colors
+        return "half"
+    # 16 bit integer images (e.g. height maps) would lose 5 bits with half precision
+    return "float"
+
 
+def get_channel_count(channels, channel):
+    if channel in SINGLE_CHANNEL_SELECTIONS:
+        return 1
+    if channel in {"rgb", "colored_mean"}:
+        return 3
+    # LuxCore keeps the channels of the file
+    return channels
+
+
+def estimate_memory(image, filepath, storage, channel):
+    """
+    Estimated size in bytes of the image in LuxCore.
+    The size is read from the header of the file that LuxCore loads (which might be a proxy),
+    image.size would load the whole image
+    """
+    header = image_header.read(filepath)
+    if header:
+        width, height, channels = header.width, header.height, header.channels
+    else:
+        width, height = image.size
+        channels = image.channels
+    return width * height * get_channel_count(channels, channel) * STORAGE_SIZES[storage]
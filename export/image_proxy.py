@@ -0,0 +1,244 @@
+import hashlib
+import os
+import subprocess
+import threading
+from collections import deque
+from time import time
+import bpy
+from .. import utils
+from ..utils import node as utils_node
+from ..utils.disk_cache import DiskCache
+
+try:
+    import OpenImageIO as oiio
+except ImportError:
+    # Not shipped with Blender, the proxies are created by a background Blender process instead
+    oiio = None
+
+PROXY_CACHE_SUBDIR = "proxies"
+# Proxies of 8 bit images are saved as png, proxies of float images as half float exr
+PROXY_EXTENSIONS = (".png", ".exr")
+# Seconds until a background Blender process is considered stuck
+BLENDER_TIMEOUT = 300
+
+# Run by a background Blender process if OpenImageIO is not available.
+# Arguments after "--": image path, proxy path without extension, maximum size
+BLENDER_SCRIPT = """
+import sys
+import bpy
+filepath, proxy_root, max_size = sys.argv[sys.argv.index("--") + 1:]
+image = bpy.data.images.load(filepath)
+width, height = image.size
+factor = int(max_size) / max(width, height)
+if factor < 1:
+    image.scale(max(int(width * factor), 1), max(int(height * factor), 1))
+    image.file_format = "OPEN_EXR" if image.is_float else "PNG"
+    image.filepath_raw = proxy_root + (".tmp.exr" if image.is_float else ".tmp.png")
+    image.save()
+"""
+
+
+class ImageProxies(object):
+    """
+    This class is a singleton.
+    Manages downscaled copies of large images for the viewport render, cached on disk.
+
+    If a proxy is not available yet, the original image is used and the proxy is
+    queued. A worker thread creates the proxies one by one with OpenImageIO, or with a
+    background Blender process if OpenImageIO is not installed, so the UI is not blocked.
+    process_queue() is called by the scene_update_post handler. It collects the finished
+    proxies and tags the materials, worlds and lamps that use the images for update,
+    so the viewport render exports them again with the proxy.
+    """
+    # Entries: (key, image name, filepath, max_size, proxy path without extension)
+    queue = deque()
+    # Entries: (key, image name, path of the image the viewport should use)
+    finished = deque()
+    # {key: path of the image the viewport should use}
+    results = {}
+    # Keys that are queued or being processed
+    _pending = set()
+    _lock = threading.Lock()
+    _wakeup = threading.Event()
+    _thread = None
+    # Each worker thread gets its own stop event, see cleanup()
+    _stop = None
+    _blender_path = None
+
+    @classmethod
+    def get(cls, image, filepath, max_size):
+        """ Returns the path of the proxy if it is ready, otherwise filepath """
+        if image.has_data and max(image.size) <= max_size:
+            # Already small enough
+            return filepath
+
+        try:
+            key = cls._get_key(filepath, max_size)
+        except OSError:
+            return filepath
+
+        if key in cls.results:
+            return cls.results[key]
+
+        cache = cls._get_cache()
+        for extension in PROXY_EXTENSIONS:
+            proxy_path = cache.lookup(key + extension)
+            if proxy_path:
+                cls.results[key] = proxy_path
+                return proxy_path
+
+        with cls._lock:
+            if key not in cls._pending:
+                cls._pending.add(key)
+                cls.queue.append((key, image.name, filepath, max_size, cache.get_path(key)))
+        cls._start_worker()
+        return filepath
+
+    @classmethod
+    def process_queue(cls):
+        """ Applies the proxies finished by the worker thread. Returns True if a proxy was applied """
+        with cls._lock:
+            if not cls.finished:
+                return False
+            finished = list(cls.finished)
+            cls.finished.clear()
+            for key, _, _ in finished:
+                cls._pending.discard(key)
+
+        for key, _, result in finished:
+            cls.results[key] = result
+
+        try:
+            cls._get_cache().evict(keep=list(cls.results.values()))
+        except OSError as error:
+            print("[ImageProxies] Could not evict proxies:", error)
+
+        _tag_users({image_name for _, image_name, _ in finished})
+        return True
+
+    @classmethod
+    def cleanup(cls):
+        if cls._thread:
+            # Don't wait for the running conversion, the thread is a daemon
+            cls._stop.set()
+            cls._wakeup.set()
+            cls._thread = None
+
+        with cls._lock:
+            cls.queue.clear()
+            cls.finished.clear()
+            cls._pending = set()
+        cls.results = {}
+
+    @staticmethod
+    def _get_key(filepath, max_size):
+        stat = os.stat(filepath)
+        sha = hashlib.sha1()
+        sha.update(repr((os.path.abspath(filepath), stat.st_mtime, stat.st_size, max_size)).encode("utf-8"))
+        return sha.hexdigest()
+
+    @staticmethod
+    def _get_cache():
+        preferences = utils.get_addon_preferences()
+        max_size = preferences.image_cache_size if preferences else 4096
+        return DiskCache(PROXY_CACHE_SUBDIR, max_size)
+
+    @classmethod
+    def _start_worker(cls):
+        if cls._thread is None:
+            # The worker must not use the Blender API
+            cls._blender_path = bpy.app.binary_path
+            cls._stop = threading.Event()
+            cls._thread = threading.Thread(target=cls._worker, args=(cls._stop,), daemon=True)
+            cls._thread.start()
+        cls._wakeup.set()
+
+    @classmethod
+    def _worker(cls, stop):
+        while not stop.is_set():
+            cls._wakeup.wait()
+
+            while not stop.is_set():
+                with cls._lock:
+                    if not cls.queue:
+                        cls._wakeup.clear()
+                        break
+                    key, image_name, filepath, max_size, proxy_root = cls.queue.popleft()
+
+                start = time()
+                try:
+                    result = _create_proxy(filepath, max_size, proxy_root, cls._blender_path)
+                    print('[ImageProxies] Created proxy of "%s" in %.1f s' % (filepath, time() - start))
+                except Exception as error:
+                    print('[ImageProxies] Could not create proxy of "%s": %s' % (filepath, error))
+                    # Don't try again in this session
+                    result = filepath
+
+                with cls._lock:
+                    cls.finished.append((key, image_name, result))
+
+
+def _create_proxy(filepath, max_size, proxy_root, blender_path):
+    """ Returns the path of the proxy, or filepath if the image is small enough """
+    if oiio:
+        _downscale_oiio(filepath, max_size, proxy_root)
+    else:
+        _downscale_blender(filepath, max_size, proxy_root, blender_path)
+
+    for extension in PROXY_EXTENSIONS:
+        temp_path = proxy_root + ".tmp" + extension
+        if os.path.isfile(temp_path):
+            proxy_path = proxy_root + extension
+            os.replace(temp_path, proxy_path)
+            return proxy_path
+
+    # No proxy needed
+    return filepath
+
+
+def _downscale_oiio(filepath, max_size, proxy_root):
+    source = oiio.ImageBuf(filepath)
+    spec = source.spec()
+    if source.has_error:
+        raise OSError(source.geterror())
+
+    width, height = spec.width, spec.height
+    if max(width, height) <= max_size:
+        return
+
+    factor = max_size / max(width, height)
+    new_spec = oiio.ImageSpec(max(int(width * factor), 1), max(int(height * factor), 1), spec.nchannels, oiio.FLOAT)
+    resized = oiio.ImageBuf(new_spec)
+    if not oiio.ImageBufAlgo.resize(resized, source):
+        raise OSError(resized.geterror())
+
+    is_float = spec.format.basetype in {oiio.HALF, oiio.FLOAT, oiio.DOUBLE}
+    resized.set_write_format(oiio.HALF if is_float else oiio.UINT8)
+    temp_path = proxy_root + (".tmp.exr" if is_float else ".tmp.png")
+    if not resized.write(temp_path):
+        raise OSError(resized.geterror())
+
+
+def _downscale_blender(filepath, max_size, proxy_root, blender_path):
+    args = [
+        blender_path, "--background", "--factory-startup",
+        "--python-expr", BLENDER_SCRIPT, "--", filepath, proxy_root, str(max_size),
+    ]
+    process = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=BLENDER_TIMEOUT)
+    if process.returncode != 0:
+        raise OSError(process.stderr.decode("utf-8", "replace").strip() or "Blender exited with an error")
+
+
+def _tag_users(image_names):
+    """ Tags the materials, worlds and lamps that use the images for update """
+    for mat in bpy.data.materials:
+        node_tree = mat.luxcore.node_tree
+        if node_tree and any(node.image and node.image.name in image_names
+                             for node in utils_node.find_nodes(node_tree, "LuxCoreNodeTexImagemap")):
+            mat.update_tag()
+
+    for datablocks in (bpy.data.worlds, bpy.data.lamps):
+        for datablock in datablocks:
+            image = datablock.luxcore.image
+            if image and image.name in image_names:
+                datablock.update_tag()
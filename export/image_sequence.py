@@ -0,0 +1,115 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# The last group of digits in the filename is the frame number, e.g. "render_0001.png"
+FRAME_NUMBER_REGEX = re.compile(r"(\d+)(?!.*\d)")
+
+
+class ImageSequence(object):
+    """
+    This class is a singleton.
+    Maps frame numbers to the files of image sequences.
+
+    When a frame is requested, a background thread resolves and stats the files of the
+    next frames, so the export of the following frames does not wait on the file system.
+    """
+    # How many frames after the requested one are resolved in advance
+    PREFETCH_FRAMES = 10
+    MAX_ENTRIES = 10000
+
+    # {(filepath, frame): resolved filepath or None if the file does not exist}
+    _resolved = OrderedDict()
+    _lock = threading.Lock()
+    # Entries: (filepath, frame)
+    _requests = []
+    _wakeup = threading.Event()
+    _thread = None
+    _stop = False
+
+    @classmethod
+    def get_filepath(cls, filepath, frame):
+        """
+        filepath: absolute path of any file of the sequence
+        Raises OSError if the file of the frame does not exist.
+        """
+        key = (filepath, frame)
+
+        with cls._lock:
+            found = key in cls._resolved
+            resolved = cls._resolved.get(key)
+
+        if not found:
+            resolved = _resolve(filepath, frame)
+            cls._store(key, resolved)
+
+        cls._prefetch(filepath, frame)
+
+        if resolved is None:
+            raise OSError("Frame %d of image sequence not found" % frame)
+        return resolved
+
+    @classmethod
+    def cleanup(cls):
+        if cls._thread:
+            cls._stop = True
+            cls._wakeup.set()
+            cls._thread.join()
+            cls._thread = None
+
+        with cls._lock:
+            cls._resolved.clear()
+            cls._requests = []
+
+    @classmethod
+    def _store(cls, key, resolved):
+        with cls._lock:
+            cls._resolved[key] = resolved
+            while len(cls._resolved) > cls.MAX_ENTRIES:
+                cls._resolved.popitem(last=False)
+
+    @classmethod
+    def _prefetch(cls, filepath, frame):
+        with cls._lock:
+            for next_frame in range(frame + 1, frame + 1 + cls.PREFETCH_FRAMES):
+                key = (filepath, next_frame)
+                if key not in cls._resolved and key not in cls._requests:
+                    cls._requests.append(key)
+
+            if not cls._requests:
+                return
+
+        if cls._thread is None:
+            cls._stop = False
+            cls._thread = threading.Thread(target=cls._worker, daemon=True)
+            cls._thread.start()
+        cls._wakeup.set()
+
+    @classmethod
+    def _worker(cls):
+        while not cls._stop:
+            cls._wakeup.wait()
+
+            while not cls._stop:
+                with cls._lock:
+                    if not cls._requests:
+                        cls._wakeup.clear()
+                        break
+                    key = cls._requests.pop(0)
+
+                cls._store(key, _resolve(*key))
+
+
+def _resolve(filepath, frame):
+    """ Returns the path of the file of the frame, or None if it does not exist """
+    head, filename = os.path.split(filepath)
+    match = FRAME_NUMBER_REGEX.search(filename)
+    if not match:
+        # Not numbered, the same file is used for all frames
+        return filepath if os.path.isfile(filepath) else None
+
+    digits = match.group(1)
+    frame_str = str(frame).zfill(len(digits))
+    path = os.path.join(head, filename[:match.start()] + frame_str + filename[match.end():])
+    return path if os.path.isfile(path) else None
@@ -1,15 +1,27 @@
 import bpy
 from mathutils import Matrix
+import hashlib
 import math
+import os
 from ..bin import pyluxcore
 from .. import utils
 from ..utils import ExportedObject, ExportedLight
 from .image import ImageExporter
+from .ies_cache import IESCache
+from ..utils import hashing
+from ..utils.disk_cache import DiskCache
 
 
 WORLD_BACKGROUND_LIGHT_NAME = "__WORLD_BACKGROUND_LIGHT__"
+# All area lamps share this quad, the size and transformation of a lamp are set on its object
+AREA_LAMP_SHAPE_NAME = "__AREA_LAMP_QUAD__"
 MISSING_IMAGE_COLOR = [1, 0, 1]
 
+VISIBILITYMAP_CACHE_SUBDIR = "visibilitymaps"
+VISIBILITYMAP_CACHE_SIZE_MB = 1024
+# Light types that support a visibility map
+VISIBILITYMAP_TYPES = {"infinite", "sky2", "constantinfinite"}
+
 
 def convert_lamp(exporter, blender_obj, scene, context, luxcore_scene, dupli_suffix=""):
     try:
@@ -36,6 +48,8 @@ def convert_lamp(exporter, blender_obj, scene, context, luxcore_scene, dupli_suf
         # Common light settings shared by all light types
         # Note: these variables are also passed to the area light export function
         gain, importance, lightgroup_id = _convert_common_props(exporter, scene, lamp)
+        if exporter.importance_estimator:
+            importance = exporter.importance_estimator.get_importance(blender_obj, importance)
         definitions["gain"] = gain
         definitions["importance"] = importance
         definitions["id"] = lightgroup_id
@@ -138,7 +152,7 @@ def convert_lamp(exporter, blender_obj, scene, context, luxcore_scene, dupli_suf
 
         elif lamp.type == "HEMI":
             if lamp.luxcore.image:
-                _convert_infinite(definitions, lamp, scene, matrix)
+                _convert_infinite(exporter, definitions, lamp, scene, matrix)
             else:
                 # Fallback
                 definitions["type"] = "constantinfinite"
@@ -160,14 +174,15 @@ def convert_lamp(exporter, blender_obj, scene, context, luxcore_scene, dupli_suf
                 definitions["transformation"] = transformation
             else:
                 # area (mesh light)
-                return _convert_area_lamp(blender_obj, scene, context, luxcore_scene, gain, importance)
+                return _convert_area_lamp(blender_obj, scene, context, luxcore_scene, gain, importance,
+                                         is_dupli=bool(dupli_suffix))
 
         else:
             # Can only happen if Blender changes its lamp types
             raise Exception("Unkown light type", lamp.type, 'in lamp "%s"' % blender_obj.name)
 
         _indirect_light_visibility(definitions, lamp)
-        _visibilitymap(definitions, lamp)
+        _visibilitymap(exporter, definitions, lamp)
 
         props = utils.create_props(prefix, definitions)
         return props, exported_light
@@ -215,7 +230,7 @@ def convert_world(exporter, world, scene):
         elif light_type == "infinite":
             if world.luxcore.image:
                 transformation = Matrix.Rotation(world.luxcore.rotation, 4, "Z")
-                _convert_infinite(definitions, world, scene, transformation)
+                _convert_infinite(exporter, definitions, world, scene, transformation)
             else:
                 # Fallback if no image is set
                 definitions["type"] = "constantinfinite"
@@ -223,7 +238,7 @@ def convert_world(exporter, world, scene):
             definitions["type"] = "constantinfinite"
 
         _indirect_light_visibility(definitions, world)
-        _visibilitymap(definitions, world)
+        _visibilitymap(exporter, definitions, world)
 
         props = utils.create_props(prefix, definitions)
         return props
@@ -248,11 +263,11 @@ def _convert_common_props(exporter, scene, lamp_or_world):
     return gain, importance, lightgroup_id
 
 
-def _convert_infinite(definitions, lamp_or_world, scene, transformation=None):
+def _convert_infinite(exporter, definitions, lamp_or_world, scene, transformation=None):
     assert lamp_or_world.luxcore.image is not None
 
     try:
-        filepath = ImageExporter.export(lamp_or_world.luxcore.image)
+        filepath = ImageExporter.export(lamp_or_world.luxcore.image, exporter.texture_size_limit)
     except OSError as error:
         error_context = "Lamp" if isinstance(lamp_or_world, bpy.types.Lamp) else "World"
         msg = '%s "%s": %s' % (error_context, lamp_or_world.name, error)
@@ -276,22 +291,22 @@ def _convert_infinite(definitions, lamp_or_world, scene, transformation=None):
 
 
 def calc_area_lamp_transformation(blender_obj):
-    lamp = blender_obj.data
-
     transform_matrix = blender_obj.matrix_world.copy()
+    transform_matrix *= _calc_area_lamp_scale(blender_obj.data)
+    return transform_matrix
+
+
+def _calc_area_lamp_scale(lamp):
     scale_x = Matrix.Scale(lamp.size / 2, 4, (1, 0, 0))
     if lamp.shape == "RECTANGLE":
         scale_y = Matrix.Scale(lamp.size_y / 2, 4, (0, 1, 0))
     else:
         # basically scale_x, but for the y axis (note the last tuple argument)
         scale_y = Matrix.Scale(lamp.size / 2, 4, (0, 1, 0))
-
-    transform_matrix *= scale_x
-    transform_matrix *= scale_y
-    return transform_matrix
+    return scale_x * scale_y
 
 
-def _convert_area_lamp(blender_obj, scene, context, luxcore_scene, gain, importance):
+def _convert_area_lamp(blender_obj, scene, context, luxcore_scene, gain, importance, is_dupli=False):
     """
     An area light is a plane object with emissive material in LuxCore
     # TODO: check if we need to scale gain with area?
@@ -301,8 +316,6 @@ def _convert_area_lamp(blender_obj, scene, context, luxcore_scene, gain, importa
     props = pyluxcore.Properties()
 
     # Light emitting material
-    mat_name = luxcore_name + "_AREA_LIGHT_MAT"
-    mat_prefix = "scene.materials." + mat_name + "."
     mat_definitions = {
         "type": "matte",
         # Black base material to avoid any bounce light from the mesh
@@ -329,6 +342,9 @@ def _convert_area_lamp(blender_obj, scene, context, luxcore_scene, gain, importa
             msg = 'Lamp "%s": %s' % (blender_obj.name, error)
             scene.luxcore.errorlog.add_warning(msg)
 
+    # Area lamps with the same settings share the material
+    mat_name = _get_area_lamp_material_name(mat_definitions)
+    mat_prefix = "scene.materials." + mat_name + "."
     mat_props = utils.create_props(mat_prefix, mat_definitions)
     props.Set(mat_props)
 
@@ -342,21 +358,19 @@ def _convert_area_lamp(blender_obj, scene, context, luxcore_scene, gain, importa
         # This happens if the lamp size is set to 0
         raise Exception("Area lamp has size 0 (can not be exported)")
 
-    transform = utils.matrix_to_list(transform_matrix, scene, apply_worldscale=True)
-    # Only bake the transform into the mesh for final renders (disables instancing which
-    # is needed for viewport render so we can move the light object)
+    # The quad is always instanced, so all area lamps can share one shape
+    obj_transform = utils.matrix_to_list(transform_matrix, scene, apply_worldscale=True)
+    shape_name = AREA_LAMP_SHAPE_NAME
+    mesh_transform = None
 
-    # Instancing just means that we transform the object instead of the mesh
-    if utils.use_instancing(blender_obj, scene, context):
-        obj_transform = transform
-        mesh_transform = None
-    else:
-        obj_transform = None
-        mesh_transform = transform
+    if is_dupli:
+        # DuplicateObject() replaces the object transformation with the dupli matrices,
+        # so the size has to be baked into the shape (shared by duplis of the same size)
+        # (the name must not contain dots, they separate the property keys)
+        size_y = lamp.size_y if lamp.shape == "RECTANGLE" else lamp.size
+        shape_name += "_" + hashing.hash_values(lamp.size, size_y)[:12]
+        mesh_transform = utils.matrix_to_list(_calc_area_lamp_scale(lamp))
 
-    # shape_transform = None if context else transform
-
-    shape_name = "Mesh-" + luxcore_name
     if not luxcore_scene.IsMeshDefined(shape_name):
         vertices = [
             (1, 1, 0),
@@ -375,10 +389,8 @@ def _convert_area_lamp(blender_obj, scene, context, luxcore_scene, gain, importa
         "material": mat_name,
         "shape": shape_name,
         "camerainvisible": not blender_obj.luxcore.visible_to_camera,
+        "transformation": obj_transform,
     }
-    if obj_transform:
-        # Use instancing for viewport render so we can interactively move the light
-        obj_definitions["transformation"] = obj_transform
 
     obj_props = utils.create_props(obj_prefix, obj_definitions)
     props.Set(obj_props)
@@ -389,6 +401,13 @@ def _convert_area_lamp(blender_obj, scene, context, luxcore_scene, gain, importa
     return props, exported_obj
 
 
+def _get_area_lamp_material_name(mat_definitions):
+    sha = hashlib.sha1()
+    for key in sorted(mat_definitions):
+        sha.update(repr((key, mat_definitions[key])).encode("utf-8"))
+    return "__AREA_LIGHT_MAT_" + sha.hexdigest()[:16]
+
+
 def _indirect_light_visibility(definitions, lamp_or_world):
     definitions.update({
         "visibility.indirect.diffuse.enable": lamp_or_world.luxcore.visibility_indirect_diffuse,
@@ -397,8 +416,41 @@ def _indirect_light_visibility(definitions, lamp_or_world):
     })
 
 
-def _visibilitymap(definitions, lamp_or_world):
-    definitions["visibilitymap.enable"] = lamp_or_world.luxcore.visibilitymap_enable
+def _visibilitymap(exporter, definitions, lamp_or_world):
+    enabled = lamp_or_world.luxcore.visibilitymap_enable
+    definitions["visibilitymap.enable"] = enabled
+
+    if enabled and lamp_or_world.luxcore.visibilitymap_cache and definitions.get("type") in VISIBILITYMAP_TYPES:
+        _visibilitymap_cache(exporter, definitions)
+
+
+def _visibilitymap_cache(exporter, definitions):
+    """
+    Let LuxCore load the visibility map from a file instead of computing it, if the
+    light and the scene geometry did not change since the file was written
+    """
+    # Gain, importance and lightgroup don't change which parts of the light are visible
+    relevant = sorted((key, value) for key, value in definitions.items()
+                      if key not in {"gain", "importance", "id"})
+
+    image_signature = None
+    if "file" in definitions:
+        stat = os.stat(definitions["file"])
+        image_signature = (stat.st_mtime, stat.st_size)
+
+    key = hashing.hash_values(relevant, image_signature, exporter.get_geometry_hash())
+    cache = DiskCache(VISIBILITYMAP_CACHE_SUBDIR, VISIBILITYMAP_CACHE_SIZE_MB)
+    filename = key + ".vmc"
+    filepath = cache.get_path(filename)
+
+    if cache.lookup(filename):
+        print("Using cached visibility map", filepath)
+    else:
+        # LuxCore writes the file after computing the map
+        cache.evict(keep=[filepath])
+
+    definitions["visibilitymapcache.enable"] = True
+    definitions["visibilitymapcache.persistent.file"] = filepath
 
 
 def export_ies(definitions, ies, library, is_meshlight=False):
@@ -416,6 +468,7 @@ def export_ies(definitions, ies, library, is_meshlight=False):
     definitions[prefix + "map.height"] = ies.map_height
 
     # There are two ways to specify IES data: filepath or blob (ascii text)
+    # Both are passed as a path to a file in the IES cache, so lights with the same profile share it
     if ies.file_type == "TEXT":
         # Blender text block
         text = ies.file_text
@@ -424,7 +477,7 @@ def export_ies(definitions, ies, library, is_meshlight=False):
             blob = text.as_string().encode("ascii")
 
             if blob:
-                definitions[prefix + "iesblob"] = [blob]
+                definitions[prefix + "iesfile"] = IESCache.from_blob(blob, ies.map_width, ies.map_height, ies.flipz)
     else:
         # File path
         iesfile = ies.file_path
@@ -432,7 +485,8 @@ def export_ies(definitions, ies, library, is_meshlight=False):
         if iesfile:
             try:
                 filepath = utils.get_abspath(iesfile, library, must_exist=True, must_be_existing_file=True)
-                definitions[prefix + "iesfile"] = filepath
+                definitions[prefix + "iesfile"] = IESCache.from_file(filepath, ies.map_width, ies.map_height,
+                                                                     ies.flipz)
             except OSError as error:
                 # Make the error message more precise
                 raise OSError('Could not find .ies file at path "%s" (%s)'
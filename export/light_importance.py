@@ -0,0 +1,238 @@
+import math
+from mathutils import Vector
+from .. import utils
+from .ies_cache import IESCache
+
+# Light types whose importance is estimated, the others (sun, hemi) light the whole scene
+ESTIMATED_TYPES = {"POINT", "SPOT", "AREA"}
+# Lights never get a lower importance than this (relative to the user importance), so they are still sampled
+MIN_IMPORTANCE = 0.01
+# Lamps are only exported again if their importance changed by more than this fraction
+UPDATE_TOLERANCE = 0.1
+
+
+class LightImportanceEstimator(object):
+    """
+    Estimates how much each lamp contributes to the image and derives its importance.
+
+    The estimate is a rough flux: gain and tint, power and efficacy (if used), area of area
+    lamps, average of the IES profile relative to its peak and the solid angle of the spot
+    cone. It is scaled by 1 / (1 + d^2), where d is the distance to the camera frustum.
+
+    Sun, hemi, mesh lights and the world can't be estimated on the same scale, so the estimates
+    only redistribute the importance among the estimated lamps: the sum of their importances
+    stays the sum of the importances set by the user, the share of the other lights is unchanged.
+    """
+
+    def __init__(self, scene, objects, context=None):
+        self.scene = scene
+        self.frustum = _get_frustum_planes(scene, context)
+        # {lamp key: (estimate, user importance)}
+        self.estimates = {}
+        # {lamp key: importance}, the values that were last returned by get_importance()
+        self.exported = {}
+
+        lamps = [obj for obj in objects if obj.type == "LAMP" and obj.data.type in ESTIMATED_TYPES]
+        for obj in lamps:
+            self._add(obj)
+        self._update_scale()
+
+        if self.estimates:
+            print("[Auto Importance] Estimated importance of %d lights:" % len(lamps))
+            for obj in sorted(lamps, key=self.get_importance, reverse=True):
+                print("    %.3f  %s" % (self.get_importance(obj), obj.name))
+
+    def update(self, blender_objs):
+        """
+        Estimates the changed lamps again (e.g. moved or dimmed during viewport render).
+        Returns the keys of the exported lamps whose importance changed, because the
+        importance of all lamps depends on the sum of the estimates.
+        """
+        for obj in blender_objs:
+            key = utils.make_key(obj)
+            if obj.type == "LAMP" and obj.data.type in ESTIMATED_TYPES:
+                self._add(obj)
+            else:
+                self.estimates.pop(key, None)
+                self.exported.pop(key, None)
+
+        self._update_scale()
+        return self._get_outdated_keys()
+
+    def update_view(self, objects, context=None):
+        """
+        The camera or the viewport moved, estimates all lamps again.
+        Returns the keys of the exported lamps whose importance changed.
+        """
+        self.frustum = _get_frustum_planes(self.scene, context)
+        lamps = [obj for obj in objects if utils.make_key(obj) in self.estimates]
+        return self.update(lamps)
+
+    def get_importance(self, blender_obj, user_importance=None):
+        """ Returns the importance to export, or the user importance if the lamp is not estimated """
+        lamp = blender_obj.data
+        if user_importance is None:
+            user_importance = lamp.luxcore.importance
+
+        if lamp.type not in ESTIMATED_TYPES:
+            return user_importance
+
+        key = utils.make_key(blender_obj)
+        if key not in self.estimates:
+            # Lamp was added during the viewport render
+            self._add(blender_obj)
+            self._update_scale()
+
+        importance = self._compute_importance(key, user_importance)
+        self.exported[key] = importance
+        return importance
+
+    def _add(self, blender_obj):
+        key = utils.make_key(blender_obj)
+        self.estimates[key] = (self._estimate(blender_obj), blender_obj.data.luxcore.importance)
+
+    def _update_scale(self):
+        """ Computes the factor that keeps the sum of the importances equal to the sum of the user importances """
+        user_sum = sum(user for _, user in self.estimates.values())
+        weighted_sum = sum(estimate * user for estimate, user in self.estimates.values())
+        self.scale = user_sum / weighted_sum if weighted_sum > 0 else None
+
+    def _compute_importance(self, key, user_importance):
+        if self.scale is None:
+            return user_importance
+        estimate, _ = self.estimates[key]
+        return max(estimate * self.scale, MIN_IMPORTANCE) * user_importance
+
+    def _get_outdated_keys(self):
+        outdated = set()
+        for key, exported in self.exported.items():
+            importance = self._compute_importance(key, self.estimates[key][1])
+            if abs(importance - exported) > UPDATE_TOLERANCE * exported:
+                outdated.add(key)
+        return outdated
+
+    def _estimate(self, blender_obj):
+        lamp = blender_obj.data
+        settings = lamp.luxcore
+        tint = settings.rgb_gain
+        flux = settings.gain * (0.2126 * tint[0] + 0.7152 * tint[1] + 0.0722 * tint[2])
+
+        use_power = settings.power > 0 and settings.efficacy > 0
+        if use_power:
+            flux *= settings.power * settings.efficacy
+
+        if lamp.type == "AREA" and not use_power and not settings.is_laser:
+            # Gain is the emitted radiance, the flux grows with the area
+            worldscale = utils.get_worldscale(self.scene, as_scalematrix=False)
+            size_y = lamp.size_y if lamp.shape == "RECTANGLE" else lamp.size
+            flux *= lamp.size * size_y * worldscale ** 2
+
+        if lamp.type == "SPOT":
+            # Fraction of the sphere that is lit by the cone
+            flux *= (1 - math.cos(lamp.spot_size / 2)) / 2
+
+        if settings.ies.use:
+            flux *= _get_ies_factor(settings.ies, lamp.library)
+
+        position = blender_obj.matrix_world.to_translation()
+        distance = _distance_to_frustum(self.frustum, position)
+        return flux / (1 + distance ** 2)
+
+
+def _get_ies_factor(ies, library):
+    """ LuxCore normalizes IES profiles to a peak of 1, so the average candela relative to the peak matters """
+    try:
+        if ies.file_type == "TEXT":
+            if not ies.file_text:
+                return 1
+            data = ies.file_text.as_string()
+        else:
+            if not ies.file_path:
+                return 1
+            filepath = utils.get_abspath(ies.file_path, library, must_be_existing_file=True)
+            data = IESCache.read_text(filepath)
+        return _ies_average_to_peak(data)
+    except (OSError, ValueError, IndexError):
+        return 1
+
+
+def _ies_average_to_peak(data):
+    # The photometric data follows the TILT line (with TILT=NONE, the usual case)
+    _, _, numbers = data.partition("TILT=")
+    values = numbers.split()[1:]
+    vertical_count = int(float(values[3]))
+    horizontal_count = int(float(values[4]))
+    # 10 values on the first line, 3 on the second, then the angles
+    start = 13 + vertical_count + horizontal_count
+    candela = [float(x) for x in values[start:start + vertical_count * horizontal_count]]
+    peak = max(candela)
+    if peak <= 0:
+        return 1
+    return sum(candela) / len(candela) / peak
+
+
+def _get_frustum_planes(scene, context=None):
+    """ Returns a list of (normal, point) in world space with normals pointing outwards, or None """
+    if context and context.region_data.view_perspective != "CAMERA":
+        return _get_view_frustum_planes(context.region_data)
+
+    camera = scene.camera
+    if camera is None or camera.type != "CAMERA":
+        return None
+
+    cam_data = camera.data
+    corners = [Vector(corner) for corner in cam_data.view_frame(scene)]
+    is_ortho = cam_data.type == "ORTHO"
+    forward = Vector((0, 0, -1))
+    center = sum(corners, Vector()) / len(corners)
+
+    planes = []
+    for i in range(len(corners)):
+        corner = corners[i]
+        next_corner = corners[(i + 1) % len(corners)]
+        direction = forward if is_ortho else corner
+        normal = (next_corner - corner).cross(direction).normalized()
+        if normal.dot(center - corner) > 0:
+            normal.negate()
+        planes.append((normal, corner))
+
+    planes.append((-forward, Vector((0, 0, -cam_data.clip_start))))
+    planes.append((forward, Vector((0, 0, -cam_data.clip_end))))
+
+    # Remove the scale of the camera so distances are in world units
+    matrix = camera.matrix_world.normalized()
+    rotation = matrix.to_3x3()
+    return [(rotation * normal, matrix * point) for normal, point in planes]
+
+
+def _get_view_frustum_planes(region_data):
+    """ Frustum of the 3D viewport (outside of camera view), the corners are unprojected from clip space """
+    matrix = region_data.perspective_matrix.inverted()
+
+    def unproject(x, y, z):
+        point = matrix * Vector((x, y, z, 1))
+        return point.xyz / point.w
+
+    square = [(-1, -1), (1, -1), (1, 1), (-1, 1)]
+    near = [unproject(x, y, -1) for x, y in square]
+    far = [unproject(x, y, 1) for x, y in square]
+    center = sum(near + far, Vector()) / 8
+
+    # Three points of each side, the near and the far plane
+    faces = [(near[i], near[(i + 1) % 4], far[i]) for i in range(4)]
+    faces += [(near[0], near[1], near[2]), (far[0], far[1], far[2])]
+
+    planes = []
+    for a, b, c in faces:
+        normal = (b - a).cross(c - a).normalized()
+        if normal.dot(center - a) > 0:
+            normal.negate()
+        planes.append((normal, a))
+    return planes
+
+
+def _distance_to_frustum(planes, position):
+    """ Approximate distance (0 inside), the largest distance to any of the planes """
+    if not planes:
+        return 0
+    return max(0, max(normal.dot(position - point) for normal, point in planes))
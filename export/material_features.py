@@ -0,0 +1,92 @@
+from .. import utils
+
+# Nodes that read the UV map of the mesh
+UV_NODES = {
+    "LuxCoreNodeTexImagemap", "LuxCoreNodeTexUV", "LuxCoreNodeTexCheckerboard2D",
+    "LuxCoreNodeTexDots", "LuxCoreNodeTexMapping2D", "LuxCoreNodeTexNormalmap",
+    "LuxCoreNodeMatCloth",
+}
+VERTEX_COLOR_NODES = {"LuxCoreNodeTexHitpoint"}
+POINTINESS_NODES = {"LuxCoreNodeTexPointiness"}
+
+
+class MaterialFeatures(object):
+    """ The mesh attributes that a material (or all materials of an object) needs """
+
+    def __init__(self, uv=False, vertex_colors=False, pointiness=False):
+        self.uv = uv
+        self.vertex_colors = vertex_colors
+        self.pointiness = pointiness
+
+    def __or__(self, other):
+        return MaterialFeatures(self.uv or other.uv,
+                                self.vertex_colors or other.vertex_colors,
+                                self.pointiness or other.pointiness)
+
+    def __eq__(self, other):
+        return self.to_tuple() == other.to_tuple()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def to_tuple(self):
+        return self.uv, self.vertex_colors, self.pointiness
+
+    def __repr__(self):
+        return "MaterialFeatures(uv=%s, vertex_colors=%s, pointiness=%s)" % self.to_tuple()
+
+
+def analyze(material):
+    """ Walks the node tree of the material (and of the node trees it points to) once """
+    features = MaterialFeatures()
+    if material is None or material.luxcore.node_tree is None:
+        return features
+
+    _analyze_tree(material.luxcore.node_tree, features, set())
+    return features
+
+
+def get_object_features(exporter, blender_obj, scene, context):
+    """
+    Returns the combined features of all materials of the object, the mesh is exported
+    with one UV map and vertex color layer for all of them.
+    The UV map is always kept if the UV AOV is enabled.
+    """
+    features = MaterialFeatures()
+    render_layer = utils.get_current_render_layer(scene)
+    override_mat = render_layer.material_override if render_layer else None
+
+    if not context and override_mat:
+        # Only used in final render
+        features |= exporter.get_material_features(override_mat)
+    else:
+        for mat_slot in blender_obj.material_slots:
+            features |= exporter.get_material_features(mat_slot.material)
+
+    if render_layer and render_layer.luxcore.aovs.uv:
+        features.uv = True
+
+    return features
+
+
+def _analyze_tree(node_tree, features, visited):
+    key = utils.make_key(node_tree)
+    if key in visited:
+        return
+    visited.add(key)
+
+    for node in node_tree.nodes:
+        idname = node.bl_idname
+
+        if idname == "LuxCoreNodeTreePointer":
+            if node.node_tree:
+                _analyze_tree(node.node_tree, features, visited)
+        elif idname in UV_NODES:
+            features.uv = True
+        elif idname in VERTEX_COLOR_NODES:
+            features.vertex_colors = True
+        elif idname in POINTINESS_NODES:
+            features.pointiness = True
+        elif getattr(node, "use_anisotropy", False):
+            # Anisotropic roughness is oriented along the UV directions
+            features.uv = True
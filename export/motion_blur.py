@@ -3,7 +3,55 @@ from ..bin import pyluxcore
 from .. import utils
 
 
-def convert(context, scene, objects, exported_objects):
+# Key of the camera matrix in the subframe matrices
+CAMERA_KEY = "__camera__"
+
+
+class SubframeCache(object):
+    """
+    This class is a singleton.
+    Keeps the transforms of the last subframes of a frame in an animation render,
+    because they are needed again by the next frame if the shutter is open long enough.
+    Blender creates a new render engine for each frame, so the cache is kept here.
+    """
+    scene_name = None
+    frame = None
+    # {time (unit: frame): {object key: matrix}}
+    matrices = {}
+
+    @classmethod
+    def begin(cls, scene):
+        # Only valid if the previous frame of the same animation was rendered just before
+        consecutive = (cls.scene_name == scene.name
+                       and cls.frame == scene.frame_current - scene.frame_step
+                       and scene.frame_current != scene.frame_start)
+        if not consecutive:
+            cls.matrices = {}
+        cls.scene_name = scene.name
+        cls.frame = scene.frame_current
+
+    @classmethod
+    def get(cls, time, keys):
+        """ Returns the matrices of the time if all keys are cached, otherwise None """
+        step_matrices = cls.matrices.get(round(time, 6))
+        if step_matrices is None or any(key not in step_matrices for key in keys):
+            return None
+        return step_matrices
+
+    @classmethod
+    def put(cls, time, step_matrices):
+        cls.matrices[round(time, 6)] = step_matrices
+
+    @classmethod
+    def end(cls, frame_center):
+        # Earlier subframes are not used by the next frame
+        cls.matrices = {time: m for time, m in cls.matrices.items() if time > frame_center}
+
+
+def convert(context, scene, objects, exported_objects, use_cache=False):
+    """
+    use_cache: reuse the subframe transforms of the previous frame (only in animation renders)
+    """
     assert scene.camera
     motion_blur = scene.camera.data.luxcore.motion_blur
     assert motion_blur.enable and (motion_blur.object_blur or motion_blur.camera_blur)
@@ -12,7 +60,7 @@ def convert(context, scene, objects, exported_objects):
     assert steps >= 2 and isinstance(steps, int)
 
     frame_offsets = _calc_frame_offsets(motion_blur.shutter, steps)
-    matrices = _get_matrices(context, scene, steps, frame_offsets, objects, exported_objects)
+    matrices = _get_matrices(context, scene, steps, frame_offsets, objects, exported_objects, use_cache)
 
     # Find and delete entries of non-moving objects (where all matrices are equal)
     for prefix, matrix_steps in list(matrices.items()):
@@ -47,40 +95,92 @@ def _calc_frame_offsets(shutter, steps):
     return [step_interval * step - shutter / 2 for step in range(steps)]
 
 
-def _get_matrices(context, scene, steps, frame_offsets, objects=None, exported_objects=None):
+def _get_matrices(context, scene, steps, frame_offsets, objects=None, exported_objects=None, use_cache=False):
     motion_blur = scene.camera.data.luxcore.motion_blur
     matrices = {}  # {prefix: [matrix1, matrix2, ...]}
 
     frame_center = scene.frame_current
     subframe_center = scene.frame_subframe
 
+    # Objects without animation have the same matrix in all steps, they don't need to be sampled
+    animated_objs = []
+    if motion_blur.object_blur and objects and exported_objects:
+        animated_objs = [obj for obj in objects
+                         if utils.use_obj_motion_blur(obj, scene) and _is_animated(obj)]
+        static_count = len(objects) - len(animated_objs)
+    else:
+        static_count = 0
+    camera_blur = motion_blur.camera_blur and not context and _is_animated(scene.camera)
+
+    keys = [utils.make_key(obj) for obj in animated_objs]
+    if camera_blur:
+        keys.append(CAMERA_KEY)
+
+    if use_cache:
+        SubframeCache.begin(scene)
+
+    evaluations = 0
+    cached_steps = 0
+
     for step in range(steps):
         offset = frame_offsets[step]
         frame = frame_center + subframe_center + offset
-        frame_int = math.floor(frame)
-        subframe = frame - frame_int
-        scene.frame_set(frame_int, subframe)
+        step_matrices = SubframeCache.get(frame, keys) if (use_cache and keys) else None
+
+        if step_matrices is None:
+            step_matrices = {}
+
+            if keys:
+                frame_int = math.floor(frame)
+                subframe = frame - frame_int
+                scene.frame_set(frame_int, subframe)
+                evaluations += 1
 
-        if motion_blur.object_blur and objects and exported_objects:
-            _append_object_matrices(scene, objects, exported_objects, matrices, step)
+                for obj, key in zip(animated_objs, keys):
+                    step_matrices[key] = obj.matrix_world.copy()
+                if camera_blur:
+                    step_matrices[CAMERA_KEY] = scene.camera.matrix_world.copy()
 
-        if motion_blur.camera_blur and not context:
-            matrix = scene.camera.matrix_world
+            if use_cache:
+                SubframeCache.put(frame, step_matrices)
+        else:
+            cached_steps += 1
 
+        _append_object_matrices(animated_objs, exported_objects, matrices, step, step_matrices)
+
+        if camera_blur:
             prefix = "scene.camera."
-            _append_matrix(matrices, prefix, matrix, step)
+            _append_matrix(matrices, prefix, step_matrices[CAMERA_KEY], step)
+
+    if evaluations:
+        # Restore original frame
+        scene.frame_set(frame_center, subframe_center)
+        evaluations += 1
+
+    if use_cache:
+        SubframeCache.end(frame_center)
 
-    # Restore original frame
-    scene.frame_set(frame_center, subframe_center)
+    # Without pre-filtering and caching, each step and the restore would evaluate the scene
+    print("[Motion Blur] %d of %d scene evaluations needed (%d static objects skipped, %d cached subframes)"
+          % (evaluations, steps + 1, static_count, cached_steps))
     return matrices
 
 
-def _append_object_matrices(scene, objects, exported_objects, matrices, step):
-    for obj in objects:
-        if not utils.use_obj_motion_blur(obj, scene):
-            # User disabled motion blur for this object, skip it
-            continue
+def _is_animated(obj):
+    """ Whether the transformation of the object can change over time """
+    while obj:
+        anim_data = obj.animation_data
+        if anim_data and (anim_data.action or anim_data.drivers or anim_data.nla_tracks):
+            return True
+        if obj.constraints or obj.rigid_body:
+            return True
+        # The parent moves the object with it
+        obj = obj.parent
+    return False
+
 
+def _append_object_matrices(objects, exported_objects, matrices, step, step_matrices):
+    for obj in objects:
         key = utils.make_key(obj)
 
         try:
@@ -93,8 +193,7 @@ def _append_object_matrices(scene, objects, exported_objects, matrices, step):
                 else:
                     prefix = "scene.lights." + luxcore_name + "."
 
-                matrix = obj.matrix_world
-                _append_matrix(matrices, prefix, matrix, step)
+                _append_matrix(matrices, prefix, step_matrices[key], step)
         except KeyError:
             # This is not a problem, objects are skipped during epxort for various reasons
             # E.g. if the object is not visible, or if it's a camera
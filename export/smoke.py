@@ -1,9 +1,24 @@
-from .. import utils
+from time import time
 import array
+from .. import utils
+from . import volume_cache
+from .volume_cache import VolumeCache
+
 
+def convert(exporter, smoke_obj, channel):
+    """
+    Returns the resolution and the grid of the channel as a float array.
+
+    The grid is read once per domain, channel and frame in an export and shared
+    by all smoke nodes (see exporter.smoke_cache). The array is passed to LuxCore
+    directly through the buffer protocol, without an intermediate list.
+    Grids of baked simulations are stored in the volume cache (see export/volume_cache.py).
+    In the viewport, the grid is downsampled by exporter.volume_downsampling.
+    """
+    key = (utils.make_key(smoke_obj), channel, exporter.scene.frame_current)
+    if key in exporter.smoke_cache:
+        return exporter.smoke_cache[key]
 
-def convert(smoke_obj, channel):
-    from time import time
     start = time()
 
     # Search smoke domain target for smoke modifiers
@@ -30,12 +45,23 @@ def convert(smoke_obj, channel):
     else:
         raise NotImplementedError("Unknown channel type " + channel)
 
+    downsampling = exporter.volume_downsampling
+    cache_key = VolumeCache.get_key(smoke_obj, settings, channel, exporter.scene, downsampling)
+    if cache_key:
+        cached = VolumeCache.load(cache_key)
+        if cached:
+            print("[Smoke] Loading cached %s grid of %s took %.3f s" % (channel, smoke_obj.name, time() - start))
+            exporter.smoke_cache[key] = cached
+            return cached
+
     # Prevent a crash
-    if len(grid) == 0:
+    grid_len = len(grid)
+    if grid_len == 0:
         msg = 'Object "%s": No smoke data (simulate some frames first)' % smoke_obj.name
         raise Exception(msg)
 
-    channeldata = list(grid)
+    # bpy_prop_array has no foreach_get() in Blender 2.79
+    channeldata = array.array("f", grid)
 
     # The smoke resolution along the x, y, z axis
     resolution = list(settings.domain_resolution)
@@ -45,6 +71,13 @@ def convert(smoke_obj, channel):
         for i in range(3):
             resolution[i] *= settings.amplify + 1
 
-    print("conversion to list took %.3f s" % (time() - start))
+    # 1 value per voxel, or 4 in case of the color grid
+    channels = grid_len // (resolution[0] * resolution[1] * resolution[2])
+    resolution, channeldata = volume_cache.downsample(channeldata, resolution, channels, downsampling)
+    if cache_key:
+        VolumeCache.save(cache_key, resolution, channels, channeldata)
+
+    print("[Smoke] Reading %s grid of %s took %.3f s" % (channel, smoke_obj.name, time() - start))
 
+    exporter.smoke_cache[key] = resolution, channeldata
     return resolution, channeldata
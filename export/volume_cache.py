@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import bpy
+import numpy
+from .. import utils
+from ..utils import hashing
+from ..utils.disk_cache import DiskCache
+
+VOLUME_CACHE_SUBDIR = "volumes"
+# Edge length of the blocks in voxels
+BLOCK_SIZE = 16
+
+
+class VolumeCache(object):
+    """
+    This class is a singleton.
+    Stores smoke grids on disk in a sparse block format.
+
+    A grid is split into blocks of BLOCK_SIZE^3 voxels. Only blocks that contain non-zero
+    values are stored, together with an index of their block coordinates:
+        <key>.json         resolution, channels, block size
+        <key>_index.npy    int32 array (n, 3), block coordinates (z, y, x)
+        <key>_blocks.npy   float32 array (n, B, B, B, channels)
+    The npy files are memory-mapped when a grid is loaded, so only the occupied blocks are read.
+    Downsampled levels for the viewport are stored in the same format with their own key.
+    """
+
+    @staticmethod
+    def get_key(smoke_obj, settings, channel, scene, downsampling):
+        """
+        Returns None if the grid can't be cached because the simulation is not baked,
+        or because the .blend file is not saved (the key would not be unique)
+        """
+        point_cache = settings.point_cache
+        if not point_cache.is_baked or not bpy.data.filepath:
+            return None
+
+        params = [
+            bpy.data.filepath, smoke_obj.name, smoke_obj.library.filepath if smoke_obj.library else "",
+            channel, scene.frame_current, downsampling,
+            point_cache.name, point_cache.frame_start, point_cache.frame_end,
+        ]
+
+        if point_cache.use_disk_cache:
+            # A re-bake rewrites the cache files
+            params.append(_get_disk_cache_mtime(point_cache))
+
+        sha = hashlib.sha1()
+        sha.update(repr(params).encode("utf-8"))
+        # A bake kept in memory can only be told apart by the settings it was baked with
+        visited = set()
+        hashing.update_rna_struct(sha, settings, scene, visited)
+        for flow_obj, flow_settings in _get_flows(settings, scene):
+            hashing.update_object_inputs(sha, flow_obj, scene, visited)
+            hashing.update_rna_struct(sha, flow_settings, scene, visited)
+        return sha.hexdigest()
+
+    @staticmethod
+    def _get_cache():
+        preferences = utils.get_addon_preferences()
+        max_size = preferences.volume_cache_size if preferences else 8192
+        return DiskCache(VOLUME_CACHE_SUBDIR, max_size)
+
+    @classmethod
+    def load(cls, key):
+        """ Returns (resolution, flat float32 array) or None """
+        cache = cls._get_cache()
+        meta_path = cache.lookup(key + ".json")
+        index_path = cache.lookup(key + "_index.npy")
+        blocks_path = cache.lookup(key + "_blocks.npy")
+        if not (meta_path and index_path and blocks_path):
+            return None
+
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            index = numpy.load(index_path, mmap_mode="r")
+            blocks = numpy.load(blocks_path, mmap_mode="r")
+        except (OSError, ValueError) as error:
+            print("[VolumeCache] Could not load %s: %s" % (key, error))
+            return None
+
+        resolution = meta["resolution"]
+        data = from_blocks(index, blocks, resolution, meta["channels"], meta["block_size"])
+        return resolution, data
+
+    @classmethod
+    def save(cls, key, resolution, channels, data):
+        cache = cls._get_cache()
+        index, blocks = to_blocks(data, resolution, channels, BLOCK_SIZE)
+
+        paths = []
+        for suffix, array in (("_index.npy", index), ("_blocks.npy", blocks)):
+            path = cache.get_path(key + suffix)
+            # Keep the .npy extension, numpy.save() appends it otherwise
+            temp_path = cache.get_path(key + suffix[:-4] + ".tmp.npy")
+            numpy.save(temp_path, array)
+            os.replace(temp_path, path)
+            paths.append(path)
+
+        # The meta file is written last, a grid without it is incomplete
+        meta = {
+            "resolution": list(resolution),
+            "channels": channels,
+            "block_size": BLOCK_SIZE,
+        }
+        meta_path = cache.get_path(key + ".json")
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        paths.append(meta_path)
+
+        cache.evict(keep=paths)
+        total_blocks = numpy.prod([-(-n // BLOCK_SIZE) for n in resolution])
+        print("[VolumeCache] Stored %d of %d blocks" % (len(index), total_blocks))
+
+
+def to_blocks(data, resolution, channels, block_size):
+    """ Returns the coordinates and the contents of the blocks that contain non-zero values """
+    grid = _pad(data, resolution, channels, block_size)
+    blocks = _block_view(grid, block_size)
+    occupied = numpy.any(blocks != 0, axis=(3, 4, 5, 6))
+    index = numpy.argwhere(occupied).astype(numpy.int32)
+    return index, numpy.ascontiguousarray(blocks[occupied])
+
+
+def from_blocks(index, blocks, resolution, channels, block_size):
+    """ Returns the flat grid, empty blocks are filled with zeros """
+    nx, ny, nz = resolution
+    shape = tuple(_round_up(n, block_size) for n in (nz, ny, nx)) + (channels,)
+    grid = numpy.zeros(shape, dtype=numpy.float32)
+
+    if len(index):
+        view = _block_view(grid, block_size)
+        view[index[:, 0], index[:, 1], index[:, 2]] = blocks
+
+    return numpy.ascontiguousarray(grid[:nz, :ny, :nx]).ravel()
+
+
+def downsample(data, resolution, channels, factor):
+    """ Averages factor^3 voxels, returns (resolution, flat grid) """
+    if factor <= 1:
+        return resolution, data
+
+    grid = _pad(data, resolution, channels, factor)
+    pz, py, px = grid.shape[:3]
+    grid = grid.reshape(pz // factor, factor, py // factor, factor, px // factor, factor, channels)
+    grid = grid.mean(axis=(1, 3, 5), dtype=numpy.float32)
+    new_resolution = [px // factor, py // factor, pz // factor]
+    return new_resolution, numpy.ascontiguousarray(grid).ravel()
+
+
+def _round_up(n, multiple):
+    return -(-n // multiple) * multiple
+
+
+def _pad(data, resolution, channels, multiple):
+    """ Returns the grid with shape (z, y, x, channels), padded with zeros to a multiple """
+    nx, ny, nz = resolution
+    # Blender stores the voxels with x varying fastest
+    grid = numpy.asarray(data, dtype=numpy.float32).reshape(nz, ny, nx, channels)
+    shape = tuple(_round_up(n, multiple) for n in (nz, ny, nx))
+
+    if shape == (nz, ny, nx):
+        return grid
+
+    padded = numpy.zeros(shape + (channels,), dtype=numpy.float32)
+    padded[:nz, :ny, :nx] = grid
+    return padded
+
+
+def _block_view(grid, block_size):
+    """ View of the grid with shape (bz, by, bx, B, B, B, channels) """
+    pz, py, px, channels = grid.shape
+    b = block_size
+    view = grid.reshape(pz // b, b, py // b, b, px // b, b, channels)
+    return view.transpose(0, 2, 4, 1, 3, 5, 6)
+
+
+def _get_flows(settings, scene):
+    """ Returns a list of (object, flow settings) of the smoke flows that affect the domain """
+    objects = settings.fluid_group.objects if settings.fluid_group else scene.objects
+    flows = []
+
+    for obj in sorted(objects, key=lambda o: o.name):
+        for mod in obj.modifiers:
+            if mod.type == "SMOKE" and mod.smoke_type == "FLOW":
+                flows.append((obj, mod.flow_settings))
+
+    return flows
+
+
+def _get_disk_cache_mtime(point_cache):
+    if point_cache.use_external:
+        directory = bpy.path.abspath(point_cache.filepath)
+    else:
+        blend_name = bpy.path.display_name_from_filepath(bpy.data.filepath)
+        directory = bpy.path.abspath("//blendcache_" + blend_name)
+
+    try:
+        return os.path.getmtime(directory)
+    except OSError:
+        return 0
@@ -6,17 +6,28 @@ from bgl import *
 from ..bin import pyluxcore
 from bpy.app.handlers import persistent
 from ..export.image import ImageExporter
+from ..export.image_proxy import ImageProxies
+from ..export.ies_cache import IESCache
+from ..engine.film_retention import FilmRetention
+from ..engine.persistent_data import PersistentData
+from ..engine.preview import PreviewSessionPool
 from .. import utils
 from ..utils import compatibility
 
 
 def blendluxcore_exit():
     ImageExporter.cleanup()
+    IESCache.cleanup()
+    FilmRetention.cleanup()
+    PersistentData.cleanup()
+    PreviewSessionPool.cleanup()
 
 
 @persistent
 def luxcore_load_post(_):
     """ Note: the only argument Blender passes is always None """
+    # The kept scenes reference datablocks of the old file
+    PersistentData.cleanup()
 
     for scene in bpy.data.scenes:
         # Update OpenCL devices if .blend is opened on
@@ -40,6 +51,12 @@ def luxcore_load_post(_):
     compatibility.run()
 
 
+@persistent
+def luxcore_undo_post(_):
+    # Undo replaces all datablocks, the kept scenes would reference freed memory
+    PersistentData.cleanup()
+
+
 # We only sync material and node tree names every second to reduce CPU load
 NAME_UPDATE_INTERVAL = 1  # seconds
 last_name_update = time()
@@ -47,6 +64,15 @@ last_name_update = time()
 @persistent
 def luxcore_scene_update_post(scene):
     global last_name_update
+
+    # Apply imagepipeline changes to films kept after final renders (has its own throttling)
+    FilmRetention.update(scene)
+    # Collect changes for the next final render (has to happen on every update)
+    PersistentData.accumulate(scene)
+    PreviewSessionPool.cleanup(idle_only=True)
+    # Use the viewport texture proxies that were created in the background
+    ImageProxies.process_queue()
+
     if time() - last_name_update < NAME_UPDATE_INTERVAL:
         return
     last_name_update = time()
@@ -125,6 +151,8 @@ def register():
 
     bpy.app.handlers.load_post.append(luxcore_load_post)
     bpy.app.handlers.scene_update_post.append(luxcore_scene_update_post)
+    bpy.app.handlers.undo_post.append(luxcore_undo_post)
+    bpy.app.handlers.redo_post.append(luxcore_undo_post)
 
     # args: The arguments for the draw_callback function, in our case no arguments
     args = ()
@@ -135,4 +163,6 @@ def register():
 def unregister():
     bpy.app.handlers.load_post.remove(luxcore_load_post)
     bpy.app.handlers.scene_update_post.remove(luxcore_scene_update_post)
+    bpy.app.handlers.undo_post.remove(luxcore_undo_post)
+    bpy.app.handlers.redo_post.remove(luxcore_undo_post)
     bpy.types.SpaceView3D.draw_handler_remove(luxcore_draw_3dview_handle, 'WINDOW')
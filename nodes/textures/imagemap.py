@@ -1,6 +1,7 @@
 import bpy
-from bpy.props import PointerProperty, EnumProperty, BoolProperty, FloatProperty
+from bpy.props import PointerProperty, EnumProperty, BoolProperty, FloatProperty, IntProperty
 from .. import LuxCoreNodeTexture
+from ...export import image as image_export
 from ...export.image import ImageExporter
 from ...utils import node as utils_node
 from ... import utils
@@ -12,6 +13,12 @@ NORMAL_MAP_DESC = (
     "normal maps) are supported. Brightness and gamma will be set to 1"
 )
 NORMAL_SCALE_DESC = "Height multiplier, used to adjust the baked-in height of the normal map"
+STORAGE_DESC = (
+    "How many bytes to use per value. Auto uses 1 byte for 8 bit images, half precision for half "
+    "float images and 16 bit color images, and full precision for 32 bit images and 16 bit images "
+    "that are not used as color (e.g. bump maps). Images of which only one channel is selected are "
+    "stored with one channel"
+)
 
 
 class LuxCoreNodeTexImagemap(LuxCoreNodeTexture):
@@ -47,6 +54,15 @@ class LuxCoreNodeTexImagemap(LuxCoreNodeTexture):
     ]
     wrap = EnumProperty(name="Wrap", items=wrap_items, default="repeat")
 
+    storage_items = [
+        ("auto", "Auto", "Choose the precision from the bit depth of the image", 0),
+        ("byte", "Byte", "1 byte per value", 1),
+        ("half", "Half", "2 bytes per value (half precision float)", 2),
+        ("float", "Float", "4 bytes per value (full precision float)", 3),
+    ]
+    storage = EnumProperty(name="Precision", items=storage_items, default="auto",
+                           description=STORAGE_DESC)
+
     def update_is_normal_map(self, context):
         color_output = self.outputs["Color"]
         bump_output = self.outputs["Bump"]
@@ -102,6 +118,29 @@ class LuxCoreNodeTexImagemap(LuxCoreNodeTexture):
 
     show_thumbnail = BoolProperty(name="", default=True, description="Show thumbnail")
 
+    # Image sequence settings (same meaning as in the Blender image user)
+    frame_duration = IntProperty(name="Frames", default=100, min=1,
+                                 description="Number of images of the sequence to use")
+    frame_start = IntProperty(name="Start Frame", default=1,
+                              description="Scene frame at which the sequence starts")
+    frame_offset = IntProperty(name="Offset", default=0,
+                               description="Offset the number of the frame to use in the sequence")
+    use_cyclic = BoolProperty(name="Cyclic", default=False,
+                              description="Cycle the images in the sequence")
+
+    def get_sequence_frame(self, scene_frame):
+        """ Returns the number of the sequence file to use in the scene frame """
+        frame = scene_frame - self.frame_start + 1
+        duration = self.frame_duration
+
+        if self.use_cyclic:
+            frame %= duration
+            if frame == 0:
+                frame = duration
+
+        frame = min(max(frame, 0), duration)
+        return frame + self.frame_offset
+
     def init(self, context):
         self.add_input("LuxCoreSocketFloatPositive", "Gamma", 2.2)
         self.add_input("LuxCoreSocketFloatPositive", "Brightness", 1)
@@ -137,12 +176,30 @@ class LuxCoreNodeTexImagemap(LuxCoreNodeTexture):
             col.prop(self, "channel")
 
         col.prop(self, "wrap")
+        col.prop(self, "storage")
+
+        if self.image and self.image.source == "SEQUENCE":
+            box = col.box()
+            box.prop(self, "frame_duration")
+            box.prop(self, "frame_start")
+            box.prop(self, "frame_offset")
+            box.prop(self, "use_cyclic")
 
         # Info about UV mapping (only show if default is used,
         # when no mapping node is linked)
         if not self.inputs["2D Mapping"].is_linked:
             utils_node.draw_uv_info(context, col)
 
+    def _is_data(self):
+        """ True if the image is not only used as a color (normal map, bump, float inputs) """
+        if self.is_normal_map:
+            return True
+        for output in self.outputs:
+            for link in output.links:
+                if link.to_socket.bl_idname != "LuxCoreSocketColor":
+                    return True
+        return False
+
     def sub_export(self, exporter, props, luxcore_name=None):
         if self.image is None:
             if self.is_normal_map:
@@ -150,8 +207,12 @@ class LuxCoreNodeTexImagemap(LuxCoreNodeTexture):
             else:
                 return [0, 0, 0]
 
+        frame = None
+        if self.image.source == "SEQUENCE":
+            frame = self.get_sequence_frame(exporter.scene.frame_current)
+
         try:
-            filepath = ImageExporter.export(self.image)
+            filepath = ImageExporter.export(self.image, exporter.texture_size_limit, frame)
         except OSError as error:
             msg = 'Node "%s" in tree "%s": %s' % (self.name, self.id_data.name, error)
             exporter.scene.luxcore.errorlog.add_warning(msg)
@@ -159,10 +220,18 @@ class LuxCoreNodeTexImagemap(LuxCoreNodeTexture):
 
         uvscale, uvrotation, uvdelta = self.inputs["2D Mapping"].export(exporter, props)
 
+        channel = "rgb" if self.is_normal_map else self.channel
+        if self.storage == "auto":
+            storage = image_export.get_storage(self.image, filepath, self._is_data())
+        else:
+            storage = self.storage
+        exporter.add_texture_memory(self.image, filepath, storage, channel)
+
         definitions = {
             "type": "imagemap",
             "file": filepath,
             "wrap": self.wrap,
+            "storage": storage,
             # Mapping
             "mapping.type": "uvmapping2d",
             "mapping.uvscale": uvscale,
@@ -172,13 +241,13 @@ class LuxCoreNodeTexImagemap(LuxCoreNodeTexture):
 
         if self.is_normal_map:
             definitions.update({
-                "channel": "rgb",
+                "channel": channel,
                 "gamma": 1,
                 "gain": 1,
             })
         else:
             definitions.update({
-                "channel": self.channel,
+                "channel": channel,
                 "gamma": self.inputs["Gamma"].export(exporter, props),
                 "gain": self.inputs["Brightness"].export(exporter, props),
             })
@@ -105,7 +105,7 @@ class LuxCoreNodeTexSmoke(LuxCoreNodeTexture):
                                                      apply_worldscale=True,
                                                      invert=True)
 
-        resolution, grid = smoke.convert(self.domain, self.source)
+        resolution, grid = smoke.convert(exporter, self.domain, self.source)
         nx, ny, nz = resolution
 
         definitions = {
@@ -122,7 +122,8 @@ class LuxCoreNodeTexSmoke(LuxCoreNodeTexture):
 
         luxcore_name = self.create_props(props, definitions, luxcore_name)
         prefix = self.prefix + luxcore_name + "."
-        # We use a fast path (AddAllFloat method) here to transfer the grid data to the properties
+        # We use a fast path (AddAllFloat method) here to transfer the grid data to the properties,
+        # the float array is read through the buffer protocol
 
         if self.source == "color":
             prop = pyluxcore.Property(prefix + "data3", [])
@@ -1,5 +1,6 @@
 import bpy
 from bpy.props import IntProperty
+from ..engine import remix
 # from ..properties.lightgroups import MAX_LIGHTGROUPS
 
 
@@ -31,3 +32,25 @@ class LUXCORE_OT_remove_lightgroup(bpy.types.Operator):
         groups = context.scene.luxcore.lightgroups
         groups.remove(self.index)
         return {"FINISHED"}
+
+
+class LUXCORE_OT_remix_lightgroups(bpy.types.Operator):
+    bl_idname = "luxcore.remix_lightgroups"
+    bl_label = "Remix"
+    bl_description = ("Combine the saved light groups of the last render with the "
+                      "current light group settings, without rendering again")
+
+    @classmethod
+    def poll(cls, context):
+        return remix.has_buffers(context.scene)
+
+    def execute(self, context):
+        # Probe the white points of the current temperatures while the render starts
+        remix.WhitePointProbe.precompute(remix.get_temperatures(context.scene))
+        remix.LightgroupRemix.requested = True
+        result = bpy.ops.render.render("INVOKE_DEFAULT")
+
+        if "CANCELLED" in result:
+            remix.LightgroupRemix.requested = False
+            return {"CANCELLED"}
+        return {"FINISHED"}
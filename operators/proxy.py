@@ -0,0 +1,109 @@
+import os
+import bpy
+import numpy
+from bpy.props import StringProperty
+from mathutils import Vector
+from .. import utils
+from ..utils import ply
+from .utils import poll_object
+
+# Faces of the placeholder box, indices into the corners of the bounding box
+BOX_FACES = [
+    (0, 1, 2, 3), (4, 7, 6, 5), (0, 4, 5, 1),
+    (1, 5, 6, 2), (2, 6, 7, 3), (4, 0, 3, 7),
+]
+
+
+class LUXCORE_OT_proxy_create(bpy.types.Operator):
+    bl_idname = "luxcore.proxy_create"
+    bl_label = "Create Proxy"
+    bl_description = ("Export the mesh (with modifiers) to one PLY file per material and replace "
+                      "it with a placeholder box. The files are loaded directly by LuxCore. "
+                      "Modifiers are removed from the object")
+    bl_options = {"UNDO"}
+
+    directory = StringProperty(name="Directory", subtype="DIR_PATH")
+
+    @classmethod
+    def poll(cls, context):
+        return poll_object(context) and context.object.type == "MESH"
+
+    def invoke(self, context, event):
+        if not self.directory:
+            # Next to the .blend file, or in the cache directory if it is not saved yet
+            if bpy.data.filepath:
+                self.directory = bpy.path.abspath("//luxcore_proxies")
+            else:
+                self.directory = utils.get_cache_dir("proxies_mesh")
+        context.window_manager.fileselect_add(self)
+        return {"RUNNING_MODAL"}
+
+    def execute(self, context):
+        obj = context.object
+        scene = context.scene
+        directory = bpy.path.abspath(self.directory)
+
+        mesh = obj.to_mesh(scene, True, "RENDER")
+        if mesh is None or len(mesh.tessfaces) == 0:
+            if mesh:
+                bpy.data.meshes.remove(mesh, do_unlink=False)
+            self.report({"ERROR"}, "Object has no faces")
+            return {"CANCELLED"}
+
+        name = bpy.path.clean_name(obj.name)
+
+        def get_filepath(material_index):
+            return os.path.join(directory, "%s_%03d.ply" % (name, material_index))
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+            active_uv = utils.find_active_uv(mesh.tessface_uv_textures)
+            written = ply.write_mesh(mesh, active_uv, get_filepath)
+        except OSError as error:
+            self.report({"ERROR"}, "Could not write proxy: %s" % error)
+            bpy.data.meshes.remove(mesh, do_unlink=False)
+            return {"CANCELLED"}
+
+        placeholder = _create_placeholder(obj, mesh)
+        bpy.data.meshes.remove(mesh, do_unlink=False)
+
+        old_mesh = obj.data
+        obj.data = placeholder
+        obj.modifiers.clear()
+        # The placeholder box should not hide other objects in the viewport
+        obj.draw_type = "WIRE"
+        if old_mesh.users == 0:
+            bpy.data.meshes.remove(old_mesh)
+
+        obj.luxcore.proxies.clear()
+        for material_index, filepath in written:
+            proxy = obj.luxcore.proxies.add()
+            proxy.material_index = material_index
+            proxy.filepath = bpy.path.relpath(filepath) if bpy.data.filepath else filepath
+        obj.luxcore.use_proxy = True
+
+        self.report({"INFO"}, "Exported %d proxy files to %s" % (len(written), directory))
+        return {"FINISHED"}
+
+
+def _create_placeholder(obj, mesh):
+    """ Returns a box mesh with the bounds and the materials of the mesh """
+    co = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)
+    low = Vector(co.min(axis=0).tolist())
+    high = Vector(co.max(axis=0).tolist())
+
+    corners = [
+        (low.x, low.y, low.z), (low.x, high.y, low.z), (high.x, high.y, low.z), (high.x, low.y, low.z),
+        (low.x, low.y, high.z), (low.x, high.y, high.z), (high.x, high.y, high.z), (high.x, low.y, high.z),
+    ]
+
+    placeholder = bpy.data.meshes.new(obj.name + "_proxy")
+    placeholder.from_pydata(corners, [], BOX_FACES)
+    placeholder.update()
+
+    for mat in obj.data.materials:
+        placeholder.materials.append(mat)
+
+    return placeholder
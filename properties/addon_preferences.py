@@ -1,5 +1,25 @@
 from os.path import basename, dirname
 from bpy.types import AddonPreferences
+from bpy.props import StringProperty, IntProperty
+
+CACHE_DIR_DESC = (
+    "Directory where LuxCore stores cached data (retained films, images, etc.). "
+    "If empty, a folder in the temporary directory of the system is used"
+)
+IMAGE_CACHE_SIZE_DESC = (
+    "Maximum size of the cache for packed and generated images. "
+    "When it is exceeded, the least recently used images are deleted"
+)
+
+VOLUME_CACHE_SIZE_DESC = (
+    "Maximum size of the cache for smoke grids of baked simulations. "
+    "When it is exceeded, the least recently used grids are deleted"
+)
+
+EXPORT_CACHE_SIZE_DESC = (
+    "Maximum size of the cache for exported meshes (used if the export cache is enabled in the "
+    "LuxCore config). When it is exceeded, the least recently used meshes are deleted"
+)
 
 
 class LuxCoreAddonPreferences(AddonPreferences):
@@ -8,7 +28,13 @@ class LuxCoreAddonPreferences(AddonPreferences):
     # We use dirname() two times to go up one level in the file system
     bl_idname = basename(dirname(dirname(__file__)))
 
-    # We could add properties here
+    cache_dir = StringProperty(name="Cache Directory", subtype="DIR_PATH", description=CACHE_DIR_DESC)
+    image_cache_size = IntProperty(name="Image Cache Size (MB)", default=4096, min=64,
+                                   description=IMAGE_CACHE_SIZE_DESC)
+    volume_cache_size = IntProperty(name="Smoke Cache Size (MB)", default=8192, min=64,
+                                    description=VOLUME_CACHE_SIZE_DESC)
+    export_cache_size = IntProperty(name="Export Cache Size (MB)", default=8192, min=64,
+                                    description=EXPORT_CACHE_SIZE_DESC)
 
     def draw(self, context):
         layout = self.layout
@@ -18,3 +44,8 @@ class LuxCoreAddonPreferences(AddonPreferences):
         row.operator("luxcore.change_version")
         # Add empty space to the right of the button
         row.label()
+
+        layout.prop(self, "cache_dir")
+        layout.prop(self, "image_cache_size")
+        layout.prop(self, "volume_cache_size")
+        layout.prop(self, "export_cache_size")
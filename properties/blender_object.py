@@ -1,5 +1,8 @@
 import bpy
-from bpy.props import PointerProperty, BoolProperty, FloatProperty, IntProperty
+from bpy.props import (
+    PointerProperty, BoolProperty, FloatProperty, IntProperty,
+    CollectionProperty, StringProperty,
+)
 from bpy.types import PropertyGroup
 
 DESC_VISIBLE_TO_CAM = (
@@ -7,12 +10,24 @@ DESC_VISIBLE_TO_CAM = (
     "Note that it will still be visible in indirect light, shadows and reflections"
 )
 DESC_MOTION_BLUR = "Export this object as instance if object motion blur is enabled in camera settings"
+DESC_USE_PROXY = (
+    "Render the mesh from the proxy files instead of the placeholder mesh in Blender. "
+    "The files are loaded directly by LuxCore"
+)
 
 
 def init():
     bpy.types.Object.luxcore = PointerProperty(type=LuxCoreObjectProps)
 
 
+class LuxCoreProxyFile(PropertyGroup):
+    # One binary PLY file per material of the proxy
+    filepath = StringProperty(name="File", subtype="FILE_PATH")
+    material_index = IntProperty(name="Material Index", min=0)
+
+
 class LuxCoreObjectProps(PropertyGroup):
     visible_to_camera = BoolProperty(name="Visible to Camera", default=True, description=DESC_VISIBLE_TO_CAM)
     enable_motion_blur = BoolProperty(name="Motion Blur", default=True, description=DESC_MOTION_BLUR)
+    use_proxy = BoolProperty(name="Use Proxy", default=False, description=DESC_USE_PROXY)
+    proxies = CollectionProperty(type=LuxCoreProxyFile)
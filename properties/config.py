@@ -21,6 +21,25 @@ THRESH_REDUCT_DESC = (
     "then continue with the lowered noise level"
 )
 
+AUTO_IMPORTANCE_DESC = (
+    "Estimate the contribution of point, spot and area lights from their power, size, "
+    "IES profile, cone and distance to the camera view, and scale their importance accordingly. "
+    "Their total importance stays the same, so the share of other lights and the world is unchanged. "
+    "The estimated values are printed in the console"
+)
+
+EXPORT_CACHE_DESC = (
+    "Store the evaluated meshes of the final render in the cache directory and load them "
+    "from there in the next render if the mesh, its modifiers and the objects they use did "
+    "not change. Use a shared cache directory (addon preferences) to share the cache between "
+    "machines of a render farm"
+)
+
+PERSISTENT_DATA_DESC = (
+    "Keep the exported scene in memory after a final render. The next render only exports "
+    "what was changed in the meantime. Not used in animations, with motion blur or checkpoints"
+)
+
 SIMPLE_DESC = "Recommended for scenes with simple lighting (outdoors, studio setups, indoors with large windows)"
 COMPLEX_DESC = "Recommended for scenes with difficult lighting (caustics, indoors with small windows)"
 
@@ -222,6 +241,8 @@ class LuxCoreConfig(PropertyGroup):
     ]
     light_strategy = EnumProperty(name="Light Strategy", items=light_strategy_items, default="LOG_POWER",
                                   description="Decides how the lights in the scene are sampled")
+    use_auto_importance = BoolProperty(name="Auto Importance", default=False,
+                                       description=AUTO_IMPORTANCE_DESC)
 
     # FILESAVER options
     use_filesaver = BoolProperty(name="Only write LuxCore scene", default=False)
@@ -232,6 +253,11 @@ class LuxCoreConfig(PropertyGroup):
     filesaver_format = EnumProperty(name="", items=filesaver_format_items, default="BIN")
     filesaver_path = StringProperty(name="", subtype="DIR_PATH")
 
+    # Export cache (see export/export_cache.py)
+    use_export_cache = BoolProperty(name="Export Cache", default=False, description=EXPORT_CACHE_DESC)
+    # Keep the exporter between final renders (see engine/persistent_data.py)
+    use_persistent_data = BoolProperty(name="Persistent Data", default=False, description=PERSISTENT_DATA_DESC)
+
     # Seed
     seed = IntProperty(name="Seed", default=1, min=1, description=SEED_DESC)
     use_animated_seed = BoolProperty(name="Animated Seed", default=False, description=ANIM_SEED_DESC)
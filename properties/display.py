@@ -1,5 +1,17 @@
 import bpy
-from bpy.props import IntProperty
+from bpy.props import IntProperty, EnumProperty, BoolProperty
+
+FILM_RETENTION_DESC = (
+    "Keep the film after the final render has finished, so changes to the imagepipeline "
+    "(tonemapper, bloom, vignetting, light group gains etc.) can be applied without re-rendering. "
+    'The result is shown in the image "LuxCore Film: <render layer>"'
+)
+
+VIEWPORT_TEXTURE_LIMIT_DESC = (
+    "Use downscaled copies of image textures and HDRIs in the viewport render. "
+    "The copies are created in a background thread and stored in the cache directory. "
+    "Until a copy is ready, the original image is used. The final render always uses the original images"
+)
 
 
 class LuxCoreDisplaySettings(bpy.types.PropertyGroup):
@@ -8,3 +20,30 @@ class LuxCoreDisplaySettings(bpy.types.PropertyGroup):
     viewport_halt_time = IntProperty(name="Viewport Halt Time (s)", default=10, min=1,
                                      description="How long to render in the viewport."
                                                  "When this time is reached, the render is paused")
+    use_viewport_texture_limit = BoolProperty(name="Limit Texture Size", default=False,
+                                              description=VIEWPORT_TEXTURE_LIMIT_DESC)
+    viewport_texture_limit = IntProperty(name="Max Size", default=1024, min=64, soft_max=8192,
+                                         subtype="PIXEL",
+                                         description="Maximum width or height of images in the viewport render")
+
+    viewport_volume_downsampling_items = [
+        ("1", "Full", "Use the full resolution of smoke grids", 0),
+        ("2", "1/2", "Use half the resolution of smoke grids", 1),
+        ("4", "1/4", "Use a quarter of the resolution of smoke grids", 2),
+        ("8", "1/8", "Use an eighth of the resolution of smoke grids", 3),
+    ]
+    viewport_volume_downsampling = EnumProperty(name="Smoke Resolution", items=viewport_volume_downsampling_items,
+                                                default="1",
+                                                description="Resolution of smoke grids in the viewport render. "
+                                                            "Lower resolutions export and render faster")
+
+    film_retention_items = [
+        ("NONE", "Off", "Discard the film when the render is finished", 0),
+        ("MEMORY", "Memory", "Keep the films of the last render in memory (fastest, but uses RAM)", 1),
+        ("DISK", "Disk", "Save the films to the cache directory (see addon preferences)", 2),
+    ]
+    film_retention = EnumProperty(name="Keep Film", items=film_retention_items, default="NONE",
+                                  description=FILM_RETENTION_DESC)
+    film_cache_size = IntProperty(name="Film Cache Size (MB)", default=4096, min=64,
+                                  description="When the cached films on disk take up more space, "
+                                              "the least recently used films are deleted")
@@ -1,5 +1,5 @@
 import bpy
-from bpy.props import IntProperty, BoolProperty
+from bpy.props import IntProperty, BoolProperty, StringProperty
 
 USE_NOISE_THRESH_DESC = (
     "The rendering will stop when the noise in the image falls "
@@ -20,6 +20,33 @@ NOISE_THRESH_USE_FILTER_DESC = (
     "Use a 3x3 box filter to blur the Convergence AOV that is used "
     "to choose where to sample"
 )
+BUDGET_DESC = (
+    "Wall-clock time for the whole render of a layer, including export. "
+    "The render stops when the budget is used up, at the lowest noise level reached so far. "
+    "The stats show if the noise threshold is predicted to be reached in time"
+)
+
+CHECKPOINTS_DESC = (
+    "Periodically save the film and sampler state during final renders. "
+    "A later render of the same frame and render layer continues from the "
+    "last checkpoint instead of starting from zero, e.g. after a crash"
+)
+ANIMATION_BUDGET_DESC = (
+    "Distribute a total time budget across the frames of an animation render. "
+    "Frames that are harder to render get more time, so the noise level stays "
+    "roughly the same across the sequence. Overrides the halt time and noise threshold"
+)
+ANIMATION_BUDGET_TIME_DESC = "Total time for the whole animation, including export"
+ANIMATION_BUDGET_NOISE_DESC = (
+    "Noise level all frames should reach. "
+    "If the budget is too small, a higher noise level is used for all frames"
+)
+
+CHECKPOINT_INTERVAL_DESC = "Time between two checkpoints"
+CHECKPOINT_DIR_DESC = (
+    "Directory where checkpoints are saved. "
+    "If empty, the cache directory from the addon preferences is used"
+)
 
 
 # Attached to render layer and scene
@@ -45,5 +72,26 @@ class LuxCoreHaltConditions(bpy.types.PropertyGroup):
     noise_thresh_use_filter = BoolProperty(name="Blur Convergence AOV", default=True,
                                            description=NOISE_THRESH_USE_FILTER_DESC)
 
+    use_budget = BoolProperty(name="Use Budget", default=False, description=BUDGET_DESC)
+    budget = IntProperty(name="Budget (s)", default=3600, min=1, description=BUDGET_DESC)
+
     def is_enabled(self):
-        return self.enable and (self.use_time or self.use_samples or self.use_noise_thresh)
+        return self.enable and (self.use_time or self.use_samples or self.use_noise_thresh or self.use_budget)
+
+
+# Attached to scene
+class LuxCoreCheckpoints(bpy.types.PropertyGroup):
+    enable = BoolProperty(name="Enable", default=False, description=CHECKPOINTS_DESC)
+    interval = IntProperty(name="Interval (min)", default=10, min=1,
+                           description=CHECKPOINT_INTERVAL_DESC)
+    directory = StringProperty(name="Directory", subtype="DIR_PATH",
+                               description=CHECKPOINT_DIR_DESC)
+
+
+# Attached to scene
+class LuxCoreAnimationBudget(bpy.types.PropertyGroup):
+    enable = BoolProperty(name="Enable", default=False, description=ANIMATION_BUDGET_DESC)
+    budget = IntProperty(name="Budget (min)", default=600, min=1,
+                         description=ANIMATION_BUDGET_TIME_DESC)
+    noise_thresh = IntProperty(name="Noise Threshold", default=5, min=1, soft_min=3, max=255,
+                               description=ANIMATION_BUDGET_NOISE_DESC)
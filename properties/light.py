@@ -47,6 +47,10 @@ VISIBILITYMAP_ENABLE_DESC = (
     "Compute a visibility map for this light source. Recommended for indoor scenes where this "
     "light source is only visible through small openings (e.g. windows)"
 )
+VISIBILITYMAP_CACHE_DESC = (
+    "Store the visibility map in the cache directory and reuse it in later renders "
+    "as long as the light and the scene geometry do not change"
+)
 
 LIGHTGROUP_DESC = "Add this light to a light group from the scene"
 
@@ -159,6 +163,8 @@ class LuxCoreLightProps(bpy.types.PropertyGroup):
     # sky2, infinite, constantinfinite
     visibilitymap_enable = BoolProperty(name="Build Visibility Map", default=True,
                                         description=VISIBILITYMAP_ENABLE_DESC)
+    visibilitymap_cache = BoolProperty(name="Cache Visibility Map", default=False,
+                                       description=VISIBILITYMAP_CACHE_DESC)
 
     # area
     # We use unit="ROTATION" because angles are radians, so conversion is necessary for the UI
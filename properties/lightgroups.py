@@ -11,6 +11,10 @@ MAX_LIGHTGROUPS = 8 - 1
 
 RGB_GAIN_DESC = "The color of each light in this group is multiplied with this multiplier, if enabled"
 TEMP_DESC = "Blackbody emission color in Kelvin by which to shift the color of each light in this group"
+SAVE_REMIX_BUFFERS_DESC = (
+    "Save the light groups of each final render to the cache directory, so they "
+    "can be remixed with different settings later without rendering again"
+)
 
 
 class LuxCoreLightGroup(PropertyGroup):
@@ -32,6 +36,8 @@ class LuxCoreLightGroup(PropertyGroup):
 class LuxCoreLightGroupSettings(PropertyGroup):
     default = PointerProperty(type=LuxCoreLightGroup)
     custom = CollectionProperty(type=LuxCoreLightGroup)
+    save_remix_buffers = BoolProperty(name="Save for Remix", default=False,
+                                      description=SAVE_REMIX_BUFFERS_DESC)
 
     def add(self):
         if len(self.custom) < MAX_LIGHTGROUPS:
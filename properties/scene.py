@@ -11,6 +11,8 @@ class LuxCoreScene(bpy.types.PropertyGroup):
     config = PointerProperty(type=config.LuxCoreConfig)
     errorlog = PointerProperty(type=errorlog.LuxCoreErrorLog)
     halt = PointerProperty(type=halt.LuxCoreHaltConditions)
+    checkpoints = PointerProperty(type=halt.LuxCoreCheckpoints)
+    animation_budget = PointerProperty(type=halt.LuxCoreAnimationBudget)
     display = PointerProperty(type=display.LuxCoreDisplaySettings)
     opencl = PointerProperty(type=opencl.LuxCoreOpenCLSettings)
     lightgroups = PointerProperty(type=lightgroups.LuxCoreLightGroupSettings)
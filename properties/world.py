@@ -8,7 +8,7 @@ from bpy.props import (
 from .light import (
     RGB_GAIN_DESC, IMPORTANCE_DESCRIPTION,
     GAMMA_DESCRIPTION, SAMPLEUPPERHEMISPHEREONLY_DESCRIPTION,
-    VISIBILITYMAP_ENABLE_DESC, LIGHTGROUP_DESC, TURBIDITY_DESC,
+    VISIBILITYMAP_ENABLE_DESC, VISIBILITYMAP_CACHE_DESC, LIGHTGROUP_DESC, TURBIDITY_DESC,
     VIS_INDIRECT_DIFFUSE_DESC, VIS_INDIRECT_GLOSSY_DESC,
     VIS_INDIRECT_SPECULAR_DESC,
 )
@@ -88,5 +88,7 @@ class LuxCoreWorldProps(bpy.types.PropertyGroup):
     # sky2, infinite, constantinfinite
     visibilitymap_enable = BoolProperty(name="Build Visibility Map", default=True,
                                         description=VISIBILITYMAP_ENABLE_DESC)
+    visibilitymap_cache = BoolProperty(name="Cache Visibility Map", default=False,
+                                       description=VISIBILITYMAP_CACHE_DESC)
 
     volume = PointerProperty(type=bpy.types.NodeTree)
@@ -0,0 +1,70 @@
+import unittest
+import sys
+
+import numpy
+import BlendLuxCore
+from BlendLuxCore.bin import pyluxcore
+from BlendLuxCore.engine import remix
+from BlendLuxCore.export import imagepipeline
+
+
+class LightgroupSettings(object):
+    """ Stand-in for the light group PropertyGroup """
+    def __init__(self, gain, rgb_gain=None, temperature=None):
+        self.enabled = True
+        self.gain = gain
+        self.use_rgb_gain = rgb_gain is not None
+        self.rgb_gain = rgb_gain
+        self.use_temperature = temperature is not None
+        self.temperature = temperature
+
+
+class TestRemixScale(unittest.TestCase):
+    def test_radiance_scale_matches_luxcore(self):
+        groups = [
+            LightgroupSettings(1, temperature=6500),
+            LightgroupSettings(4, rgb_gain=(0.9, 0.9, 0.4)),
+            LightgroupSettings(2.5, temperature=1000),
+            LightgroupSettings(0.3, rgb_gain=(0.2, 0.7, 1.3), temperature=2700),
+            LightgroupSettings(1.7, rgb_gain=(1, 0.5, 0.1), temperature=12000),
+        ]
+        color = [0.8, 0.5, 0.2]
+
+        for group in groups:
+            # A fresh film per group, a parsed film keeps the settings of previous groups.
+            # It is not the film WhitePointProbe reads the white points from
+            session = remix._render_constant_film(color, width=2, height=2)
+            film = session.GetFilm()
+            raw = numpy.empty((2, 2, 3), dtype=numpy.float32)
+            film.GetOutputFloat(pyluxcore.FilmOutputType.RADIANCE_GROUP, raw, 0)
+
+            # The same properties the exporter uses for radiancescales
+            definitions = {}
+            imagepipeline._lightgroup(definitions, group, 0)
+            props = pyluxcore.Properties()
+            for key, value in definitions.items():
+                props.Set(pyluxcore.Property("film.imagepipelines.0." + key, value))
+            film.Parse(props)
+
+            expected = numpy.empty((2, 2, 3), dtype=numpy.float32)
+            film.GetOutputFloat(pyluxcore.FilmOutputType.RGB_IMAGEPIPELINE, expected)
+
+            remixed = raw * remix.radiance_scale(group)
+            for value, expected_value in zip(remixed.ravel(), expected.ravel()):
+                self.assertAlmostEqual(value, expected_value, delta=1e-5 + 1e-4 * abs(expected_value))
+
+    def test_precomputed_white_points(self):
+        temperatures = [1500, 3200, 8000]
+        remix.WhitePointProbe.precompute(temperatures)
+        # get() waits for the worker thread
+        for temperature in temperatures:
+            white_point = remix.WhitePointProbe.get(temperature)
+            self.assertEqual(len(white_point), 3)
+            self.assertIn(temperature, remix.WhitePointProbe.white_points)
+
+
+# we have to manually invoke the test runner here, as we cannot use the CLI
+suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestRemixScale)
+result = unittest.TextTestRunner().run(suite)
+
+sys.exit(not result.wasSuccessful())
@@ -24,16 +24,26 @@ if not os.path.exists(blender_executable):
 status = 0
 failed = []
 
+tests = []
 for blend_file in glob.glob("./**/*.test.blend"):
-    test_name = os.path.splitext(os.path.basename(blend_file))[0]
+    tests.append((blend_file, blend_file.replace(".blend", ".py")))
+# Test scripts without a .test.blend file run in the factory startup scene
+for script in glob.glob("./**/*.test.py"):
+    if not os.path.exists(script.replace(".py", ".blend")):
+        tests.append((None, script))
+
+for blend_file, script in tests:
+    test_name = os.path.splitext(os.path.basename(script))[0]
 
     print("\n\n")
     print("=" * 40)
     print(test_name)
     print("=" * 40)
 
-    args = [blender_executable, "--addons", "BlendLuxCore", "--factory-startup", "-noaudio",
-            "-b", blend_file, "--python", blend_file.replace(".blend", ".py")]
+    args = [blender_executable, "--addons", "BlendLuxCore", "--factory-startup", "-noaudio", "-b"]
+    if blend_file:
+        args.append(blend_file)
+    args += ["--python", script]
     return_code = subprocess.call(args)
 
     if return_code != 0:
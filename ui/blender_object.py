@@ -38,3 +38,15 @@ class LUXCORE_OBJECT_PT_object(ObjectButtonsPanel, Panel):
         # Instancing can cost performance, so inform the user when it happens
         if utils.use_obj_motion_blur(obj, context.scene):
             layout.label("Object will be exported as instance", icon="INFO")
+
+        # Proxy settings
+        if obj.type == "MESH":
+            layout.separator()
+            row = layout.row()
+            row.operator("luxcore.proxy_create", icon="EXPORT")
+            if obj.luxcore.proxies:
+                row.prop(obj.luxcore, "use_proxy")
+                col = layout.column(align=True)
+                col.active = obj.luxcore.use_proxy
+                for proxy in obj.luxcore.proxies:
+                    col.prop(proxy, "filepath", text="Material %d" % proxy.material_index)
@@ -24,6 +24,10 @@ class LUXCORE_RENDER_PT_config(RenderButtonsPanel, Panel):
             layout.prop(config, "filesaver_path")
             layout.separator()
 
+        row = layout.row()
+        row.prop(config, "use_export_cache")
+        row.prop(config, "use_persistent_data")
+
         # Device
         row_device = layout.row()
         row_device.enabled = config.engine == "PATH"
@@ -106,7 +110,9 @@ class LUXCORE_RENDER_PT_config(RenderButtonsPanel, Panel):
         row.prop(config, "use_animated_seed", icon="TIME", toggle=True)
 
         # Light strategy
-        layout.prop(config, "light_strategy")
+        row = layout.row()
+        row.prop(config, "light_strategy")
+        row.prop(config, "use_auto_importance")
 
     def draw_clamp_settings(self, layout, config):
         split = layout.split()
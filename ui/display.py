@@ -17,6 +17,16 @@ class LUXCORE_RENDER_PT_display_settings(RenderButtonsPanel, Panel):
 
         layout.label("Viewport Render:")
         layout.prop(display, "viewport_halt_time")
+        row = layout.row(align=True)
+        row.prop(display, "use_viewport_texture_limit")
+        sub = row.row(align=True)
+        sub.active = display.use_viewport_texture_limit
+        sub.prop(display, "viewport_texture_limit")
+        layout.prop(display, "viewport_volume_downsampling")
 
         layout.label("Final Render:")
         layout.prop(display, "interval")
+
+        layout.prop(display, "film_retention")
+        if display.film_retention == "DISK":
+            layout.prop(display, "film_cache_size")
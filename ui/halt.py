@@ -46,6 +46,12 @@ def draw(layout, context, halt):
         row.prop(halt, "noise_thresh_step")
         thresh_layout.prop(halt, "noise_thresh_use_filter")
 
+    row = layout.row()
+    row.prop(halt, "use_budget")
+    split = row.split()
+    split.active = halt.use_budget
+    split.prop(halt, "budget")
+
 
 class LUXCORE_RENDER_PT_halt_conditions(Panel, RenderButtonsPanel):
     """
@@ -92,6 +98,8 @@ class LUXCORE_RENDER_PT_halt_conditions(Panel, RenderButtonsPanel):
                     conditions.append("Samples (%d)" % halt.samples)
                 if halt.use_noise_thresh:
                     conditions.append("Noise (%d)" % halt.noise_thresh)
+                if halt.use_budget:
+                    conditions.append("Budget (%ds)" % halt.budget)
 
                 if conditions:
                     text = layer.name + ": " + ", ".join(conditions)
@@ -123,3 +131,55 @@ class LUXCORE_RENDERLAYER_PT_halt_conditions(Panel, RenderLayerButtonsPanel):
         rl = context.scene.render.layers.active
         halt = rl.luxcore.halt
         draw(self.layout, context, halt)
+
+
+class LUXCORE_RENDER_PT_animation_budget(Panel, RenderButtonsPanel):
+    bl_label = "LuxCore Animation Budget"
+    COMPAT_ENGINES = {"LUXCORE"}
+    bl_options = {"DEFAULT_CLOSED"}
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.render.engine == "LUXCORE"
+
+    def draw_header(self, context):
+        animation_budget = context.scene.luxcore.animation_budget
+        self.layout.prop(animation_budget, "enable", text="")
+
+    def draw(self, context):
+        layout = self.layout
+        animation_budget = context.scene.luxcore.animation_budget
+        layout.active = animation_budget.enable
+
+        layout.prop(animation_budget, "budget")
+        layout.prop(animation_budget, "noise_thresh")
+
+        scene = context.scene
+        frame_count = len(range(scene.frame_start, scene.frame_end + 1, scene.frame_step))
+        average = animation_budget.budget * 60 / frame_count
+        layout.label("Average: %.1f s per frame (%d frames)" % (average, frame_count), icon="TIME")
+
+
+class LUXCORE_RENDER_PT_checkpoints(Panel, RenderButtonsPanel):
+    bl_label = "LuxCore Checkpoints"
+    COMPAT_ENGINES = {"LUXCORE"}
+    bl_options = {"DEFAULT_CLOSED"}
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.render.engine == "LUXCORE"
+
+    def draw_header(self, context):
+        checkpoints = context.scene.luxcore.checkpoints
+        self.layout.prop(checkpoints, "enable", text="")
+
+    def draw(self, context):
+        layout = self.layout
+        checkpoints = context.scene.luxcore.checkpoints
+        layout.active = checkpoints.enable
+
+        layout.prop(checkpoints, "interval")
+        layout.prop(checkpoints, "directory")
+
+        if context.scene.luxcore.config.use_filesaver:
+            layout.label("Not available in filesaver mode", icon="INFO")
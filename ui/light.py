@@ -172,7 +172,11 @@ class LUXCORE_LAMP_PT_performance(DataButtonsPanel, Panel):
 
         if lamp.type == "HEMI":
             # infinite (with image) and constantinfinte lights
-            layout.prop(lamp.luxcore, "visibilitymap_enable")
+            row = layout.row()
+            row.prop(lamp.luxcore, "visibilitymap_enable")
+            sub = row.row()
+            sub.active = lamp.luxcore.visibilitymap_enable
+            sub.prop(lamp.luxcore, "visibilitymap_cache")
 
 
 class LUXCORE_LAMP_PT_visibility(DataButtonsPanel, Panel):
@@ -19,6 +19,12 @@ class LUXCORE_SCENE_PT_lightgroups(SceneButtonsPanel, Panel):
         layout = self.layout
         groups = context.scene.luxcore.lightgroups
 
+        row = layout.row()
+        row.prop(groups, "save_remix_buffers")
+        sub = row.row()
+        sub.active = groups.save_remix_buffers
+        sub.operator("luxcore.remix_lightgroups", icon="RENDER_STILL")
+
         self.draw_lightgroup(layout, groups.default, -1,
                              is_default_group=True)
 
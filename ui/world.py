@@ -156,7 +156,11 @@ class LUXCORE_WORLD_PT_performance(WorldButtonsPanel, Panel):
         world = context.world
 
         layout.prop(world.luxcore, "importance")
-        layout.prop(world.luxcore, "visibilitymap_enable")
+        row = layout.row()
+        row.prop(world.luxcore, "visibilitymap_enable")
+        sub = row.row()
+        sub.active = world.luxcore.visibilitymap_enable
+        sub.prop(world.luxcore, "visibilitymap_cache")
 
 
 class LUXCORE_WORLD_PT_visibility(WorldButtonsPanel, Panel):
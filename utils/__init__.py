@@ -3,6 +3,7 @@ import mathutils
 import math
 import re
 import os
+import tempfile
 from ..bin import pyluxcore
 
 
@@ -418,6 +419,34 @@ def get_abspath(path, library=None, must_exist=False, must_be_existing_file=Fals
     return abspath
 
 
+def get_addon_preferences(context=None):
+    """ Returns None if the addon is not registered (e.g. in background mode without --addons) """
+    from ..properties.addon_preferences import LuxCoreAddonPreferences
+
+    if context is None:
+        context = bpy.context
+
+    addon = context.user_preferences.addons.get(LuxCoreAddonPreferences.bl_idname)
+    return addon.preferences if addon else None
+
+
+def get_cache_dir(subdir):
+    """
+    Returns the absolute path of a subdirectory in the LuxCore cache directory.
+    The directory is created if it does not exist yet.
+    """
+    preferences = get_addon_preferences()
+
+    if preferences and preferences.cache_dir:
+        cache_dir = bpy.path.abspath(preferences.cache_dir)
+    else:
+        cache_dir = os.path.join(tempfile.gettempdir(), "BlendLuxCore")
+
+    path = os.path.join(cache_dir, subdir)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
 def absorption_at_depth_scaled(abs_col, depth, scale=1):
     abs_col = list(abs_col)
     assert len(abs_col) == 3
@@ -459,7 +488,8 @@ def use_instancing(obj, scene, context):
         # When using object motion blur, we export all objects as instances
         return True
 
-    # TODO: more checks, e.g. Alt+D copies without modifiers or with equal modifier stacks
+    # Objects with identical meshes (Alt+D and Shift+D copies) are instanced
+    # from shared shapes, see blender_object.find_shared_meshes()
 
     return False
 
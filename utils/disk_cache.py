@@ -0,0 +1,79 @@
+import os
+from time import time
+from . import get_cache_dir
+
+
+class DiskCache(object):
+    """
+    A directory in the LuxCore cache directory with a size limit.
+    When the limit is exceeded, the least recently used files are deleted.
+    We track the last use with the file modification time, because the
+    access time is not updated on many file systems (noatime).
+    """
+
+    def __init__(self, subdir, max_size_mb):
+        self.subdir = subdir
+        self.max_size = max_size_mb * 1024 * 1024
+
+    @property
+    def directory(self):
+        # Not cached because the user might change the cache directory in the addon preferences
+        return get_cache_dir(self.subdir)
+
+    def get_path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def lookup(self, filename):
+        """ Returns the path of the cached file and marks it as used, or None if it is not cached """
+        filepath = self.get_path(filename)
+
+        if not os.path.isfile(filepath):
+            return None
+
+        self.touch(filepath)
+        return filepath
+
+    @staticmethod
+    def touch(filepath):
+        now = time()
+        os.utime(filepath, (now, now))
+
+    def evict(self, keep=()):
+        """
+        Delete least recently used files until the size limit is met.
+        keep: paths of files that must not be deleted, e.g. because they are in use
+        """
+        directory = self.directory
+        keep = {os.path.abspath(path) for path in keep}
+        entries = []
+        total_size = 0
+
+        for filename in os.listdir(directory):
+            filepath = os.path.join(directory, filename)
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                # Deleted in the meantime (e.g. by another Blender instance)
+                continue
+
+            if not os.path.isfile(filepath):
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, filepath))
+            total_size += stat.st_size
+
+        # Oldest first
+        entries.sort()
+
+        for _, size, filepath in entries:
+            if total_size <= self.max_size:
+                break
+            if os.path.abspath(filepath) in keep:
+                continue
+
+            try:
+                os.remove(filepath)
+                total_size -= size
+                print("[DiskCache] Evicted", filepath)
+            except OSError as error:
+                print("[DiskCache] Could not delete %s: %s" % (filepath, error))
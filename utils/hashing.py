@@ -0,0 +1,308 @@
+import array
+import hashlib
+import os
+import bpy
+
+GEOMETRY_TYPES = {"MESH", "CURVE", "SURFACE", "META", "FONT"}
+
+
+def update_mesh(sha, mesh):
+    """ Updates the sha object with the vertex positions, faces and material indices of a mesh """
+    vertex_count = len(mesh.vertices)
+    coords = array.array("f", [0.0]) * (vertex_count * 3)
+    mesh.vertices.foreach_get("co", coords)
+
+    loop_count = len(mesh.loops)
+    loop_verts = array.array("i", [0]) * loop_count
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+
+    poly_count = len(mesh.polygons)
+    poly_loop_totals = array.array("i", [0]) * poly_count
+    mesh.polygons.foreach_get("loop_total", poly_loop_totals)
+    material_indices = array.array("i", [0]) * poly_count
+    mesh.polygons.foreach_get("material_index", material_indices)
+
+    sha.update(repr((vertex_count, loop_count, poly_count)).encode("utf-8"))
+    for data in (coords, loop_verts, poly_loop_totals, material_indices):
+        sha.update(data.tobytes())
+
+
+def hash_scene_geometry(scene):
+    """
+    Hash of the geometry of all visible objects in the scene: their transformation and evaluated
+    geometry inputs (see update_object_inputs()), particle settings and dupli instances
+    """
+    sha = hashlib.sha1()
+    visited = set()
+    objects = [obj for obj in scene.objects if obj.is_visible(scene)]
+
+    for obj in sorted(objects, key=lambda o: o.name):
+        if obj.type in GEOMETRY_TYPES:
+            update_object_inputs(sha, obj, scene, visited)
+            for psys in obj.particle_systems:
+                update_rna_struct(sha, psys, scene, visited)
+                update_rna_struct(sha, psys.settings, scene, visited)
+
+        if obj.is_duplicator:
+            _update_duplis(sha, obj, scene, visited)
+
+    return sha.hexdigest()
+
+
+def hash_values(*values):
+    sha = hashlib.sha1()
+    sha.update(repr(values).encode("utf-8"))
+    return sha.hexdigest()
+
+
+# Modifiers whose result depends on the current frame even if their settings don't change
+TIME_DEPENDENT_MODIFIERS = {
+    "CLOTH", "COLLISION", "DYNAMIC_PAINT", "EXPLODE", "FLUID_SIMULATION", "MESH_CACHE",
+    "MESH_SEQUENCE_CACHE", "OCEAN", "PARTICLE_INSTANCE", "PARTICLE_SYSTEM", "SMOKE",
+    "SOFT_BODY", "WAVE",
+}
+
+
+# Properties of RNA structs that don't change the result (e.g. user counts or UI state)
+IGNORED_PROPERTIES = {
+    "rna_type", "users", "use_fake_user", "tag", "is_updated", "is_updated_data",
+    "is_library_indirect", "is_editmode", "show_expanded",
+}
+# Number of floats read at once when hashing the pixels of a painted image (4 MB)
+PIXEL_CHUNK_SIZE = 1024 * 1024
+# Per point attributes of curve splines: (collection name, attribute, size)
+SPLINE_POINT_ATTRIBUTES = [
+    ("points", "co", 4), ("points", "radius", 1), ("points", "tilt", 1), ("points", "weight", 1),
+    ("bezier_points", "co", 3), ("bezier_points", "handle_left", 3),
+    ("bezier_points", "handle_right", 3), ("bezier_points", "radius", 1), ("bezier_points", "tilt", 1),
+]
+
+
+def update_rna_struct(sha, struct, scene=None, visited=None, ignored=()):
+    """
+    Updates the sha object with the values of all properties of an RNA struct (e.g. a modifier).
+    Pointers to objects add their transformation and evaluated geometry inputs (see
+    update_object_inputs()), because modifiers like Boolean or Shrinkwrap depend on them.
+    Textures (e.g. of Displace or Wave modifiers), images and nested structs (e.g. color ramps)
+    are added with all their settings, other datablocks only with their name.
+    ignored: names of properties to skip in addition to IGNORED_PROPERTIES
+    Returns True if the struct points to an object.
+    """
+    if visited is None:
+        visited = set()
+    references_object = False
+
+    for prop in struct.bl_rna.properties:
+        if prop.identifier in IGNORED_PROPERTIES or prop.identifier in ignored or prop.type == "COLLECTION":
+            continue
+
+        value = getattr(struct, prop.identifier)
+        if prop.type == "POINTER":
+            if value is None:
+                sha.update(b"None")
+            elif isinstance(value, bpy.types.Object):
+                update_object_inputs(sha, value, scene, visited)
+                references_object = True
+            elif isinstance(value, bpy.types.Texture):
+                references_object |= update_rna_struct(sha, value, scene, visited)
+            elif isinstance(value, bpy.types.Image):
+                update_image(sha, value)
+            elif isinstance(value, bpy.types.ID):
+                sha.update(value.name.encode("utf-8"))
+            elif value.as_pointer() not in visited:
+                visited.add(value.as_pointer())
+                references_object |= update_rna_struct(sha, value, scene, visited, ignored)
+            continue
+
+        if prop.type in {"BOOLEAN", "INT", "FLOAT"} and prop.is_array:
+            value = tuple(value)
+        elif prop.type == "ENUM" and prop.is_enum_flag:
+            # Sets have no defined order
+            value = sorted(value)
+        sha.update(repr((prop.identifier, value)).encode("utf-8"))
+
+    return references_object
+
+
+def update_image(sha, image):
+    """
+    Updates the sha object with the contents of an image. Images loaded from a file
+    add the path, size and modification time of the file instead of the pixels.
+    """
+    sha.update(repr((image.source, image.filepath, image.colorspace_settings.name,
+                     image.alpha_mode, image.use_alpha)).encode("utf-8"))
+
+    if image.is_dirty:
+        # Painted on, the file or the packed data are outdated
+        update_pixels(sha, image)
+    elif image.packed_file:
+        sha.update(image.packed_file.data)
+    elif image.source == "GENERATED":
+        sha.update(repr((image.generated_type, image.generated_width, image.generated_height,
+                         tuple(image.generated_color), image.use_generated_float)).encode("utf-8"))
+    else:
+        filepath = bpy.path.abspath(image.filepath, library=image.library)
+        try:
+            stat = os.stat(filepath)
+            sha.update(repr((stat.st_size, stat.st_mtime)).encode("utf-8"))
+        except OSError:
+            sha.update(b"missing")
+
+
+def update_pixels(sha, image):
+    """ Updates the sha object with the pixels of an image without a copy of all pixels as tuple """
+    sha.update(repr(tuple(image.size)).encode("utf-8"))
+    pixels = image.pixels
+    count = len(pixels)
+
+    if hasattr(pixels, "foreach_get"):
+        buffer = array.array("f", [0.0]) * count
+        pixels.foreach_get(buffer)
+        sha.update(buffer.tobytes())
+    else:
+        # bpy_prop_array has no foreach_get() in Blender 2.79, read it in slices
+        for start in range(0, count, PIXEL_CHUNK_SIZE):
+            chunk = array.array("f", pixels[start:start + PIXEL_CHUNK_SIZE])
+            sha.update(chunk.tobytes())
+
+
+def update_object_inputs(sha, obj, scene, visited=None):
+    """
+    Updates the sha object with the transformation of an object and everything its evaluated
+    geometry depends on (see _update_geometry_inputs()). Armatures add their pose.
+    visited: pointers of the objects already added, to stop at dependency cycles
+    """
+    if visited is None:
+        visited = set()
+
+    sha.update(obj.name.encode("utf-8"))
+    sha.update(repr([tuple(row) for row in obj.matrix_world]).encode("utf-8"))
+
+    if obj.as_pointer() in visited:
+        return
+    visited.add(obj.as_pointer())
+
+    if obj.type == "ARMATURE" and obj.pose:
+        for bone in obj.pose.bones:
+            sha.update(repr([tuple(row) for row in bone.matrix]).encode("utf-8"))
+
+    _update_geometry_inputs(sha, obj, scene, visited)
+
+
+def hash_mesh_object_inputs(obj, scene):
+    """
+    Hash of everything that goes into the evaluated render mesh of a mesh object in object space:
+    the mesh with its UV maps, vertex colors and shape keys, and the modifier stack with
+    all settings and the objects it references.
+    The transformation of the object is only included if a modifier references another object.
+    Includes the frame if a modifier or the object is animated.
+    """
+    sha = hashlib.sha1()
+    visited = {obj.as_pointer()}
+    references_object = _update_geometry_inputs(sha, obj, scene, visited)
+
+    if references_object:
+        # The result depends on the transformation relative to the other objects
+        sha.update(repr([tuple(row) for row in obj.matrix_world]).encode("utf-8"))
+
+    return sha.hexdigest()
+
+
+def _update_geometry_inputs(sha, obj, scene, visited):
+    """
+    Updates the sha object with the data of the object (mesh, curve, text or metaball) and the
+    render modifier stack with all settings. Includes the frame if the result can be animated.
+    Returns True if a modifier or the data references another object.
+    """
+    data = obj.data
+    references_object = False
+    is_animated = bool(obj.animation_data or (data and getattr(data, "animation_data", None)))
+
+    if obj.type == "MESH":
+        _update_mesh_inputs(sha, data)
+        is_animated |= bool(data.shape_keys and data.shape_keys.animation_data)
+    elif obj.type in {"CURVE", "SURFACE", "FONT"}:
+        # Bevel and taper objects are pointers of the curve
+        references_object |= update_rna_struct(sha, data, scene, visited)
+        _update_splines(sha, data)
+    elif obj.type == "META":
+        update_rna_struct(sha, data)
+        for element in data.elements:
+            update_rna_struct(sha, element)
+    elif data:
+        sha.update(data.name.encode("utf-8"))
+
+    for mod in obj.modifiers:
+        if not mod.show_render:
+            continue
+        sha.update(mod.type.encode("utf-8"))
+        references_object |= update_rna_struct(sha, mod, scene, visited)
+        if mod.type in TIME_DEPENDENT_MODIFIERS:
+            is_animated = True
+        if getattr(mod, "texture_coords", None) == "GLOBAL":
+            # The texture is mapped in world space
+            references_object = True
+        texture = getattr(mod, "texture", None)
+        if texture and texture.animation_data:
+            is_animated = True
+
+    if scene and scene.render.use_simplify:
+        # Limits the levels of Subdivision Surface and Multiresolution modifiers and the child particles
+        sha.update(repr((scene.render.simplify_subdivision_render,
+                         scene.render.simplify_child_particles_render)).encode("utf-8"))
+
+    if is_animated and scene:
+        sha.update(repr(scene.frame_current).encode("utf-8"))
+
+    return references_object
+
+
+def _update_mesh_inputs(sha, mesh):
+    update_mesh(sha, mesh)
+
+    use_smooth = array.array("i", [0]) * len(mesh.polygons)
+    mesh.polygons.foreach_get("use_smooth", use_smooth)
+    sha.update(use_smooth.tobytes())
+    sha.update(repr((mesh.use_auto_smooth, mesh.auto_smooth_angle)).encode("utf-8"))
+
+    for layer in mesh.uv_layers:
+        if layer.active_render:
+            uv = array.array("f", [0.0]) * (len(layer.data) * 2)
+            layer.data.foreach_get("uv", uv)
+            sha.update(uv.tobytes())
+
+    vertex_colors = mesh.vertex_colors.active
+    if vertex_colors:
+        colors = array.array("f", [0.0]) * (len(vertex_colors.data) * 3)
+        vertex_colors.data.foreach_get("color", colors)
+        sha.update(colors.tobytes())
+
+    if mesh.shape_keys:
+        for key_block in mesh.shape_keys.key_blocks:
+            sha.update(repr((key_block.name, key_block.value, key_block.mute)).encode("utf-8"))
+            co = array.array("f", [0.0]) * (len(key_block.data) * 3)
+            key_block.data.foreach_get("co", co)
+            sha.update(co.tobytes())
+
+
+def _update_splines(sha, curve):
+    """ Updates the sha object with the settings and control points of all splines of a curve """
+    for spline in curve.splines:
+        update_rna_struct(sha, spline)
+        for collection_name, attr, size in SPLINE_POINT_ATTRIBUTES:
+            collection = getattr(spline, collection_name)
+            data = array.array("f", [0.0]) * (len(collection) * size)
+            collection.foreach_get(attr, data)
+            sha.update(attr.encode("utf-8"))
+            sha.update(data.tobytes())
+
+
+def _update_duplis(sha, obj, scene, visited):
+    """ Updates the sha object with the matrices and the instanced objects of all duplis of an object """
+    obj.dupli_list_create(scene, settings="RENDER")
+    try:
+        for dupli in obj.dupli_list:
+            sha.update(repr([tuple(row) for row in dupli.matrix]).encode("utf-8"))
+            update_object_inputs(sha, dupli.object, scene, visited)
+    finally:
+        obj.dupli_list_clear()
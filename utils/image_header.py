@@ -0,0 +1,192 @@
+import os
+import struct
+
+# JPEG markers that start a frame (SOF), they contain the size. C4, C8 and CC are other markers
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Channels of the PNG color types (gray, RGB, palette, gray + alpha, RGBA)
+PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+# TIFF tags
+TIFF_WIDTH = 256
+TIFF_HEIGHT = 257
+TIFF_BITS_PER_SAMPLE = 258
+TIFF_SAMPLES_PER_PIXEL = 277
+TIFF_SAMPLE_FORMAT = 339
+TIFF_SAMPLE_FORMAT_FLOAT = 3
+# {TIFF field type: (struct format, size)}
+TIFF_TYPES = {1: ("B", 1), 3: ("H", 2), 4: ("I", 4)}
+# {EXR pixel type (UINT, HALF, FLOAT): bits}
+EXR_PIXEL_BITS = {0: 32, 1: 16, 2: 32}
+
+
+class ImageHeader(object):
+    """ Resolution and pixel format of an image file, read without loading the pixels """
+
+    def __init__(self, width, height, channels, bits=8, float_samples=False):
+        self.width = width
+        self.height = height
+        self.channels = channels
+        # Bits per sample (of the most precise channel)
+        self.bits = bits
+        # True if the samples are floating point numbers (EXR, HDR, float TIFF), False for integers
+        self.float_samples = float_samples
+
+    @property
+    def is_float(self):
+        # Blender loads 16 bit and HDR images as float
+        return self.float_samples or self.bits > 8
+
+    def __repr__(self):
+        return "ImageHeader(%d x %d, %d channels, %d bit %s)" % (
+            self.width, self.height, self.channels, self.bits, "float" if self.float_samples else "int")
+
+
+def read(filepath):
+    """ Returns an ImageHeader, or None if the format is not supported or the file is invalid """
+    try:
+        with open(filepath, "rb") as f:
+            start = f.read(16)
+            f.seek(0)
+
+            if start.startswith(b"\x89PNG\r\n\x1a\n"):
+                return _read_png(f)
+            if start.startswith(b"\xff\xd8"):
+                return _read_jpeg(f)
+            if start.startswith(b"\x76\x2f\x31\x01"):
+                return _read_exr(f)
+            if start.startswith(b"#?"):
+                return _read_hdr(f)
+            if start[:4] in {b"II*\x00", b"MM\x00*"}:
+                return _read_tiff(f)
+            if start.startswith(b"BM"):
+                return _read_bmp(f)
+            if os.path.splitext(filepath)[1].lower() == ".tga":
+                # TGA files have no magic number
+                return _read_tga(f)
+    except (OSError, struct.error, ValueError, IndexError, KeyError):
+        pass
+    return None
+
+
+def _read_png(f):
+    # Signature, then the IHDR chunk (length, type, width, height, bit depth, color type)
+    data = f.read(26)
+    width, height, bit_depth, color_type = struct.unpack(">II2B", data[16:26])
+    return ImageHeader(width, height, PNG_CHANNELS[color_type], max(bit_depth, 8))
+
+
+def _read_jpeg(f):
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            # Fill byte
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if 0xD0 <= code <= 0xD9 or code == 0x01:
+            # Markers without a segment
+            continue
+
+        length = struct.unpack(">H", f.read(2))[0]
+        if code in JPEG_SOF_MARKERS:
+            precision, height, width, channels = struct.unpack(">BHHB", f.read(6))
+            return ImageHeader(width, height, channels, precision)
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _read_exr(f):
+    # Magic number and version, then attributes (name, type, size, value) until an empty name
+    f.seek(8)
+    width = height = channels = None
+    bits = 16
+
+    while True:
+        name = _read_null_terminated(f)
+        if not name:
+            break
+        attr_type = _read_null_terminated(f)
+        size = struct.unpack("<i", f.read(4))[0]
+        value = f.read(size)
+
+        if name == b"dataWindow" and attr_type == b"box2i":
+            xmin, ymin, xmax, ymax = struct.unpack("<4i", value)
+            width, height = xmax - xmin + 1, ymax - ymin + 1
+        elif name == b"channels" and attr_type == b"chlist":
+            # Entries: name, pixel type, pLinear, 3 reserved, x sampling, y sampling
+            channels = 0
+            pos = 0
+            while value[pos] != 0:
+                pos = value.index(b"\x00", pos) + 1
+                pixel_type = struct.unpack("<i", value[pos:pos + 4])[0]
+                bits = max(bits, EXR_PIXEL_BITS.get(pixel_type, 32))
+                pos += 16
+                channels += 1
+
+    if width is None or channels is None:
+        return None
+    return ImageHeader(width, height, channels, bits, True)
+
+
+def _read_hdr(f):
+    # Header lines until an empty line, then the resolution, e.g. "-Y 1024 +X 2048"
+    for _ in range(100):
+        line = f.readline(1024).strip()
+        if not line:
+            break
+    axes = f.readline(1024).split()
+    sizes = {axes[0][1:2]: int(axes[1]), axes[2][1:2]: int(axes[3])}
+    # RGBE has an 8 bit mantissa, but a shared exponent with the range of a 32 bit float
+    return ImageHeader(sizes[b"X"], sizes[b"Y"], 3, 32, True)
+
+
+def _read_tiff(f):
+    byte_order = "<" if f.read(2) == b"II" else ">"
+    f.seek(4)
+    offset = struct.unpack(byte_order + "I", f.read(4))[0]
+    f.seek(offset)
+    entry_count = struct.unpack(byte_order + "H", f.read(2))[0]
+    tags = {}
+
+    for _ in range(entry_count):
+        tag, field_type, count, value = struct.unpack(byte_order + "HHI4s", f.read(12))
+        if field_type not in TIFF_TYPES:
+            continue
+        fmt, size = TIFF_TYPES[field_type]
+        if count * size > 4:
+            # The value is stored at an offset, only the first one is needed
+            position = f.tell()
+            f.seek(struct.unpack(byte_order + "I", value)[0])
+            value = f.read(size)
+            f.seek(position)
+        tags[tag] = struct.unpack(byte_order + fmt, value[:size])[0]
+
+    bits = max(tags.get(TIFF_BITS_PER_SAMPLE, 1), 8)
+    float_samples = tags.get(TIFF_SAMPLE_FORMAT) == TIFF_SAMPLE_FORMAT_FLOAT
+    return ImageHeader(tags[TIFF_WIDTH], tags[TIFF_HEIGHT], tags.get(TIFF_SAMPLES_PER_PIXEL, 1),
+                       bits, float_samples)
+
+
+def _read_bmp(f):
+    data = f.read(30)
+    width, height = struct.unpack("<ii", data[18:26])
+    bits = struct.unpack("<H", data[28:30])[0]
+    return ImageHeader(width, abs(height), 4 if bits == 32 else 3)
+
+
+def _read_tga(f):
+    data = f.read(18)
+    width, height, bits = struct.unpack("<HHB", data[12:17])
+    channels = {8: 1, 16: 3, 24: 3, 32: 4}[bits]
+    return ImageHeader(width, height, channels)
+
+
+def _read_null_terminated(f, max_length=256):
+    result = b""
+    while len(result) < max_length:
+        char = f.read(1)
+        if not char or char == b"\x00":
+            break
+        result += char
+    return result
@@ -0,0 +1,165 @@
+import os
+import numpy
+
+# Triangles of a tessface, the second one is only used by quads
+QUAD_TRIANGLES = ((0, 1, 2), (0, 2, 3))
+
+
+def read_mesh(mesh, active_uv=None, use_vertex_colors=True):
+    """
+    Reads the tessfaces of a mesh with foreach_get() and returns a dict of per-face arrays:
+        "corners": int32 (faces, 4), vertex indices, the 4th is 0 for triangles
+        "material_index": int32 (faces,)
+        "co", "normal": float32 (faces, 4, 3), per corner
+        "uv": float32 (faces, 4, 2) or None
+        "color": float32 (faces, 4, 3) or None
+    Flat shaded faces get the face normal on all corners.
+    """
+    face_count = len(mesh.tessfaces)
+    vertex_count = len(mesh.vertices)
+
+    corners = numpy.empty(face_count * 4, dtype=numpy.int32)
+    mesh.tessfaces.foreach_get("vertices_raw", corners)
+    corners = corners.reshape(face_count, 4)
+
+    material_index = numpy.empty(face_count, dtype=numpy.int32)
+    mesh.tessfaces.foreach_get("material_index", material_index)
+    use_smooth = numpy.empty(face_count, dtype=numpy.int32)
+    mesh.tessfaces.foreach_get("use_smooth", use_smooth)
+    face_normals = numpy.empty(face_count * 3, dtype=numpy.float32)
+    mesh.tessfaces.foreach_get("normal", face_normals)
+    face_normals = face_normals.reshape(face_count, 1, 3)
+
+    vertex_co = numpy.empty(vertex_count * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get("co", vertex_co)
+    vertex_normals = numpy.empty(vertex_count * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get("normal", vertex_normals)
+
+    co = vertex_co.reshape(vertex_count, 3)[corners]
+    smooth_normals = vertex_normals.reshape(vertex_count, 3)[corners]
+    normal = numpy.where(use_smooth[:, None, None] != 0, smooth_normals, face_normals)
+
+    uv = None
+    if active_uv and active_uv.data:
+        uv = numpy.empty(face_count * 8, dtype=numpy.float32)
+        active_uv.data.foreach_get("uv_raw", uv)
+        uv = uv.reshape(face_count, 4, 2)
+
+    color = None
+    vertex_color = mesh.tessface_vertex_colors.active if use_vertex_colors else None
+    if vertex_color:
+        color = numpy.empty((4, face_count * 3), dtype=numpy.float32)
+        for i in range(4):
+            vertex_color.data.foreach_get("color%d" % (i + 1), color[i])
+        color = color.reshape(4, face_count, 3).transpose(1, 0, 2)
+
+    return {
+        "corners": corners,
+        "material_index": material_index,
+        "co": co,
+        "normal": normal,
+        "uv": uv,
+        "color": color,
+    }
+
+
+def split_by_material(mesh_data):
+    """
+    Triangulates the faces and splits them by material.
+    Returns a list of (material_index, vertices, triangles), where vertices is a float32
+    array with one row per unique corner (x y z nx ny nz [u v] [r g b]) and triangles
+    an uint32 array (n, 3) of indices into it.
+    """
+    is_quad = mesh_data["corners"][:, 3] != 0
+    columns = [mesh_data["co"], mesh_data["normal"]]
+    for optional in ("uv", "color"):
+        if mesh_data[optional] is not None:
+            columns.append(mesh_data[optional])
+    # (faces, 4, attributes)
+    corner_data = numpy.concatenate(columns, axis=2)
+
+    result = []
+    material_indices = mesh_data["material_index"]
+
+    for material_index in numpy.unique(material_indices):
+        in_material = material_indices == material_index
+        triangles = [corner_data[in_material][:, QUAD_TRIANGLES[0]]]
+        quads = in_material & is_quad
+        if numpy.any(quads):
+            triangles.append(corner_data[quads][:, QUAD_TRIANGLES[1]])
+        # (triangles * 3, attributes)
+        rows = numpy.ascontiguousarray(numpy.concatenate(triangles).reshape(-1, corner_data.shape[2]))
+
+        vertices, indices = _unique_rows(rows)
+        result.append((int(material_index), vertices, indices.astype(numpy.uint32).reshape(-1, 3)))
+
+    return result
+
+
+def write(filepath, vertices, triangles, has_uv, has_color):
+    """ Writes a binary little endian PLY file, as read by LuxCore """
+    vertex_props = ["x", "y", "z", "nx", "ny", "nz"]
+    if has_uv:
+        vertex_props += ["u", "v"]
+
+    vertex_dtype = [(prop, "<f4") for prop in vertex_props]
+    if has_color:
+        vertex_dtype += [(channel, "u1") for channel in ("red", "green", "blue")]
+
+    vertex_array = numpy.empty(len(vertices), dtype=vertex_dtype)
+    for i, prop in enumerate(vertex_props):
+        vertex_array[prop] = vertices[:, i]
+    if has_color:
+        colors = numpy.clip(vertices[:, len(vertex_props):len(vertex_props) + 3], 0, 1)
+        colors = numpy.rint(colors * 255).astype(numpy.uint8)
+        for i, channel in enumerate(("red", "green", "blue")):
+            vertex_array[channel] = colors[:, i]
+
+    face_array = numpy.empty(len(triangles), dtype=[("count", "u1"), ("indices", "<u4", 3)])
+    face_array["count"] = 3
+    face_array["indices"] = triangles
+
+    header = ["ply", "format binary_little_endian 1.0", "element vertex %d" % len(vertices)]
+    header += ["property float " + prop for prop in vertex_props]
+    if has_color:
+        header += ["property uchar " + channel for channel in ("red", "green", "blue")]
+    header += [
+        "element face %d" % len(triangles),
+        "property list uchar uint vertex_indices",
+        "end_header",
+    ]
+
+    # Write to a temporary file first, so LuxCore never reads a half written file
+    temp_path = filepath + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(("\n".join(header) + "\n").encode("ascii"))
+        f.write(vertex_array.tobytes())
+        f.write(face_array.tobytes())
+    os.replace(temp_path, filepath)
+
+
+def write_mesh(mesh, active_uv, filepath_func, use_vertex_colors=True):
+    """
+    Writes one PLY file per material of the mesh.
+    active_uv: the UV map to write, or None
+    filepath_func: called with the material index, returns the path of the file
+    Returns a list of (material_index, filepath)
+    """
+    mesh_data = read_mesh(mesh, active_uv, use_vertex_colors)
+    has_uv = mesh_data["uv"] is not None
+    has_color = mesh_data["color"] is not None
+    written = []
+
+    for material_index, vertices, triangles in split_by_material(mesh_data):
+        filepath = filepath_func(material_index)
+        write(filepath, vertices, triangles, has_uv, has_color)
+        written.append((material_index, filepath))
+
+    return written
+
+
+def _unique_rows(rows):
+    """ Returns (unique rows, inverse indices), works with the old numpy shipped with Blender """
+    row_view = rows.view(numpy.dtype((numpy.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+    _, first_index, inverse = numpy.unique(row_view, return_index=True, return_inverse=True)
+    return rows[first_index], inverse
@@ -32,9 +32,6 @@ def refresh(engine, scene, config, draw_film, time_until_film_refresh=0):
 
     stats = engine.session.GetStats()
 
-    # Show stats string in UI
-    pretty_stats = get_pretty_stats(config, stats, scene)
-
     if draw_film:
         refresh_message = "Refreshing film..."
     else:
@@ -43,17 +40,29 @@ def refresh(engine, scene, config, draw_film, time_until_film_refresh=0):
     if error_message:
         refresh_message += " | " + error_message
 
-    engine.update_stats(pretty_stats, refresh_message)
+    update_status(engine, scene, config, stats, refresh_message)
 
     if draw_film:
         # Show updated film (this operation is expensive)
         engine.framebuffer.draw(engine, engine.session, scene)
 
+
+def update_status(engine, scene, config, stats, refresh_message, controller=None):
+    """
+    Show the stats string and update the progress bar.
+    Does not access the session, so stats can come from a worker thread.
+    controller: optional HaltController (engine/halt_controller.py) for predicted progress
+    """
+    # Render time of a resumed checkpoint
+    resumed_time = engine.exporter.resumed_time if engine.exporter else 0
+    pretty_stats = get_pretty_stats(config, stats, scene, resumed_time=resumed_time)
+    engine.update_stats(pretty_stats, refresh_message)
+
     # Update progress bar if we have halt conditions
     halt = utils.get_halt_conditions(scene)
-    if halt.enable and (halt.use_time or halt.use_samples or halt.use_noise_thresh):
+    if halt.is_enabled():
         rendered_samples = stats.Get("stats.renderengine.pass").GetInt()
-        rendered_time = stats.Get("stats.renderengine.time").GetFloat()
+        rendered_time = stats.Get("stats.renderengine.time").GetFloat() + resumed_time
         percent = 0
 
         if halt.use_time:
@@ -65,7 +74,17 @@ def refresh(engine, scene, config, draw_film, time_until_film_refresh=0):
 
         if halt.use_noise_thresh:
             convergence = stats.Get("stats.renderengine.convergence").GetFloat()
-            percent = max(percent, convergence)
+            eta = controller.predict_eta() if controller else None
+
+            if eta is not None and rendered_time + eta > 0:
+                # The converged pixel ratio rises quickly at first and then
+                # slows down, the predicted remaining time is more honest
+                percent = max(percent, rendered_time / (rendered_time + eta))
+            else:
+                percent = max(percent, convergence)
+
+        if halt.use_budget and controller:
+            percent = max(percent, controller.budget_progress())
 
         engine.update_progress(percent)
     else:
@@ -73,7 +92,7 @@ def refresh(engine, scene, config, draw_film, time_until_film_refresh=0):
         engine.update_progress(0)
 
 
-def get_pretty_stats(config, stats, scene, context=None):
+def get_pretty_stats(config, stats, scene, context=None, resumed_time=0):
     halt = utils.get_halt_conditions(scene)
     errorlog = scene.luxcore.errorlog
 
@@ -99,7 +118,7 @@ def get_pretty_stats(config, stats, scene, context=None):
     else:
         # Time
         if halt.enable and halt.use_time:
-            rendered_time = stats.Get("stats.renderengine.time").GetFloat()
+            rendered_time = stats.Get("stats.renderengine.time").GetFloat() + resumed_time
             pretty.append("Time: %ds/%ds" % (rendered_time, halt.time))
 
         # Samples (aka passes)